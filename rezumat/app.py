@@ -1,12 +1,14 @@
 from __future__ import annotations
 
-from typing import List, Union
+from typing import List, Optional, Union
 
 import gradio as gr
 import pandas as pd
 
 from rezumat.config import config
-from rezumat.preprocessing.input_data_processing import process_input
+from rezumat.evaluators.post_analysis import apply_weights
+from rezumat.models.input_models import CandidateEvaluationWeights
+from rezumat.preprocessing.input_data_processing import iter_process_input
 from rezumat.utils.helper import format_job_description_analysis, set_and_verify_api_key
 from rezumat.utils.logger import get_logger
 
@@ -17,27 +19,109 @@ logger = get_logger(__name__)
 # ------------------------------
 
 
+def top_candidate_ids(results_df: pd.DataFrame, n: int = 5) -> List[str]:
+    """cv_id of the `n` candidates with the highest overall score"""
+    return (
+        results_df.sort_values(by="recalibrated_overall_score", ascending=False)
+        .head(n)["cv_id"]
+        .tolist()
+    )
+
+
+def update_candidate_list(suitability, results_df):
+    if results_df is None or results_df.empty:
+        return gr.Dropdown(choices=[], value=None)
+
+    if suitability != "All":
+        filtered_df = results_df[results_df["suitability"] == suitability.lower()]
+
+        if filtered_df.empty:
+            filtered_df = results_df
+            gr.Warning(
+                "No candidates found for the selected suitability filter. Showing all candidates."
+            )
+    else:
+        filtered_df = results_df
+
+    candidates = filtered_df.sort_values(
+        by="recalibrated_overall_score", ascending=False
+    )
+    candidate_list = candidates["cv_id"].tolist()
+
+    return gr.Dropdown(
+        choices=candidate_list,
+        value=candidate_list[0] if candidate_list else None,
+    )
+
+
+def rerank_candidates(
+    technical_skills,
+    soft_skills,
+    experience,
+    education,
+    suitability,
+    results_df,
+    current_weights: dict,
+):
+    """re-rank with new weights from the cached category scores, without re-running
+    the pipeline. The weights are kept in `current_weights` for the results that a
+    running evaluation has yet to stream, see `with_current_weights`"""
+    try:
+        weights = CandidateEvaluationWeights(
+            technical_skills=technical_skills,
+            soft_skills=soft_skills,
+            experience=experience,
+            education=education,
+        )
+    except ValueError:
+        # the sliders pass through invalid totals while being adjusted
+        return gr.update(), gr.update()
+    current_weights["weights"] = weights
+    if results_df is None or results_df.empty:
+        return gr.update(), gr.update()
+
+    results_df = apply_weights(results_df.copy(), weights)
+    return results_df, update_candidate_list(suitability, results_df)
+
+
+def with_current_weights(
+    results_df: Optional[pd.DataFrame], current_weights: dict
+) -> Optional[pd.DataFrame]:
+    """`results_df` ranked with the weights last set with the sliders, if any"""
+    weights = current_weights.get("weights")
+    if weights is None or results_df is None or results_df.empty:
+        return results_df
+    return apply_weights(results_df.copy(), weights)
+
+
 def create_gradio_app():
     with gr.Blocks() as demo:
         gr.Markdown(f"# {config.TITLE}")
 
         # add a state to store the eval_results
         eval_results = gr.State()
+        # the weights last set with the sliders; every handler of a session gets the
+        # same dict, so a running evaluation sees the changes
+        current_weights = gr.State({})
         api_key_status = gr.State()
 
+        # progress of the running evaluation
+        progress_display = gr.Markdown()
+
         # INITIAL VIEW
         with gr.Group() as initial_view:
             with gr.Row():
                 with gr.Column(scale=2):
-
                     ## sidebar (20% of the screen)
                     # model selection section
                     api_key = gr.Textbox(label="API Key", type="password")
                     interface = gr.Dropdown(
-                        ["Groq", "OpenAI", "Anthropic"], label="Interface", value="Groq"
+                        ["Groq", "OpenAI", "Anthropic", "Ollama"],
+                        label="Interface",
+                        value="Groq",
                     )
                     model = gr.Dropdown(
-                        ["llama3-70b-8192", "gpt-3.5-turbo", "gpt-4"],
+                        ["llama3-70b-8192", "gpt-3.5-turbo", "gpt-4", "llama3.1:8b"],
                         label="Model",
                         value="llama3-70b-8192",
                     )
@@ -62,7 +146,6 @@ def create_gradio_app():
                     )
 
                 with gr.Column(scale=8):
-
                     ## Main content (80% of the screen)
                     # job description section
                     jd_text_input = gr.TextArea(
@@ -71,10 +154,10 @@ def create_gradio_app():
                         info="Paste the job description here",
                     )
                     input_type = gr.Radio(
-                        ["Text", "File"],
+                        ["Text", "File", "Pool"],
                         label="Select Resume Type",
                         value="Text",
-                        info="Select the type of input",
+                        info="Select the type of input, Pool: every CV uploaded before",
                     )
 
                     # resume section (text or file)
@@ -94,11 +177,11 @@ def create_gradio_app():
 
                     with gr.Row():
                         submit_btn = gr.Button("Evaluate")
+                        results_btn = gr.Button("Results")
                         reset_btn = gr.Button("Reset")
 
         # RESULTS VIEW (INITIALLY HIDDEN)
         with gr.Group(visible=False) as results_view:
-
             with gr.Row():
                 # applicant summary
                 total_applicants = gr.Number(label="Total Applicants")
@@ -145,8 +228,10 @@ def create_gradio_app():
         def update_input_type(choice):
             if choice == "Text":
                 return gr.update(visible=True), gr.update(visible=False)
-            else:
+            elif choice == "File":
                 return gr.update(visible=False), gr.update(visible=True)
+            else:
+                return gr.update(visible=False), gr.update(visible=False)
 
         # Event handlers: reset interface
         def reset_interface():
@@ -205,10 +290,7 @@ def create_gradio_app():
                 no = len(results_df[results_df["suitability"] == "no"])
                 kiv = len(results_df[results_df["suitability"] == "kiv"])
 
-                top_candidates = results_df.sort_values(
-                    by="recalibrated_overall_score", ascending=False
-                ).head(5)
-                top_candidates_list = top_candidates["cv_id"].tolist()
+                top_candidates_list = top_candidate_ids(results_df)
 
                 job_description = (
                     results_df["job_text"].iloc[0] if not results_df.empty else ""
@@ -249,32 +331,26 @@ def create_gradio_app():
                     error_msg,  # Debug output
                 ]
 
-        def update_candidate_list(suitability, results_df):
+        # Event handlers: stream the results of a running evaluation, the counts and
+        # top candidates are refreshed as the results arrive
+        def stream_results(*inputs):
+            *inputs, weights = inputs
+            results_df, shown = None, False
+            for results_df, progress in iter_process_input(*inputs):
+                if results_df is None or results_df.empty:
+                    yield [gr.update()] * 10 + [progress]
+                    continue
+                # keep the ranking of weights changed while the run is going
+                results_df = with_current_weights(results_df, weights)
+                outputs = list(process_results(results_df))
+                if shown:
+                    # keep the view and the candidate that is being reviewed
+                    outputs[0] = outputs[1] = gr.update()
+                    outputs[6] = gr.update(choices=top_candidate_ids(results_df))
+                shown = True
+                yield outputs + [progress]
             if results_df is None or results_df.empty:
-                return gr.Dropdown(choices=[], value=None)
-
-            if suitability != "All":
-                filtered_df = results_df[
-                    results_df["suitability"] == suitability.lower()
-                ]
-
-                if filtered_df.empty:
-                    filtered_df = results_df
-                    gr.Warning(
-                        "No candidates found for the selected suitability filter. Showing all candidates."
-                    )
-            else:
-                filtered_df = results_df
-
-            candidates = filtered_df.sort_values(
-                by="recalibrated_overall_score", ascending=False
-            )
-            candidate_list = candidates["cv_id"].tolist()
-
-            return gr.Dropdown(
-                choices=candidate_list,
-                value=candidate_list[0] if candidate_list else None,
-            )
+                yield list(process_results(results_df)) + [gr.update()]
 
         def display_candidate_info(cv_id, results_df):
 
@@ -339,7 +415,7 @@ def create_gradio_app():
             inputs=[api_key, interface],
             outputs=api_key_status,
         ).success(
-            fn=process_input,
+            fn=stream_results,
             inputs=[
                 jd_text_input,
                 additional_text,
@@ -352,11 +428,8 @@ def create_gradio_app():
                 soft_skills,
                 experience,
                 education,
+                current_weights,
             ],
-            outputs=eval_results,
-        ).then(
-            fn=process_results,
-            inputs=[eval_results],
             outputs=[
                 initial_view,
                 results_view,
@@ -368,6 +441,7 @@ def create_gradio_app():
                 jd_display,
                 job_analysis_display,
                 eval_results,
+                progress_display,
             ],
         )
 
@@ -405,6 +479,36 @@ def create_gradio_app():
             outputs=[score_comparison],
         )
 
+        for weight_slider in [technical_skills, soft_skills, experience, education]:
+            weight_slider.change(
+                fn=rerank_candidates,
+                inputs=[
+                    technical_skills,
+                    soft_skills,
+                    experience,
+                    education,
+                    suitability_filter,
+                    eval_results,
+                    current_weights,
+                ],
+                outputs=[eval_results, top_candidates],
+            ).then(
+                fn=display_score_comparison,
+                inputs=[top_candidates, eval_results],
+                outputs=[score_comparison],
+            )
+
+        # back to the (re-ranked) results of the last evaluation
+        results_btn.click(
+            fn=lambda results_df: (
+                (gr.update(), gr.update())
+                if results_df is None or results_df.empty
+                else (gr.update(visible=False), gr.update(visible=True))
+            ),
+            inputs=[eval_results],
+            outputs=[initial_view, results_view],
+        )
+
         back_btn.click(
             fn=lambda: (gr.update(visible=True), gr.update(visible=False)),
             inputs=[],
@@ -0,0 +1,433 @@
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from rezumat.config import config
+from rezumat.evaluators.cascade import get_escalation_check
+from rezumat.evaluators.chains import get_eval_chain
+from rezumat.evaluators.post_analysis import ResultStore, final_results
+from rezumat.models.input_models import CandidateEvaluationWeights
+from rezumat.preprocessing.input_data_processing import (
+    evaluate_cv,
+    get_cascade_graders,
+    get_cv_graders,
+    plan_within_budget,
+)
+from rezumat.preprocessing.parsers.pdf_parser import iter_parsed_pdfs
+from rezumat.utils.candidate_pool import CandidatePool
+from rezumat.utils.estimate_cost import format_estimate
+from rezumat.utils.hashing import content_id, dedupe
+from rezumat.utils.helper import get_job_data
+from rezumat.utils.job_analysis_cache import get_job_analysis_cache
+from rezumat.utils.logger import get_logger
+from rezumat.utils.manifest import RunManifest, new_run_id
+from rezumat.utils.metrics import metrics
+from rezumat.utils.process_jobs import (
+    CV_PROMPT_VERSION,
+    process_all_jobs,
+    retry_dead_letters,
+)
+from rezumat.utils.result_cache import get_result_cache
+from rezumat.utils.token_usage import token_usage
+
+logger = get_logger(__name__)
+
+TEXT_SUFFIXES = (".txt", ".md")
+
+
+def read_job_texts(jobs_dir: Path) -> Dict[str, str]:
+    """{job_text: file name} of every text file in `jobs_dir`"""
+    job_texts = {}
+    for file in sorted(jobs_dir.iterdir()):
+        if file.suffix.lower() in TEXT_SUFFIXES:
+            text = file.read_text(encoding="utf-8").strip()
+            if text:
+                job_texts.setdefault(text, file.name)
+    return job_texts
+
+
+def iter_cv_files(cvs_dir: Path, cv_files: Dict[str, str]) -> Iterator[Tuple[str, str]]:
+    """yield (cv_id, cv_text) for every text file and pdf in `cvs_dir`.
+
+    The file name of every cv is recorded in `cv_files`, keyed by cv_id.
+    """
+    for file in sorted(cvs_dir.iterdir()):
+        if file.suffix.lower() in TEXT_SUFFIXES:
+            text = file.read_text(encoding="utf-8")
+            cv_files.setdefault(content_id(text), file.name)
+            yield content_id(text), text
+    for file, text in iter_parsed_pdfs(cvs_dir):
+        if not text.strip():
+            logger.warning(f"No text could be parsed from {file.name}, skipped.")
+            continue
+        cv_files.setdefault(content_id(text), file.name)
+        yield content_id(text), text
+
+
+def check_output(output: Path) -> None:
+    """raise ValueError when `write_results` could not write `output`, before any
+    llm call is made"""
+    if output.suffix.lower() == ".parquet":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError(
+                f"Writing {output} needs pyarrow (see requirements.txt), "
+                "or use a .csv output"
+            ) from None
+
+
+def write_results(df: pd.DataFrame, output: Path) -> Path:
+    """write the scoring table atomically as parquet or csv, based on the suffix"""
+    tmp_output = output.with_name(f".{output.name}.tmp")
+    if output.suffix.lower() == ".parquet":
+        df.to_parquet(tmp_output, index=False)
+    else:
+        df.to_csv(tmp_output, index=False)
+    os.replace(tmp_output, output)
+    return output
+
+
+def read_results(output: Path) -> pd.DataFrame:
+    """the scoring table written by `write_results`, empty when there is none"""
+    if not output.exists():
+        return pd.DataFrame()
+    if output.suffix.lower() == ".parquet":
+        return pd.read_parquet(output)
+    return pd.read_csv(output, keep_default_na=False, na_values=[""])
+
+
+def scoring_table(
+    store: ResultStore,
+    weights: CandidateEvaluationWeights,
+    job_files: Dict[str, str],
+    cv_files: Dict[str, str],
+) -> pd.DataFrame:
+    df = final_results(store.to_frame(weights)).copy()
+    df.insert(1, "job_file", df["job_id"].map(job_files))
+    df.insert(3, "cv_file", df["cv_id"].map(cv_files))
+    return df.sort_values(
+        ["job_id", "recalibrated_overall_score"], ascending=[True, False]
+    )
+
+
+def run_batch(args: argparse.Namespace) -> pd.DataFrame:
+    """evaluate every cv in `args.cvs` against every job in `args.jobs`.
+
+    With `args.pool`, the CVs of `args.cvs` are added to that candidate pool and
+    every CV of the pool is evaluated.
+    """
+    weights = CandidateEvaluationWeights(
+        technical_skills=args.weights[0],
+        soft_skills=args.weights[1],
+        experience=args.weights[2],
+        education=args.weights[3],
+    )
+    if args.cv_batch_size is not None:
+        config.CV_BATCH_SIZE = args.cv_batch_size
+    if args.top_k is not None:
+        config.SHORTLIST_TOP_K = args.top_k
+    metrics.reset()
+
+    output_dir = Path(args.output_dir)
+    jobs_output_dir = output_dir / "jobs"
+    cv_output_dir = output_dir / "cv"
+    jobs_output_dir.mkdir(parents=True, exist_ok=True)
+    cv_output_dir.mkdir(parents=True, exist_ok=True)
+    output = Path(args.output) if args.output else output_dir / "fit_scores.csv"
+    check_output(output)
+
+    job_texts = read_job_texts(Path(args.jobs))
+    if not job_texts:
+        raise ValueError(f"No job descriptions found in {args.jobs}")
+    logger.info(f"Batch run: {len(job_texts)} jobs, output in {output_dir}.")
+
+    # pre-flight estimate, the model is switched or the run aborted when over budget
+    cv_files = {}
+    cv_tuples = []
+    if args.cvs:
+        cv_tuples = list(iter_cv_files(Path(args.cvs), cv_files))
+    pool = CandidatePool(args.pool) if args.pool else None
+    if pool is not None:
+        added = pool.add_cvs(cv_tuples, source=str(args.cvs))
+        logger.info(f"{added} new CVs added to the candidate pool ({len(pool)} CVs).")
+        cv_tuples = dedupe(cv_tuples + list(pool.iter_cvs()))
+    if not cv_tuples:
+        raise ValueError("No CVs to evaluate, see --cvs and --pool")
+    interface, model, estimate = plan_within_budget(
+        args.interface,
+        args.model,
+        list(job_texts),
+        list(dict(cv_tuples).values()),
+        budget=args.budget,
+        max_concurrency=args.concurrency,
+    )
+    print(f"{interface}/{model}: {format_estimate(estimate)}")
+    if args.estimate_only:
+        return pd.DataFrame()
+
+    # jd stage
+    jd_grader_tuple = get_eval_chain(interface, model, eval_type="jd")
+    memo = get_job_analysis_cache()
+    job_tuples = process_all_jobs(
+        jd_grader_tuple,
+        list(job_texts),
+        jobs_output_dir,
+        max_concurrency=args.concurrency,
+        resume=args.resume,
+        memo=memo,
+    )
+    job_files = {job_id: job_texts[job_text] for job_id, job_text in job_tuples}
+    job_data = get_job_data(
+        job_tuples, jd_grader_tuple[0], jobs_dir=jobs_output_dir, memo=memo
+    )
+
+    # cv stage, results are checkpointed to `output` every `checkpoint_every` rows
+    cv_batch_grader_tuple = None
+    if config.CV_BATCH_SIZE > 1:
+        cv_batch_grader_tuple = get_cv_graders(interface, model, "cv_batch")
+    manifest = RunManifest.for_run(args.run_id or new_run_id(), output_dir / "runs")
+    print(f"run id: {manifest.run_id}")
+    store = ResultStore()
+    try:
+        rows = evaluate_cv(
+            get_cv_graders(interface, model, "cv"),
+            job_data,
+            cv_tuples,
+            cv_batch_grader_tuple,
+            get_cascade_graders(interface, model),
+            get_escalation_check(weights),
+            output_dir=cv_output_dir,
+            max_concurrency=args.concurrency,
+            resume=args.resume,
+            manifest=manifest,
+            pool=pool,
+        )
+        # rows are counted as they arrive: one replacing an earlier result of its
+        # pair does not grow the store
+        checkpointed = 0
+        for count, row in enumerate(rows, 1):
+            store.append_row(row)
+            if args.checkpoint_every and count - checkpointed >= args.checkpoint_every:
+                write_results(
+                    scoring_table(store, weights, job_files, cv_files), output
+                )
+                checkpointed = count
+                logger.info(f"Checkpoint: {len(store)} results written to {output}.")
+
+        with metrics.timer("rezumat_stage_seconds", stage="post_analysis"):
+            df = scoring_table(store, weights, job_files, cv_files)
+            write_results(df, output)
+    finally:
+        manifest.close()
+        cache = get_result_cache()
+        if cache is not None:
+            cache.flush()
+        logger.info(f"token usage: {token_usage.summary()}")
+        metrics.write_run(manifest.run_id, output_dir / "runs")
+    print(f"{len(df)} results for {len(cv_files)} CVs written to {output}")
+    print(f"run {manifest.run_id}: {manifest.summary()}")
+    for key, error in manifest.failed().items():
+        print(f"failed {key}: {error}", file=sys.stderr)
+    return df
+
+
+def run_retry(args: argparse.Namespace) -> None:
+    """re-run the evaluations of a batch run that failed after all retries.
+
+    Recovered cv results are added to the `args.pool` candidate pool, when given,
+    and merged into the `args.output` scoring table.
+    """
+    weights = CandidateEvaluationWeights(
+        technical_skills=args.weights[0],
+        soft_skills=args.weights[1],
+        experience=args.weights[2],
+        education=args.weights[3],
+    )
+    output_dir = Path(args.output_dir)
+    output = Path(args.output) if args.output else output_dir / "fit_scores.csv"
+    check_output(output)
+    pool = CandidatePool(args.pool) if args.pool else None
+
+    # the scoring table of the batch run, to merge the recovered results into
+    table = read_results(output)
+    store = ResultStore()
+    job_files, cv_files = {}, {}
+    for row in table.to_dict("records"):
+        store.append_row(row)
+        job_files[row["job_id"]] = row.get("job_file")
+        cv_files[row["cv_id"]] = row.get("cv_file")
+    # file names of the pairs that are not in the table yet
+    if args.jobs:
+        for job_text, name in read_job_texts(Path(args.jobs)).items():
+            job_files.setdefault(content_id(job_text), name)
+    if args.cvs:
+        for _ in iter_cv_files(Path(args.cvs), cv_files):
+            pass
+
+    recovered = []
+
+    def on_result(job_id, cv_id, model_name, result):
+        if pool is not None:
+            pool.add_result(job_id, cv_id, model_name, result, CV_PROMPT_VERSION)
+        recovered.append((job_id, cv_id, model_name, result))
+
+    # failed batched requests are dead-lettered per cv, with the cv grader's name
+    cv_graders = get_cv_graders(args.interface, args.model, "cv")
+    cv_graders += get_cascade_graders(args.interface, args.model) or []
+    stages = [
+        ("jd", [get_eval_chain(args.interface, args.model, eval_type="jd")], "jobs"),
+        ("cv", cv_graders, "cv"),
+    ]
+    for stage, model_tuples, stage_dir in stages:
+        retried, succeeded = retry_dead_letters(
+            model_tuples,
+            output_dir / stage_dir,
+            max_concurrency=args.concurrency,
+            on_result=on_result,
+        )
+        print(f"{stage}: {succeeded}/{retried} failed evaluations recovered")
+
+    if recovered:
+        for job_id, cv_id, model_name, result in recovered:
+            try:
+                store.append(job_id, cv_id, model_name, result)
+            except Exception as e:
+                logger.error(f"Error parsing result for {job_id}_{cv_id}: {e}")
+        write_results(scoring_table(store, weights, job_files, cv_files), output)
+        print(f"{len(recovered)} recovered results merged into {output}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="rezumat", description=config.TITLE)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("ui", help="launch the gradio app")
+
+    batch = subparsers.add_parser(
+        "batch", help="evaluate a directory of CVs against a directory of JDs"
+    )
+    batch.add_argument("--jobs", required=True, help="directory of JD .txt/.md files")
+    batch.add_argument("--cvs", help="directory of CV .pdf/.txt/.md files")
+    batch.add_argument(
+        "--pool",
+        help="candidate pool (sqlite) that keeps the CVs and results "
+        "across runs; every CV of the pool is evaluated",
+    )
+    batch.add_argument(
+        "--output-dir",
+        default="rezumat_batch",
+        help="directory for the per-pair results, kept between runs for --resume",
+    )
+    batch.add_argument(
+        "--output",
+        help="scoring table, .parquet or .csv (default: OUTPUT_DIR/fit_scores.csv)",
+    )
+    batch.add_argument(
+        "--interface", default="Groq", choices=["Groq", "OpenAI", "Anthropic", "Ollama"]
+    )
+    batch.add_argument("--model", default="llama3-70b-8192")
+    batch.add_argument(
+        "--weights",
+        nargs=4,
+        type=int,
+        default=[60, 10, 20, 10],
+        metavar=("TECHNICAL", "SOFT", "EXPERIENCE", "EDUCATION"),
+        help="category weights, must add up to 100",
+    )
+    batch.add_argument("--concurrency", type=int, default=config.MAX_CONCURRENCY)
+    batch.add_argument("--cv-batch-size", type=int, help="CVs per llm request")
+    batch.add_argument(
+        "--top-k",
+        type=int,
+        help="only evaluate the K CVs most similar to each job (semantic shortlist)",
+    )
+    batch.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=100,
+        help="rewrite the scoring table every N results (0 = only at the end)",
+    )
+    batch.add_argument(
+        "--run-id", help="resume this run (its manifest is in OUTPUT_DIR/runs)"
+    )
+    batch.add_argument(
+        "--budget",
+        type=float,
+        default=config.BUDGET_LIMIT,
+        help="max projected cost in USD, see BUDGET_FALLBACK_MODEL",
+    )
+    batch.add_argument(
+        "--estimate-only",
+        action="store_true",
+        help="print the projected cost and duration without running",
+    )
+    batch.add_argument(
+        "--resume",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="skip jobs and pairs that already have a result in --output-dir or "
+        "--pool (the result cache still answers identical prompts)",
+    )
+
+    retry = subparsers.add_parser(
+        "retry", help="re-run the failed evaluations of a batch run"
+    )
+    retry.add_argument("--output-dir", default="rezumat_batch")
+    retry.add_argument(
+        "--output",
+        help="scoring table of the batch run to update, .parquet or .csv "
+        "(default: OUTPUT_DIR/fit_scores.csv)",
+    )
+    retry.add_argument(
+        "--pool", help="candidate pool (sqlite) of the batch run, to add results to"
+    )
+    retry.add_argument("--jobs", help="JD directory of the batch run, for file names")
+    retry.add_argument("--cvs", help="CV directory of the batch run, for file names")
+    retry.add_argument(
+        "--weights",
+        nargs=4,
+        type=int,
+        default=[60, 10, 20, 10],
+        metavar=("TECHNICAL", "SOFT", "EXPERIENCE", "EDUCATION"),
+        help="category weights of the scoring table, must add up to 100",
+    )
+    retry.add_argument(
+        "--interface", default="Groq", choices=["Groq", "OpenAI", "Anthropic", "Ollama"]
+    )
+    retry.add_argument("--model", default="llama3-70b-8192")
+    retry.add_argument("--concurrency", type=int, default=config.MAX_CONCURRENCY)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+
+    if args.command == "ui":
+        from rezumat.main import main as launch_ui
+
+        launch_ui()
+        return 0
+
+    config.setup()
+
+    try:
+        if args.command == "retry":
+            run_retry(args)
+        else:
+            run_batch(args)
+    except ValueError as e:
+        logger.error(f"{args.command}: {e}")
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,7 +3,7 @@ import shutil
 import sys
 from logging.handlers import RotatingFileHandler
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Literal, Optional, Tuple
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -19,11 +19,131 @@ class Config(BaseSettings):
     ENV_PATH: Path = BASE_DIR / ".env"
     LOG_FILE: Path = BASE_DIR / "logs/evaluation_log.txt"
     LOG_LEVEL: str = "INFO"
-    SLEEP_TIME: float = 2.1  # add a small delay to avoid rate limiting
+    MAX_CONCURRENCY: int = 4  # number of llm calls in flight at the same time
+    RESUME: bool = True  # skip jobs and pairs that already have a result file
+    # wipe the upload and output directories on start (destroys resumable results)
+    RESET_OUTPUT_DIRS: bool = False
+    RUNS_DIR: Path = OUTPUT_DIR / "runs"  # run manifests, one JSONL journal per run
+    RUN_ID: Optional[str] = None  # resume this run, a new run id is created if unset
+
+    # batched cv evaluation: up to CV_BATCH_SIZE resumes per llm request (1 = disabled)
+    CV_BATCH_SIZE: int = 1
+    CV_BATCH_TOKEN_BUDGET: int = 6000  # max resume tokens packed into one request
+
+    # local keyword pre-screen: CVs covering less than PRE_SCREEN_THRESHOLD of the
+    # essential skills are marked unfit without an llm call
+    PRE_SCREEN_ENABLED: bool = False
+    PRE_SCREEN_THRESHOLD: float = 0.3
+
+    # semantic shortlist: only the SHORTLIST_TOP_K CVs most similar to each job are
+    # evaluated by the llm (None = all). Embeddings come from EMBEDDING_MODEL when
+    # sentence-transformers is installed, from word hashing otherwise
+    SHORTLIST_TOP_K: Optional[int] = None
+    EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_DIM: int = 1024  # dimension of the hashing embedder
+    SEMANTIC_IVF_MIN_SIZE: int = 5000  # shared index size from which it is approximate
+    SEMANTIC_NPROBE: int = 8  # clusters scanned per query
+
+    # multi-model ensemble: (interface, model) pairs evaluated next to the selected
+    # model, their scores are combined into an extra "ensemble" result
+    ENSEMBLE_MODELS: List[Tuple[str, str]] = []
+    ENSEMBLE_METHOD: Literal["mean", "median", "trimmed"] = "mean"
+    ENSEMBLE_TRIM: float = 0.2  # fraction cut from each end by the trimmed mean
+    # skip the remaining models once the first two agree within this many points
+    ENSEMBLE_TOLERANCE: Optional[float] = None
+
+    # cascade: a cheap (interface, model) scores every pair first, only "kiv" and
+    # candidates with a recalibrated overall score in CASCADE_BAND are re-scored by
+    # the selected model
+    CASCADE_MODEL: Optional[Tuple[str, str]] = None
+    CASCADE_BAND: Tuple[float, float] = (40.0, 75.0)
+
+    # requests/tokens per minute, keyed by "provider" or "provider/model_id"
+    RATE_LIMITS: Dict[str, Dict[str, int]] = {
+        "groq": {"requests_per_minute": 30, "tokens_per_minute": 6000},
+        "openai": {"requests_per_minute": 500, "tokens_per_minute": 30000},
+        "anthropic": {"requests_per_minute": 50, "tokens_per_minute": 40000},
+    }
+    ESTIMATED_COMPLETION_TOKENS: int = 600  # charged to the tokens-per-minute bucket
+    # max llm calls in flight per "provider" or "provider/model_id", e.g. the parallel
+    # slots of a local server (match OLLAMA_NUM_PARALLEL of `ollama serve`)
+    PARALLEL_SLOTS: Dict[str, int] = {"ollama": 4}
+
+    # local inference with ollama: JSON-constrained decoding, the model is kept
+    # loaded for OLLAMA_KEEP_ALIVE between requests
+    OLLAMA_BASE_URL: str = "http://localhost:11434"
+    OLLAMA_KEEP_ALIVE: str = "30m"
+    OLLAMA_NUM_CTX: int = 8192  # context window, large enough for batched CVs
+    OLLAMA_NUM_THREAD: Optional[int] = None  # cpu threads per request, None = auto
+
+    # pre-flight estimate of the cost and duration of a run, with USD per million
+    # (input, output) tokens keyed by "provider/model_id", model_id or "provider"
+    COST_ESTIMATE_ENABLED: bool = True
+    MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+        "llama3-70b-8192": (0.59, 0.79),
+        "llama3-8b-8192": (0.05, 0.08),
+        "gpt-3.5-turbo": (0.5, 1.5),
+        "gpt-4": (30.0, 60.0),
+        "gpt-4o": (2.5, 10.0),
+        "gpt-4o-mini": (0.15, 0.6),
+        "claude-3-5-sonnet-20240620": (3.0, 15.0),
+        "claude-3-haiku-20240307": (0.25, 1.25),
+        "ollama": (0.0, 0.0),
+    }
+    DEFAULT_MODEL_PRICE: Tuple[float, float] = (5.0, 15.0)
+    ESTIMATED_CALL_SECONDS: float = 8.0  # average llm latency, for the duration
+    # the ui estimates with ESTIMATED_CV_TOKENS per CV, so that parsing still
+    # overlaps the jd stage; exact parses every CV (and counts it) before the run
+    COST_ESTIMATE_EXACT: bool = False
+    ESTIMATED_CV_TOKENS: int = 800
+    # runs projected above BUDGET_LIMIT (USD) switch the selected model to
+    # BUDGET_FALLBACK_MODEL (interface, model), or are aborted if it is over too
+    BUDGET_LIMIT: Optional[float] = None
+    BUDGET_FALLBACK_MODEL: Optional[Tuple[str, str]] = None
+
+    # retries of transient provider errors (429, 5xx, timeouts): full-jitter
+    # exponential backoff, or the provider's Retry-After
+    MAX_RETRIES: int = 4
+    RETRY_BASE_DELAY: float = 1.0
+    RETRY_MAX_DELAY: float = 60.0
+    JSON_RETRIES: int = 2  # re-asks when the model output is not valid JSON
+
+    # persistent cache of llm results, survives restarts (not wiped by setup_directories)
+    RESULT_CACHE_ENABLED: bool = True
+    RESULT_CACHE_PATH: Path = BASE_DIR / "data/cache/results.sqlite"
+    RESULT_CACHE_MAX_BYTES: int = 256 * 1024 * 1024
+
+    # the ui refreshes the counts and top candidates of a running evaluation at
+    # most every STREAM_UPDATE_SECONDS
+    STREAM_UPDATE_SECONDS: float = 1.0
+
+    # persistent memo of job description analyses, keyed by the normalized job
+    # text, model and jd prompt version: known jobs skip the jd stage
+    JOB_ANALYSIS_CACHE_ENABLED: bool = True
+    JOB_ANALYSIS_CACHE_PATH: Path = BASE_DIR / "data/cache/job_analyses.sqlite"
+
+    # persistent pool of parsed CVs and results, survives restarts:
+    # new jobs can be screened against every CV seen before ("Pool" input type)
+    CANDIDATE_POOL_ENABLED: bool = True
+    CANDIDATE_POOL_PATH: Path = BASE_DIR / "data/pool/candidates.sqlite"
+
+    # provider-side prompt prefix caching of the shared cv instructions
+    PROMPT_CACHING: bool = True
+    ANTHROPIC_CACHE_BETA: str = "prompt-caching-2024-07-31"
+
+    PDF_PARSE_BACKEND: Literal["process", "thread"] = "process"
+    PDF_TEXT_CACHE_DIR: Path = BASE_DIR / "data/cache/pdf_text"
 
     TEMPERATURE: float = 0.0
     MAX_TOKENS: int = 8192
 
+    # keep-alive connection pools shared per provider (http/2 when h2 is installed)
+    HTTP2: bool = True
+    HTTP_TIMEOUT: float = 120.0
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_KEEPALIVE_EXPIRY: float = 60.0
+    API_KEY_VERIFY_TTL: float = 900.0  # seconds a verified api key is trusted
+
     GROQ_URL: str = "https://api.groq.com/openai/v1/models"
     OPENAI_URL: str = "https://api.openai.com/v1/models"
     ANTHROPIC_URL: str = "https://api.anthropic.com/v1/models"
@@ -35,13 +155,16 @@ class Config(BaseSettings):
         allow_extra="allow",
     )
 
-    def __init__(self, **data):
-        super().__init__(**data)
+    def setup(self):
+        """Create the directories and the log handlers, once at the start of the app
+        or the cli. Not done on import: spawned worker processes (see
+        `pdf_parser`) import the config too, and must not wipe or log to them."""
         self.setup_directories()
+        self.setup_logging()
 
     def setup_directories(self):
-        # [TODO] come up with a better way to handle this
-        """Create necessary directories, removing existing ones if they exist."""
+        """Create necessary directories, removing existing ones first when
+        RESET_OUTPUT_DIRS is set."""
         directories = [
             self.PDF_UPLOAD_FOLDER,
             self.JOBS_OUTPUT_DIR,
@@ -49,9 +172,10 @@ class Config(BaseSettings):
             self.CSV_OUTPUT_DIR,
         ]
         for directory in directories:
-            if directory.exists():
+            if self.RESET_OUTPUT_DIRS and directory.exists():
                 shutil.rmtree(directory)
             directory.mkdir(parents=True, exist_ok=True)
+        self.RUNS_DIR.mkdir(parents=True, exist_ok=True)
 
     def setup_logging(self, log_file: Optional[Path] = None):
         """Setup logging configuration.
@@ -62,6 +186,9 @@ class Config(BaseSettings):
         log_file = log_file or self.LOG_FILE
         logger = logging.getLogger("[Rezumat]")
         logger.setLevel(logging.DEBUG)
+        if logger.handlers:
+            return logger
+        log_file.parent.mkdir(parents=True, exist_ok=True)
 
         # console handler
         ch = logging.StreamHandler()
@@ -96,5 +223,3 @@ class Config(BaseSettings):
 # global instance of Config
 config = Config()
 config.update_python_path()
-
-logger = config.setup_logging()
@@ -0,0 +1,47 @@
+from typing import Callable, Optional, Tuple
+
+from rezumat.config import config
+from rezumat.evaluators.two_stage_evaluators import SCORE_CATEGORIES, validate_cv_result
+from rezumat.models.input_models import CandidateEvaluationWeights
+from rezumat.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def recalibrated_overall_score(
+    result: dict, weights: CandidateEvaluationWeights
+) -> float:
+    """weighted recalibrated score of a cv result, as in `post_analysis.apply_weights`"""
+    return (
+        sum(
+            result["recalibrated_scores"][category] * getattr(weights, category)
+            for category in SCORE_CATEGORIES
+        )
+        / 100.0
+    )
+
+
+def needs_escalation(
+    result: dict,
+    weights: CandidateEvaluationWeights,
+    band: Optional[Tuple[float, float]] = None,
+) -> bool:
+    """whether a cheap model result is too uncertain to keep.
+
+    Invalid results, "kiv" candidates and candidates whose recalibrated overall
+    score falls in the uncertainty `band` (default `config.CASCADE_BAND`) are
+    re-scored by the strong model.
+    """
+    if not validate_cv_result(result):
+        return True
+    if str(result["assessment"]["suitability"]).lower() == "kiv":
+        return True
+    low, high = band or config.CASCADE_BAND
+    return low <= recalibrated_overall_score(result, weights) <= high
+
+
+def get_escalation_check(
+    weights: CandidateEvaluationWeights,
+    band: Optional[Tuple[float, float]] = None,
+) -> Callable[[dict], bool]:
+    return lambda result: needs_escalation(result, weights, band)
@@ -1,21 +1,69 @@
 import os
-from typing import Tuple
+from typing import Optional, Tuple
 
 from langchain_anthropic import ChatAnthropic
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompt_values import ChatPromptValue, PromptValue
 from langchain_core.prompts import PromptTemplate
+from langchain_core.runnables import Runnable, RunnableLambda
 from langchain_core.runnables.base import RunnableSequence
 from langchain_groq import ChatGroq
 from langchain_ollama import ChatOllama
 from langchain_openai import ChatOpenAI
 
 from rezumat.config import config
-from rezumat.prompts.two_stage_eval_cv import TWO_STAGE_EVAL_CV_PROMPT
+from rezumat.prompts.two_stage_eval_cv import (
+    TWO_STAGE_EVAL_CV_JOB_PROMPT,
+    TWO_STAGE_EVAL_CV_PROMPT,
+    TWO_STAGE_EVAL_CV_RESUME_PROMPT,
+    TWO_STAGE_EVAL_CV_SYSTEM_PROMPT,
+)
+from rezumat.prompts.two_stage_eval_cv_batch import (
+    TWO_STAGE_EVAL_CV_BATCH_PROMPT,
+    TWO_STAGE_EVAL_CV_BATCH_RESUMES_PROMPT,
+)
 from rezumat.prompts.two_stage_eval_jd import TWO_STAGE_EVAL_JD_PROMPT
+from rezumat.utils.clients import (
+    get_async_http_client,
+    get_http_client,
+    get_or_create_model,
+)
+from rezumat.utils.estimate_cost import count_tokens
 from rezumat.utils.logger import get_logger
+from rezumat.utils.metrics import metrics
+from rezumat.utils.rate_limiter import (
+    RateLimiter,
+    SlotLimiter,
+    get_rate_limiter,
+    get_slot_limiter,
+)
+from rezumat.utils.result_cache import ResultCache, get_result_cache, make_cache_key
+from rezumat.utils.retry import with_retry
+from rezumat.utils.token_usage import token_usage
 
 logger = get_logger(__name__)
 
+MODEL_CLASSES = {
+    "groq": ChatGroq,
+    "openai": ChatOpenAI,
+    "anthropic": ChatAnthropic,
+    "ollama": ChatOllama,
+}
+
+
+def model_label(model_text: str, model_id: str) -> str:
+    """name used for result files, e.g. "groq-llama3-70b-8192".
+
+    Result files are named `{job_id}_{cv_id}_{model_label}.json`, so the label must
+    not contain underscores (or path separators).
+    """
+    label = f"{model_text.lower()}-{model_id}"
+    for char in "_/:":
+        label = label.replace(char, "-")
+    return label
+
 
 def get_model(
     model_text: str,
@@ -24,31 +72,304 @@ def get_model(
     max_tokens: int = 2048,
     api_key: str = None,
 ) -> Tuple[str, RunnableSequence]:
-    """get model based on the input data"""
+    """get model based on the input data.
 
-    model_classes = {
-        "groq": ChatGroq,
-        "openai": ChatOpenAI,
-        "anthropic": ChatAnthropic,
-        "ollama": ChatOllama,
-    }
+    Models are created once per process (and api key) and shared by every grader,
+    together with their keep-alive connection pools, see `utils.clients`.
+    """
 
     model_text = model_text.lower()
-    model_class = model_classes.get(model_text)
-
-    if model_class is None:
+    if model_text not in MODEL_CLASSES:
         raise ValueError(f"Invalid model text: {model_text}")
 
     # use the api key from the environment variables
     api_key = os.environ.get(f"{model_text.upper()}_API_KEY")
 
+    return get_or_create_model(
+        (model_text, model_id, temperature, max_tokens, api_key),
+        lambda: _create_model(model_text, model_id, temperature, max_tokens, api_key),
+    )
+
+
+def _create_model(
+    model_text: str,
+    model_id: str,
+    temperature: float,
+    max_tokens: int,
+    api_key: Optional[str],
+):
+    model_class = MODEL_CLASSES[model_text]
+    logger.info(f"Creating model client {model_text}/{model_id}")
+
+    if model_text == "ollama":
+        # local server: no api key, JSON-constrained decoding, and the model stays
+        # loaded between requests
+        return model_class(
+            model=model_id,
+            temperature=temperature,
+            num_predict=max_tokens,
+            format="json",
+            keep_alive=config.OLLAMA_KEEP_ALIVE,
+            num_ctx=config.OLLAMA_NUM_CTX,
+            num_thread=config.OLLAMA_NUM_THREAD,
+            base_url=config.OLLAMA_BASE_URL,
+        )
+
+    # transient errors are retried by `with_retry` (through the throttle), not by
+    # the sdk on top of it
+    kwargs = {"max_retries": 0}
+    if model_text == "anthropic" and config.PROMPT_CACHING:
+        kwargs["default_headers"] = {"anthropic-beta": config.ANTHROPIC_CACHE_BETA}
+    if model_text in ("groq", "openai"):
+        # the anthropic sdk does not take an http client, its pool lives in the
+        # shared model instance
+        kwargs["http_client"] = get_http_client(model_text)
+        kwargs["http_async_client"] = get_async_http_client(model_text)
+
     model = model_class(
-        model=model_id, temperature=temperature, max_tokens=max_tokens, api_key=api_key
+        model=model_id,
+        temperature=temperature,
+        max_tokens=max_tokens,
+        api_key=api_key,
+        **kwargs,
     )
 
     return model
 
 
+def prompt_text(prompt_value: PromptValue) -> str:
+    """plain text of a prompt, including messages made of content blocks"""
+    texts = []
+    for message in prompt_value.to_messages():
+        if isinstance(message.content, str):
+            texts.append(message.content)
+        else:
+            texts.extend(
+                block.get("text", "")
+                for block in message.content
+                if isinstance(block, dict)
+            )
+    return "\n".join(texts)
+
+
+def get_cv_prompt(
+    model_text: str, resume_template: str = TWO_STAGE_EVAL_CV_RESUME_PROMPT
+) -> RunnableLambda:
+    """build the cv evaluation messages with a stable, cacheable prefix.
+
+    The recruiter instructions and the job requirements go into the system message,
+    identical for every resume of a job, and the resume into the user message (the
+    resumes of a batch with `TWO_STAGE_EVAL_CV_BATCH_RESUMES_PROMPT`). For Anthropic
+    both system blocks are marked with `cache_control`; OpenAI caches identical
+    prefixes automatically.
+    """
+    instructions = PromptTemplate.from_template(
+        TWO_STAGE_EVAL_CV_SYSTEM_PROMPT
+    ).format()
+    job_prompt = PromptTemplate.from_template(TWO_STAGE_EVAL_CV_JOB_PROMPT)
+    resume_prompt = PromptTemplate.from_template(resume_template)
+    mark_cache = config.PROMPT_CACHING and model_text.lower() == "anthropic"
+
+    def build_messages(inputs: dict) -> ChatPromptValue:
+        prefix = [
+            instructions,
+            job_prompt.format(job_requirements=inputs["job_requirements"]),
+        ]
+        if mark_cache:
+            system_message = SystemMessage(
+                content=[
+                    {
+                        "type": "text",
+                        "text": text,
+                        "cache_control": {"type": "ephemeral"},
+                    }
+                    for text in prefix
+                ]
+            )
+        else:
+            system_message = SystemMessage(content="".join(prefix))
+
+        return ChatPromptValue(
+            messages=[
+                system_message,
+                HumanMessage(
+                    content=resume_prompt.format(
+                        **{name: inputs[name] for name in resume_prompt.input_variables}
+                    )
+                ),
+            ]
+        )
+
+    return RunnableLambda(build_messages, name="cv_prompt")
+
+
+def get_usage_recorder(model_name: str) -> RunnableLambda:
+    """a pass-through step that records the token usage (incl. cached prompt tokens)"""
+
+    def record_usage(message: AIMessage) -> AIMessage:
+        counts = token_usage.record(model_name, message)
+        metrics.inc("rezumat_llm_calls_total", model=model_name)
+        for token_type, count in counts.items():
+            metrics.inc(
+                "rezumat_tokens_total", count, model=model_name, type=token_type
+            )
+        return message
+
+    async def arecord_usage(message: AIMessage) -> AIMessage:
+        return record_usage(message)
+
+    return RunnableLambda(record_usage, afunc=arecord_usage, name="record_usage")
+
+
+def get_throttle(
+    rate_limiter: RateLimiter,
+    completion_tokens: Optional[int] = None,
+    model_name: str = "",
+) -> RunnableLambda:
+    """a pass-through step that waits for the rate limiter before the model is called.
+
+    The tokens-per-minute bucket is charged with the prompt tokens plus
+    `completion_tokens` (default `config.ESTIMATED_COMPLETION_TOKENS`) for the
+    expected completion.
+    """
+    completion_tokens = completion_tokens or config.ESTIMATED_COMPLETION_TOKENS
+
+    def estimate_tokens(prompt_value: PromptValue) -> int:
+        return count_tokens(prompt_text(prompt_value)) + completion_tokens
+
+    def throttle(prompt_value: PromptValue) -> PromptValue:
+        wait = rate_limiter.acquire(estimate_tokens(prompt_value))
+        metrics.observe(
+            "rezumat_queue_wait_seconds", wait, queue="rate_limit", model=model_name
+        )
+        return prompt_value
+
+    async def athrottle(prompt_value: PromptValue) -> PromptValue:
+        wait = await rate_limiter.aacquire(estimate_tokens(prompt_value))
+        metrics.observe(
+            "rezumat_queue_wait_seconds", wait, queue="rate_limit", model=model_name
+        )
+        return prompt_value
+
+    return RunnableLambda(throttle, afunc=athrottle, name="throttle")
+
+
+def with_slots(
+    runnable: Runnable, slot_limiter: SlotLimiter, model_name: str = ""
+) -> RunnableLambda:
+    """wrap the model call so that it holds one of the slots of `slot_limiter`"""
+
+    def invoke(inputs):
+        wait = slot_limiter.acquire()
+        metrics.observe(
+            "rezumat_queue_wait_seconds", wait, queue="slots", model=model_name
+        )
+        try:
+            return runnable.invoke(inputs)
+        finally:
+            slot_limiter.release()
+
+    async def ainvoke(inputs):
+        wait = await slot_limiter.aacquire()
+        metrics.observe(
+            "rezumat_queue_wait_seconds", wait, queue="slots", model=model_name
+        )
+        try:
+            return await runnable.ainvoke(inputs)
+        finally:
+            slot_limiter.release()
+
+    return RunnableLambda(invoke, afunc=ainvoke, name="slots")
+
+
+def with_json_repair(
+    call_model: Runnable,
+    parser: Runnable,
+    max_retries: Optional[int] = None,
+    name: str = "json",
+) -> RunnableLambda:
+    """call the model on a prompt and parse its JSON reply.
+
+    A reply that does not parse is sent back to the model with the parser error and
+    an instruction to answer with valid JSON only, up to `max_retries` (default
+    `config.JSON_RETRIES`) times; the same prompt would get the same reply at
+    temperature 0. The last parser error is raised.
+    """
+    max_retries = config.JSON_RETRIES if max_retries is None else max_retries
+
+    def repair_prompt(
+        prompt_value: PromptValue, message: AIMessage, error: OutputParserException
+    ) -> ChatPromptValue:
+        metrics.inc("rezumat_retries_total", retry=name)
+        logger.warning(f"{name}: the reply is not valid JSON ({error}), repairing.")
+        return ChatPromptValue(
+            messages=[
+                *prompt_value.to_messages(),
+                AIMessage(content=message.content),
+                HumanMessage(
+                    content=f"Your reply could not be parsed: {error}. Reply with "
+                    "only the corrected JSON object, without any other text."
+                ),
+            ]
+        )
+
+    def invoke(prompt_value: PromptValue) -> dict:
+        for attempt in range(max_retries + 1):
+            message = call_model.invoke(prompt_value)
+            try:
+                return parser.invoke(message)
+            except OutputParserException as e:
+                if attempt >= max_retries:
+                    raise
+                prompt_value = repair_prompt(prompt_value, message, e)
+
+    async def ainvoke(prompt_value: PromptValue) -> dict:
+        for attempt in range(max_retries + 1):
+            message = await call_model.ainvoke(prompt_value)
+            try:
+                return await parser.ainvoke(message)
+            except OutputParserException as e:
+                if attempt >= max_retries:
+                    raise
+                prompt_value = repair_prompt(prompt_value, message, e)
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=name)
+
+
+def with_result_cache(
+    grader: RunnableSequence,
+    cache: ResultCache,
+    template: str,
+    model_id: str,
+    temperature: float,
+) -> RunnableLambda:
+    """wrap `grader` so that results are looked up in `cache` before calling the llm.
+
+    Cache hits skip the rate limiter and the provider call entirely.
+    """
+
+    def cache_key(inputs: dict) -> str:
+        return make_cache_key(template, model_id, temperature, inputs)
+
+    def invoke(inputs: dict) -> dict:
+        key = cache_key(inputs)
+        result = cache.get(key)
+        if result is None:
+            result = grader.invoke(inputs)
+            cache.set(key, result)
+        return result
+
+    async def ainvoke(inputs: dict) -> dict:
+        key = cache_key(inputs)
+        result = cache.get(key)
+        if result is None:
+            result = await grader.ainvoke(inputs)
+            cache.set(key, result)
+        return result
+
+    return RunnableLambda(invoke, afunc=ainvoke, name="cached_grader")
+
+
 def get_eval_chain(
     model_text: str, model_id: str, api_key: str = None, eval_type: str = "jd"
 ):
@@ -63,25 +384,62 @@ def get_eval_chain(
         api_key=api_key,
     )
 
+    # eval type -> (prompt, template text used in the result cache key)
     eval_prompts = {
-        "jd": PromptTemplate(
-            input_variables=["job_description"], template=TWO_STAGE_EVAL_JD_PROMPT
+        "jd": (
+            PromptTemplate(
+                input_variables=["job_description"], template=TWO_STAGE_EVAL_JD_PROMPT
+            ),
+            TWO_STAGE_EVAL_JD_PROMPT,
         ),
-        "cv": PromptTemplate(
-            input_variables=["job_requirements", "resume"],
-            template=TWO_STAGE_EVAL_CV_PROMPT,
+        "cv": (get_cv_prompt(model_text), TWO_STAGE_EVAL_CV_PROMPT),
+        # several resumes per request, see `two_stage_eval_cv_batch`
+        "cv_batch": (
+            get_cv_prompt(model_text, TWO_STAGE_EVAL_CV_BATCH_RESUMES_PROMPT),
+            TWO_STAGE_EVAL_CV_BATCH_PROMPT,
         ),
     }
 
-    eval_prompt = eval_prompts.get(eval_type)
-
-    if eval_prompt is None:
+    if eval_type not in eval_prompts:
         raise ValueError("Invalid type")
 
-    grader = eval_prompt | model | JsonOutputParser()
+    eval_prompt, template = eval_prompts[eval_type]
+    name = model_label(model_text, model_id)
+
+    completion_tokens = config.ESTIMATED_COMPLETION_TOKENS
+    if eval_type == "cv_batch":
+        completion_tokens *= config.CV_BATCH_SIZE
+
+    throttle = get_throttle(
+        get_rate_limiter(model_text, model_id), completion_tokens, model_name=name
+    )
+    # transient provider errors are retried with backoff (through the throttle
+    # again), output that is not valid JSON is sent back to be repaired
+    timed_model = metrics.timed(model, "rezumat_llm_latency_seconds", model=name)
+    slot_limiter = get_slot_limiter(model_text, model_id)
+    if slot_limiter is not None:
+        timed_model = with_slots(timed_model, slot_limiter, model_name=name)
+    call_model = with_retry(throttle | timed_model, name=f"{name} call")
+    parser = metrics.timed(JsonOutputParser(), "rezumat_parse_seconds", model=name)
+    grader = eval_prompt | with_json_repair(
+        call_model | get_usage_recorder(name), parser, name=f"{name} json"
+    )
+
+    cache = get_result_cache()
+    # job analyses are memoized by the job analysis cache when it is enabled
+    if cache is not None and not (
+        eval_type == "jd" and config.JOB_ANALYSIS_CACHE_ENABLED
+    ):
+        grader = with_result_cache(
+            grader,
+            cache,
+            template=template,
+            model_id=f"{model_text}/{model_id}",
+            temperature=config.TEMPERATURE,
+        )
 
     logger.info(
         f"The eval_chain has been created. Model: {model_text}, Eval Type: {eval_type}"
     )
 
-    return (model_text, grader)
+    return (name, grader)
@@ -0,0 +1,124 @@
+from collections import Counter
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from rezumat.config import config
+from rezumat.evaluators.two_stage_evaluators import (
+    SCORE_CATEGORIES,
+    validate_cv_result,
+)
+from rezumat.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# model name of the combined result, saved as `{job_id}_{cv_id}_ensemble.json`
+ENSEMBLE_NAME = "ensemble"
+
+
+def combine_scores(
+    values: List[float], method: str = "mean", trim: Optional[float] = None
+) -> float:
+    """combine the scores of several models with "mean", "median" or "trimmed" mean"""
+    values = np.sort(np.asarray(values, dtype=float))
+    if method == "median":
+        return float(np.median(values))
+    if method == "trimmed":
+        trim = config.ENSEMBLE_TRIM if trim is None else trim
+        cut = int(len(values) * trim)
+        if cut and len(values) > 2 * cut:
+            values = values[cut:-cut]
+    elif method != "mean":
+        raise ValueError(f"Invalid ensemble method: {method}")
+    return float(values.mean())
+
+
+def disagreement(model_results: Dict[str, dict]) -> Dict[str, float]:
+    """spread (max - min) of the recalibrated score of every category across models"""
+    results = [r for r in model_results.values() if validate_cv_result(r)]
+    if not results:
+        return {}
+    return {
+        category: float(
+            np.ptp([result["recalibrated_scores"][category] for result in results])
+        )
+        for category in SCORE_CATEGORIES
+    }
+
+
+def models_agree(model_results: Dict[str, dict], tolerance: float) -> bool:
+    """whether at least two valid results agree on every category within `tolerance`"""
+    valid = [r for r in model_results.values() if validate_cv_result(r)]
+    if len(valid) < 2:
+        return False
+    suitability = {str(r["assessment"]["suitability"]).lower() for r in valid}
+    spread = disagreement(model_results)
+    return len(suitability) == 1 and max(spread.values()) <= tolerance
+
+
+def combine_results(
+    model_results: Dict[str, dict], method: str = "mean", trim: Optional[float] = None
+) -> Optional[dict]:
+    """combine the results of several models into one result of the same shape.
+
+    Category scores are combined with `combine_scores`, suitability is a majority
+    vote ("kiv" on a tie), strengths and concerns come from the model closest to
+    the combined scores. The per-category disagreement is reported under
+    "ensemble". Returns None without any valid result.
+    """
+    valid = {
+        name: result
+        for name, result in model_results.items()
+        if name != ENSEMBLE_NAME and validate_cv_result(result)
+    }
+    if not valid:
+        return None
+
+    def combine(get_scores):
+        return {
+            category: combine_scores(
+                [get_scores(result)[category] for result in valid.values()],
+                method,
+                trim,
+            )
+            for category in SCORE_CATEGORIES
+        }
+
+    original = combine(lambda result: result["resume_evaluation"]["original_scores"])
+    recalibrated = combine(lambda result: result["recalibrated_scores"])
+
+    votes = Counter(
+        str(result["assessment"]["suitability"]).lower() for result in valid.values()
+    ).most_common()
+    suitability = votes[0][0]
+    if len(votes) > 1 and votes[0][1] == votes[1][1]:
+        suitability = "kiv"
+
+    closest = min(
+        valid.values(),
+        key=lambda result: sum(
+            abs(result["recalibrated_scores"][category] - recalibrated[category])
+            for category in SCORE_CATEGORIES
+        ),
+    )
+    inferred_experience = []
+    for result in valid.values():
+        for item in result["deeper_analysis"].get("inferred_experience", []):
+            if item not in inferred_experience:
+                inferred_experience.append(item)
+
+    return {
+        "resume_evaluation": {"original_scores": original},
+        "deeper_analysis": {"inferred_experience": inferred_experience},
+        "recalibrated_scores": recalibrated,
+        "assessment": {
+            "suitability": suitability,
+            "strengths": closest["assessment"].get("strengths", ""),
+            "concerns": closest["assessment"].get("concerns", ""),
+        },
+        "ensemble": {
+            "method": method,
+            "models": list(valid),
+            "disagreement": disagreement(valid),
+        },
+    }
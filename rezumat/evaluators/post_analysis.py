@@ -1,106 +1,203 @@
 import json
+import threading
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Optional, Tuple, Union
 
+import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
+from rezumat.evaluators.ensemble import ENSEMBLE_NAME
+from rezumat.models.input_models import CandidateEvaluationWeights
 from rezumat.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 
+def parse_result(job_id: str, cv_id: str, model_name: str, result: dict) -> dict:
+    """flatten a single cv evaluation result into a row of the scoring table"""
+    return {
+        "job_id": job_id,
+        "cv_id": cv_id,
+        "model_name": model_name,
+        "original_technical_skills": result["resume_evaluation"]["original_scores"].get(
+            "technical_skills", None
+        ),
+        "original_soft_skills": result["resume_evaluation"]["original_scores"].get(
+            "soft_skills", None
+        ),
+        "original_experience": result["resume_evaluation"]["original_scores"].get(
+            "experience", None
+        ),
+        "original_education": result["resume_evaluation"]["original_scores"].get(
+            "education", None
+        ),
+        "recalibrated_technical_skills": result["recalibrated_scores"].get(
+            "technical_skills", None
+        ),
+        "recalibrated_soft_skills": result["recalibrated_scores"].get(
+            "soft_skills", None
+        ),
+        "recalibrated_experience": result["recalibrated_scores"].get(
+            "experience", None
+        ),
+        "recalibrated_education": result["recalibrated_scores"].get("education", None),
+        "inferred_experience": ", ".join(
+            result["deeper_analysis"].get("inferred_experience", [])
+        ),
+        "suitability": result["assessment"].get("suitability", None),
+        "strengths": result["assessment"].get("strengths", None),
+        "concerns": result["assessment"].get("concerns", None),
+    }
+
+
+SKILLS = ["technical_skills", "soft_skills", "experience", "education"]
+SCORE_TYPES = ["original", "recalibrated"]
+SCORE_COLUMNS = [
+    f"{score_type}_{skill}" for score_type in SCORE_TYPES for skill in SKILLS
+]
+KEY_COLUMNS = ["job_id", "cv_id", "model_name"]
+TEXT_COLUMNS = ["inferred_experience", "suitability", "strengths", "concerns"]
+
+
+def _score(value, column: str, key: tuple) -> float:
+    """the score as a float, NaN when it is missing or not a number"""
+    if value is None:
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        logger.warning(f"Non-numeric {column} {value!r} for {key}, stored as NaN")
+        return np.nan
+
+
+def weight_matrix(weights: CandidateEvaluationWeights) -> np.ndarray:
+    """(score columns x score types) matrix, so that scores @ matrix = overall scores"""
+    matrix = np.zeros((len(SCORE_COLUMNS), len(SCORE_TYPES)))
+    for i, score_type in enumerate(SCORE_TYPES):
+        for j, skill in enumerate(SKILLS):
+            matrix[i * len(SKILLS) + j, i] = getattr(weights, skill) / 100.0
+    return matrix
+
+
+class ResultStore:
+    """Columnar in-memory table of cv evaluation results.
+
+    Scores live in a single float matrix (one column per `SCORE_COLUMNS`), so the
+    overall scores for any weights are one matrix product, without touching the
+    result files. Appending a (job_id, cv_id, model_name) that is already stored
+    replaces its row.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+        self._scores = np.full((capacity, len(SCORE_COLUMNS)), np.nan)
+        self._columns = {column: [] for column in KEY_COLUMNS + TEXT_COLUMNS}
+        self._index: Dict[Tuple[str, str, str], int] = {}
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    @property
+    def scores(self) -> np.ndarray:
+        return self._scores[: len(self)]
+
+    def append(self, job_id: str, cv_id: str, model_name: str, result: dict) -> None:
+        self.append_row(parse_result(job_id, cv_id, model_name, result))
+
+    def append_row(self, row: dict) -> None:
+        key = tuple(row[column] for column in KEY_COLUMNS)
+        scores = [_score(row[column], column, key) for column in SCORE_COLUMNS]
+        with self._lock:
+            i = self._index.get(key)
+            if i is None:
+                i = len(self._index)
+                if i == len(self._scores):
+                    self._scores = np.concatenate(
+                        [self._scores, np.full_like(self._scores, np.nan)]
+                    )
+                self._index[key] = i
+                for column in KEY_COLUMNS + TEXT_COLUMNS:
+                    self._columns[column].append(row[column])
+            else:
+                for column in TEXT_COLUMNS:
+                    self._columns[column][i] = row[column]
+            self._scores[i] = scores
+
+    def fit_scores(self, weights: CandidateEvaluationWeights) -> np.ndarray:
+        """(rows x 2) original and recalibrated overall scores"""
+        return self.scores @ weight_matrix(weights)
+
+    def to_frame(
+        self, weights: Optional[CandidateEvaluationWeights] = None
+    ) -> pd.DataFrame:
+        """the results as a scoring table, with the overall scores when weighted"""
+        with self._lock:
+            n = len(self)
+            df = pd.DataFrame(
+                {column: self._columns[column][:n] for column in KEY_COLUMNS}
+            )
+            df[SCORE_COLUMNS] = self._scores[:n]
+            for column in TEXT_COLUMNS:
+                df[column] = self._columns[column][:n]
+        if weights is not None:
+            overall = df[SCORE_COLUMNS].to_numpy() @ weight_matrix(weights)
+            for i, score_type in enumerate(SCORE_TYPES):
+                df[f"{score_type}_overall_score"] = overall[:, i]
+        return df
+
+    @classmethod
+    def from_folder(cls, eval_results_folder: Union[str, Path]) -> "ResultStore":
+        """load every `{job_id}_{cv_id}_{model_name}.json` result file"""
+        files = list(Path(eval_results_folder).glob("*.json"))
+        store = cls(capacity=max(len(files), 1))
+
+        for file in tqdm(files, desc="Evaluating results"):
+            try:
+                job_id, cv_id, model_name = file.stem.split("_")
+                with open(file, "r") as f:
+                    store.append(job_id, cv_id, model_name, json.load(f))
+            except Exception as e:
+                logger.error(f"Error processing {file}: {e}")
+        return store
+
+
 def resume_evaluation(eval_results_folder: str) -> pd.DataFrame:
 
     logger.info("Start resume evaluation.")
 
-    results = []
-    errors = []
-
-    for file in tqdm(
-        Path(eval_results_folder).glob("*.json"),
-        total=len(list(Path(eval_results_folder).glob("*.json"))),
-        desc="Evaluating results",
-    ):
-        try:
-            file_name = file.stem
-            job_id, cv_id, model_name = file_name.split("_")
-            with open(file, "r") as f:
-                result = json.load(f)
-
-            data = {
-                "job_id": job_id,
-                "cv_id": cv_id,
-                "model_name": model_name,
-                "original_technical_skills": result["resume_evaluation"][
-                    "original_scores"
-                ].get("technical_skills", None),
-                "original_soft_skills": result["resume_evaluation"][
-                    "original_scores"
-                ].get("soft_skills", None),
-                "original_experience": result["resume_evaluation"][
-                    "original_scores"
-                ].get("experience", None),
-                "original_education": result["resume_evaluation"][
-                    "original_scores"
-                ].get("education", None),
-                "recalibrated_technical_skills": result["recalibrated_scores"].get(
-                    "technical_skills", None
-                ),
-                "recalibrated_soft_skills": result["recalibrated_scores"].get(
-                    "soft_skills", None
-                ),
-                "recalibrated_experience": result["recalibrated_scores"].get(
-                    "experience", None
-                ),
-                "recalibrated_education": result["recalibrated_scores"].get(
-                    "education", None
-                ),
-                "inferred_experience": ", ".join(
-                    result["deeper_analysis"].get("inferred_experience", [])
-                ),
-                "suitability": result["assessment"].get("suitability", None),
-                "strengths": result["assessment"].get("strengths", None),
-                "concerns": result["assessment"].get("concerns", None),
-            }
-
-            results.append(data)
-        except Exception as e:
-            errors.append({"file": str(file), "error": str(e)})
-            logger.error(f"Error processing {file}: {e}")
-
-    # Convert results to a DataFrame
-    df = pd.DataFrame(results)
+    return ResultStore.from_folder(eval_results_folder).to_frame()
+
 
+def apply_weights(
+    df: pd.DataFrame, weights: CandidateEvaluationWeights
+) -> pd.DataFrame:
+    """add the weighted `original_overall_score` and `recalibrated_overall_score`"""
+    overall = df[SCORE_COLUMNS].to_numpy(dtype=float) @ weight_matrix(weights)
+    for i, score_type in enumerate(SCORE_TYPES):
+        df[f"{score_type}_overall_score"] = overall[:, i]
     return df
 
 
+def final_results(df: pd.DataFrame) -> pd.DataFrame:
+    """the rows candidates are ranked on: with several models, the ensemble result
+    of every pair that has one"""
+    is_ensemble = df["model_name"] == ENSEMBLE_NAME
+    has_ensemble = is_ensemble.groupby([df["job_id"], df["cv_id"]]).transform("any")
+    return df[is_ensemble | ~has_ensemble]
+
+
 def calculate_fit_scores(
-    eval_results_folder: str, weights: Dict[str, float]
+    eval_results: Union[str, Path, ResultStore], weights: CandidateEvaluationWeights
 ) -> pd.DataFrame:
+    """weighted scoring table of a result store, or of the result files in a folder"""
 
     logger.info(
         f"""Calculating fit scores based on the weights. "technical_skills": {weights.technical_skills}, 
         "soft_skills": {weights.soft_skills}, "experience": {weights.experience}, "education": {weights.education}."""
     )
 
-    df = resume_evaluation(eval_results_folder)
-
-    weights = {
-        "technical_skills": weights.technical_skills,
-        "soft_skills": weights.soft_skills,
-        "experience": weights.experience,
-        "education": weights.education,
-    }
+    if not isinstance(eval_results, ResultStore):
+        eval_results = ResultStore.from_folder(eval_results)
 
-    # Define score types
-    score_types = ["original", "recalibrated"]
-
-    # Calculate overall scores using pandas' dot product
-    for score_type in score_types:
-        columns = [f"{score_type}_{skill}" for skill in weights.keys()]
-        df[score_type + "_overall_score"] = (
-            df[columns].values.dot(pd.Series(weights).values) / 100.0
-        )
-
-    return df
+    return eval_results.to_frame(weights)
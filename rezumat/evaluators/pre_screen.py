@@ -0,0 +1,140 @@
+import re
+from typing import Dict, List, Optional, Set, Tuple
+
+from rezumat.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# common alternative spellings, matched in both directions
+SKILL_ALIASES: Dict[str, List[str]] = {
+    "javascript": ["js", "ecmascript"],
+    "typescript": ["ts"],
+    "python": ["py"],
+    "golang": ["go"],
+    "kubernetes": ["k8s"],
+    "postgresql": ["postgres", "psql"],
+    "machine learning": ["ml"],
+    "deep learning": ["dl"],
+    "natural language processing": ["nlp"],
+    "computer vision": ["cv"],
+    "artificial intelligence": ["ai"],
+    "amazon web services": ["aws"],
+    "google cloud platform": ["gcp", "google cloud"],
+    "microsoft azure": ["azure"],
+    "continuous integration": ["ci", "ci/cd"],
+    "large language models": ["llm", "llms"],
+    "react": ["reactjs", "react.js"],
+    "node.js": ["node", "nodejs"],
+}
+
+# words that describe a requirement rather than name a skill
+STOPWORDS: Set[str] = {
+    "a", "an", "and", "or", "the", "of", "in", "on", "with", "for", "to", "as",
+    "at", "least", "years", "year", "yrs", "experience", "experienced", "strong",
+    "good", "solid", "deep", "proven", "knowledge", "understanding", "proficiency",
+    "proficient", "familiarity", "familiar", "skills", "skill", "ability", "using",
+    "hands", "working", "degree", "plus", "e", "g", "eg", "etc", "such", "like",
+    "similar", "related", "relevant", "tools", "technologies", "frameworks",
+}  # fmt: skip
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#./]*")
+
+
+def _normalize(text: str) -> str:
+    return " ".join(TOKEN_PATTERN.findall(text.lower()))
+
+
+def _tokens(text: str) -> Set[str]:
+    tokens = set()
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        tokens.add(token)
+        tokens.add(token.rstrip("."))
+    return tokens
+
+
+def _aliases(phrase: str) -> List[str]:
+    aliases = [phrase]
+    for skill, skill_aliases in SKILL_ALIASES.items():
+        if phrase == skill:
+            aliases.extend(skill_aliases)
+        elif phrase in skill_aliases:
+            aliases.append(skill)
+    return aliases
+
+
+def skill_matches(skill: str, cv_text: str, cv_tokens: Set[str]) -> bool:
+    """whether the cv mentions the skill, one of its aliases or one of its keywords"""
+    phrase = _normalize(skill)
+    for alias in _aliases(phrase):
+        if " " in alias:
+            if f" {alias} " in f" {cv_text} ":
+                return True
+        elif alias in cv_tokens:
+            return True
+
+    # requirements are often phrases ("3+ years of experience with Python or Java"),
+    # fall back to their keywords
+    keywords = [
+        token
+        for token in phrase.split()
+        if token not in STOPWORDS and len(token) > 1 and re.search("[a-z]", token)
+    ]
+    return any(
+        alias in cv_tokens for keyword in keywords for alias in _aliases(keyword)
+    )
+
+
+def skill_coverage(
+    essential_skills: List[str], cv_text: str
+) -> Tuple[float, List[str]]:
+    """fraction of the essential skills found in the cv, and the missing ones"""
+    if not essential_skills:
+        return 1.0, []
+
+    normalized_cv = _normalize(cv_text)
+    cv_tokens = _tokens(cv_text)
+    missing = [
+        skill
+        for skill in essential_skills
+        if not skill_matches(skill, normalized_cv, cv_tokens)
+    ]
+    return 1 - len(missing) / len(essential_skills), missing
+
+
+def pre_screen(job_analysis: dict, cv_text: str, threshold: float) -> Optional[dict]:
+    """screen a cv against the essential skills extracted by the jd stage.
+
+    Returns None when the cv should go to the llm, otherwise an evaluation result
+    (same shape as the llm output) marking the cv as unfit.
+    """
+    try:
+        essential_skills = job_analysis["technical_skills"]["essential"]
+    except (KeyError, TypeError):
+        return None
+
+    coverage, missing = skill_coverage(essential_skills, cv_text)
+    if coverage >= threshold:
+        return None
+
+    technical_score = round(coverage * 100)
+    scores = {
+        "technical_skills": technical_score,
+        "soft_skills": 0,
+        "experience": 0,
+        "education": 0,
+    }
+    return {
+        "resume_evaluation": {"original_scores": scores, "missing_skills": missing},
+        "deeper_analysis": {"inferred_experience": []},
+        "recalibrated_scores": dict(scores),
+        "assessment": {
+            "suitability": "no",
+            "strengths": "",
+            "concerns": (
+                f"Pre-screened: only {coverage:.0%} of the essential skills were found "
+                f"in the resume (threshold {threshold:.0%}). Missing: "
+                f"{', '.join(missing)}."
+            ),
+        },
+        "pre_screened": True,
+    }
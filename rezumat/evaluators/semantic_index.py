@@ -0,0 +1,325 @@
+import math
+import threading
+import zlib
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Protocol, Set, Tuple
+
+import numpy as np
+
+from rezumat.config import config
+from rezumat.evaluators.pre_screen import SKILL_ALIASES, STOPWORDS, TOKEN_PATTERN
+from rezumat.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import faiss
+except ImportError:
+    faiss = None
+
+# single-word aliases are embedded as their canonical skill, e.g. "k8s" -> "kubernetes"
+CANONICAL_TOKENS: Dict[str, str] = {
+    alias: skill
+    for skill, aliases in SKILL_ALIASES.items()
+    for alias in aliases
+    if " " not in alias and " " not in skill
+}
+
+
+class Embedder(Protocol):
+    def encode(self, texts: List[str]) -> np.ndarray: ...
+
+
+class HashingEmbedder:
+    """Words and word bigrams hashed into `dim` signed buckets, L2-normalized.
+
+    Needs no model download, used when sentence-transformers is not installed.
+    """
+
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim or config.EMBEDDING_DIM
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        rows, columns = [], []
+        for row, text in enumerate(texts):
+            words = [
+                CANONICAL_TOKENS.get(token, token)
+                for token in (
+                    token.rstrip(".") for token in TOKEN_PATTERN.findall(text.lower())
+                )
+                if token not in STOPWORDS
+            ]
+            features = words + [" ".join(pair) for pair in zip(words, words[1:])]
+            # crc32 is stable across processes, unlike `hash`
+            columns.extend(zlib.crc32(feature.encode()) for feature in features)
+            rows.extend([row] * len(features))
+        hashes = np.array(columns, dtype=np.uint32)
+        signs = np.where(hashes >> 31, 1.0, -1.0).astype(np.float32)
+        np.add.at(vectors, (rows, hashes % self.dim), signs)
+        # sublinear term frequency, so that long resumes are not dominated by
+        # repeated words
+        vectors = np.sign(vectors) * np.log1p(np.abs(vectors))
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+class SentenceEmbedder:
+    """CPU sentence-transformers model, `config.EMBEDDING_MODEL`"""
+
+    def __init__(self, model_name: Optional[str] = None):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(
+            model_name or config.EMBEDDING_MODEL, device="cpu"
+        )
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
+            texts, batch_size=64, normalize_embeddings=True, convert_to_numpy=True
+        ).astype(np.float32)
+
+
+@lru_cache(maxsize=None)
+def get_embedder() -> Embedder:
+    """sentence-transformers when installed, the hashing embedder otherwise"""
+    try:
+        return SentenceEmbedder()
+    except Exception as e:
+        logger.info(f"Using the hashing embedder, sentence-transformers: {e!r}")
+        return HashingEmbedder()
+
+
+def job_query_text(job_analysis: dict) -> str:
+    """query of a job from its analysis, essential skills count twice"""
+    if not isinstance(job_analysis, dict):
+        return str(job_analysis)
+    technical_skills = job_analysis.get("technical_skills") or {}
+    essential = technical_skills.get("essential") or []
+    parts = essential * 2
+    parts += technical_skills.get("advantageous") or []
+    parts += job_analysis.get("soft_skills") or []
+    parts += job_analysis.get("education") or []
+    parts.append(str(job_analysis.get("level_of_exp") or ""))
+    return "\n".join(str(part) for part in parts)
+
+
+class SemanticIndex:
+    """Cosine-similarity index of CV embeddings.
+
+    Exact search is one matrix-vector product over the pool. With `approximate`,
+    from `config.SEMANTIC_IVF_MIN_SIZE` CVs on, the pool is partitioned into
+    ~sqrt(n) k-means clusters (an inverted file) and only the
+    `config.SEMANTIC_NPROBE` clusters closest to the query are scanned, so search is
+    sub-linear in the pool size. faiss is used for the inverted file when it is
+    installed. Training the clusters costs more than the exact searches of a single
+    run, so only an index kept across runs should be approximate.
+    """
+
+    def __init__(
+        self,
+        embedder: Optional[Embedder] = None,
+        capacity: int = 1024,
+        approximate: bool = False,
+    ):
+        self.embedder = embedder or get_embedder()
+        self.approximate = approximate
+        self._ids: List[str] = []
+        self._positions: Dict[str, int] = {}
+        self._vectors: Optional[np.ndarray] = None
+        self._capacity = capacity
+        self._ivf = None
+        self._ivf_size = 0  # rows in the inverted file
+        self._trained_size = 0  # rows when the clusters were trained
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, cv_id: str) -> bool:
+        return cv_id in self._positions
+
+    @property
+    def vectors(self) -> np.ndarray:
+        if self._vectors is None:
+            return np.zeros((0, 0), dtype=np.float32)
+        return self._vectors[: len(self)]
+
+    def add(self, cv_tuples: Iterable[Tuple[str, str]], batch_size: int = 256) -> int:
+        """embed and add the (cv_id, cv_text) not in the index yet, in batches"""
+        added = 0
+        batch, batch_ids = [], set()
+        for cv_id, cv_text in cv_tuples:
+            if cv_id in self._positions or cv_id in batch_ids:
+                continue
+            batch.append((cv_id, cv_text))
+            batch_ids.add(cv_id)
+            if len(batch) >= batch_size:
+                added += self._add_batch(batch)
+                batch, batch_ids = [], set()
+        if batch:
+            added += self._add_batch(batch)
+        return added
+
+    def _add_batch(self, batch: List[Tuple[str, str]]) -> int:
+        vectors = self.embedder.encode([cv_text for _, cv_text in batch])
+        if self._vectors is None:
+            self._vectors = np.zeros(
+                (max(self._capacity, len(batch)), vectors.shape[1]), dtype=np.float32
+            )
+        while len(self) + len(batch) > len(self._vectors):
+            grown = np.zeros(
+                (2 * len(self._vectors), self._vectors.shape[1]), dtype=np.float32
+            )
+            grown[: len(self)] = self.vectors
+            self._vectors = grown
+        start = len(self)
+        self._vectors[start : start + len(batch)] = vectors
+        for offset, (cv_id, _) in enumerate(batch):
+            self._positions[cv_id] = start + offset
+            self._ids.append(cv_id)
+        return len(batch)
+
+    def _build_ivf(self) -> None:
+        vectors = self.vectors
+        nlist = max(1, int(math.sqrt(len(vectors))))
+        if faiss is not None:
+            quantizer = faiss.IndexFlatIP(vectors.shape[1])
+            index = faiss.IndexIVFFlat(
+                quantizer, vectors.shape[1], nlist, faiss.METRIC_INNER_PRODUCT
+            )
+            index.train(vectors)
+            index.add(vectors)
+            index.nprobe = config.SEMANTIC_NPROBE
+            # the python wrapper does not keep the quantizer alive
+            self._ivf, self._quantizer = index, quantizer
+        else:
+            centroids = kmeans(vectors, nlist)
+            assignments = np.argmax(vectors @ centroids.T, axis=1)
+            self._ivf = (
+                centroids,
+                [np.flatnonzero(assignments == i) for i in range(len(centroids))],
+            )
+        self._ivf_size = self._trained_size = len(vectors)
+        logger.info(f"Built inverted file with {nlist} clusters over {len(self)} CVs.")
+
+    def _sync_ivf(self) -> None:
+        # the clusters are retrained once the pool has grown by half, until then new
+        # CVs are added to faiss or scanned on every search
+        if self._ivf is None or len(self) > 1.5 * self._trained_size:
+            self._build_ivf()
+        elif faiss is not None and len(self) > self._ivf_size:
+            self._ivf.add(self.vectors[self._ivf_size :])
+            self._ivf_size = len(self)
+
+    def _candidates(self, query: np.ndarray) -> Optional[np.ndarray]:
+        """rows to scan for `query`, None to scan all of them"""
+        if not self.approximate or len(self) < config.SEMANTIC_IVF_MIN_SIZE:
+            return None
+        self._sync_ivf()
+        centroids, lists = self._ivf
+        probes = np.argsort(-(centroids @ query))[: config.SEMANTIC_NPROBE]
+        rows = [lists[probe] for probe in probes]
+        # CVs added after the clusters were trained are always scanned
+        rows.append(np.arange(self._ivf_size, len(self)))
+        return np.concatenate(rows)
+
+    def search(
+        self,
+        query_text: str,
+        k: int,
+        cv_ids: Optional[Set[str]] = None,
+    ) -> List[Tuple[str, float]]:
+        """the `k` most similar (cv_id, score), optionally only among `cv_ids`"""
+        if not len(self) or k <= 0:
+            return []
+        query = self.embedder.encode([query_text])[0]
+
+        if (
+            faiss is not None
+            and self.approximate
+            and cv_ids is None
+            and len(self) >= config.SEMANTIC_IVF_MIN_SIZE
+        ):
+            self._sync_ivf()
+            scores, rows = self._ivf.search(query[None, :], min(k, len(self)))
+            return [
+                (self._ids[row], float(score))
+                for row, score in zip(rows[0], scores[0])
+                if row >= 0
+            ]
+
+        if cv_ids is not None:
+            rows = np.array(
+                [
+                    self._positions[cv_id]
+                    for cv_id in cv_ids
+                    if cv_id in self._positions
+                ],
+                dtype=np.int64,
+            )
+        else:
+            rows = self._candidates(query)
+            if rows is None:
+                rows = np.arange(len(self))
+        if not len(rows):
+            return []
+        scores = self.vectors[rows] @ query
+        k = min(k, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._ids[rows[i]], float(scores[i])) for i in top]
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0):
+    """spherical k-means, returns the (k, dim) normalized centroids"""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = np.argmax(vectors @ centroids.T, axis=1)
+        for i in range(k):
+            members = vectors[assignments == i]
+            if len(members):
+                centroids[i] = members.sum(axis=0)
+        centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+    return centroids
+
+
+_semantic_index: Optional[SemanticIndex] = None
+_semantic_index_lock = threading.Lock()
+_shortlist_lock = threading.Lock()
+
+
+def get_semantic_index() -> SemanticIndex:
+    """return the process-wide semantic index, so each CV is embedded once"""
+    global _semantic_index
+
+    with _semantic_index_lock:
+        if _semantic_index is None:
+            _semantic_index = SemanticIndex(approximate=True)
+        return _semantic_index
+
+
+def shortlist_pairs(
+    job_data: List[Tuple[str, dict]],
+    cv_tuples: List[Tuple[str, str]],
+    top_k: int,
+    index: Optional[SemanticIndex] = None,
+) -> Set[Tuple[str, str]]:
+    """(job_id, cv_id) of the `top_k` CVs most similar to each job, in `index`
+    (default: the process-wide one)"""
+    if index is None:
+        index = get_semantic_index()
+    pairs = set()
+    # concurrent runs share the index
+    with _shortlist_lock:
+        index.add(cv_tuples)
+        cv_ids = {cv_id for cv_id, _ in cv_tuples}
+        # a shared index also holds CVs of other runs
+        candidates = cv_ids if len(index) > len(cv_ids) else None
+        for job_id, job_analysis in job_data:
+            shortlist = index.search(job_query_text(job_analysis), top_k, candidates)
+            pairs.update((job_id, cv_id) for cv_id, _ in shortlist)
+            logger.info(
+                f"Shortlisted {len(shortlist)}/{len(cv_ids)} CVs for job_id: {job_id}."
+            )
+    return pairs
@@ -1,17 +1,63 @@
+import asyncio
 import json
 import os
-import time
-from typing import List, Tuple, Union
+from typing import Callable, Dict, List, Optional, Tuple, Union
 
 import pandas as pd
 from langchain_core.runnables import RunnableSequence
 
-from rezumat.config import config
 from rezumat.utils.logger import get_logger
+from rezumat.utils.retry import DeadLetterQueue
 
 logger = get_logger(__name__)
 
 
+def _save_result(output_dir: str, file_stem: str, result: dict) -> None:
+    """write a single model result to `{output_dir}/{file_stem}.json`"""
+    json_file = os.path.join(output_dir, f"{file_stem}.json")
+    with open(json_file, "w") as f:
+        json.dump(result, f, indent=4)
+
+
+def _dead_letter_jd(
+    output_dir: str, model_name: str, job_tuple: Tuple[str, str], error: Exception
+) -> None:
+    """queue a failed jd evaluation for `process_jobs.retry_dead_letters`"""
+    job_id, job_description = job_tuple
+    DeadLetterQueue.in_dir(output_dir).add(
+        {
+            "kind": "jd",
+            "model_name": model_name,
+            "job_id": job_id,
+            "job_description": job_description,
+        },
+        error,
+    )
+
+
+def _dead_letter_cv(
+    output_dir: str,
+    model_name: str,
+    job_tuple: Tuple[str, dict],
+    cv_tuple: Tuple[str, str],
+    error: Exception,
+) -> None:
+    """queue a failed cv evaluation for `process_jobs.retry_dead_letters`"""
+    job_id, job_requirements = job_tuple
+    cv_id, cv = cv_tuple
+    DeadLetterQueue.in_dir(output_dir).add(
+        {
+            "kind": "cv",
+            "model_name": model_name,
+            "job_id": job_id,
+            "job_requirements": job_requirements,
+            "cv_id": cv_id,
+            "resume": cv,
+        },
+        error,
+    )
+
+
 def two_stage_eval_jd(
     model_tuples: List[Tuple[str, RunnableSequence]],
     job_tuple: Tuple[str, str],
@@ -32,23 +78,21 @@ def two_stage_eval_jd(
             model_results[model_name] = result
 
             # save model result
-            json_file = os.path.join(output_dir, f"{job_id}_{model_name}.json")
-            with open(json_file, "w") as f:
-                json.dump(result, f, indent=4)
-                logger.info(f"Saved {model_name} result for job_id: {job_id}")
-            time.sleep(config.SLEEP_TIME)  # Add a small delay to avoid rate limiting
+            _save_result(output_dir, f"{job_id}_{model_name}", result)
+            logger.info(f"Saved {model_name} result for job_id: {job_id}")
 
         except Exception as e:
-            error_msg = f"Error with {model_name} for job_id: {job_id}. Error: {str(e)}"
-            logger.error(error_msg)
-            print(error_msg)
+            logger.error(
+                f"Error with {model_name} for job_id: {job_id}. Error: {str(e)}"
+            )
+            _dead_letter_jd(output_dir, model_name, job_tuple, e)
 
     if not model_results:
-        error_msg = f"All models failed for job_id: {job_id}."
-        logger.error(error_msg)
-        print(error_msg)
+        logger.error(f"All models failed for job_id: {job_id}.")
         return None
 
+    return model_results
+
 
 def two_stage_eval_cv(
     model_tuples: List[Tuple[str, RunnableSequence]],
@@ -73,18 +117,220 @@ def two_stage_eval_cv(
             model_results[model_name] = result
 
             # save model result
-            json_file = os.path.join(output_dir, f"{job_id}_{cv_id}_{model_name}.json")
-            with open(json_file, "w") as f:
-                json.dump(result, f, indent=4)
-            time.sleep(2.1)  # Add a small delay to avoid rate limiting
+            _save_result(output_dir, f"{job_id}_{cv_id}_{model_name}", result)
+
+        except Exception as e:
+            logger.error(
+                f"Error with {model_name} for job_id: {job_id}. Error: {str(e)}"
+            )
+            _dead_letter_cv(output_dir, model_name, job_tuple, cv_tuple, e)
+
+    if not model_results:
+        logger.error(f"All models failed for job_id: {job_id}.")
+        return None
+
+    return model_results
+
+
+async def atwo_stage_eval_jd(
+    model_tuples: List[Tuple[str, RunnableSequence]],
+    job_tuple: Tuple[str, str],
+    output_dir: str,
+) -> Union[Dict[str, dict], None]:
+    """async version of `two_stage_eval_jd`, calls the graders through `ainvoke`"""
+    model_results = {}
+
+    if isinstance(model_tuples, Tuple):
+        model_tuples = [model_tuples]
+
+    job_id, job_description = job_tuple
+
+    for model_name, grader in model_tuples:
+        try:
+            result = await grader.ainvoke({"job_description": job_description})
+            model_results[model_name] = result
+
+            _save_result(output_dir, f"{job_id}_{model_name}", result)
+            logger.info(f"Saved {model_name} result for job_id: {job_id}")
+
+        except Exception as e:
+            logger.error(
+                f"Error with {model_name} for job_id: {job_id}. Error: {str(e)}"
+            )
+            _dead_letter_jd(output_dir, model_name, job_tuple, e)
+
+    if not model_results:
+        logger.error(f"All models failed for job_id: {job_id}.")
+        return None
+
+    return model_results
+
+
+async def atwo_stage_eval_cv(
+    model_tuples: List[Tuple[str, RunnableSequence]],
+    job_tuple: Tuple[str, str],
+    cv_tuple: Tuple[str, str],
+    output_dir: str,
+    stop_early: Optional[Callable[[Dict[str, dict]], bool]] = None,
+) -> Union[Dict[str, dict], None]:
+    """async version of `two_stage_eval_cv`, the models are queried concurrently.
+
+    With `stop_early`, the first two models are queried first and the others only
+    when `stop_early(model_results)` is false (e.g. when the first two disagree).
+    """
+    if isinstance(model_tuples, Tuple):
+        model_tuples = [model_tuples]
+
+    job_id, job_requirements = job_tuple
+    cv_id, cv = cv_tuple
+
+    async def evaluate(model_name, grader):
+        try:
+            result = await grader.ainvoke(
+                {"job_requirements": job_requirements, "resume": cv}
+            )
+            _save_result(output_dir, f"{job_id}_{cv_id}_{model_name}", result)
+            return model_name, result
 
         except Exception as e:
-            error_msg = f"Error with {model_name} for job_id: {job_id}. Error: {str(e)}"
-            logger.error(error_msg)
-            print(error_msg)
+            logger.error(
+                f"Error with {model_name} for job_id: {job_id}, cv_id: {cv_id}. Error: {str(e)}"
+            )
+            _dead_letter_cv(output_dir, model_name, job_tuple, cv_tuple, e)
+            return model_name, None
+
+    async def evaluate_all(model_tuples):
+        results = await asyncio.gather(*[evaluate(*mt) for mt in model_tuples])
+        return {name: result for name, result in results if result is not None}
+
+    if stop_early is None or len(model_tuples) <= 2:
+        model_results = await evaluate_all(model_tuples)
+    else:
+        model_results = await evaluate_all(model_tuples[:2])
+        if stop_early(model_results):
+            logger.info(
+                f"Models agree for job_id: {job_id}, cv_id: {cv_id}, skipping "
+                f"{len(model_tuples) - 2} more."
+            )
+        else:
+            model_results.update(await evaluate_all(model_tuples[2:]))
 
     if not model_results:
-        error_msg = f"All models failed for job_id: {job_id}."
-        logger.error(error_msg)
-        print(error_msg)
+        logger.error(f"All models failed for job_id: {job_id}, cv_id: {cv_id}.")
         return None
+
+    return model_results
+
+
+SCORE_CATEGORIES = ("technical_skills", "soft_skills", "experience", "education")
+
+
+def validate_cv_result(result: dict) -> bool:
+    """whether a cv result has everything `post_analysis.parse_result` needs"""
+    try:
+        scores = [
+            result["resume_evaluation"]["original_scores"],
+            result["recalibrated_scores"],
+        ]
+        return (
+            all(
+                isinstance(score.get(category), (int, float))
+                for score in scores
+                for category in SCORE_CATEGORIES
+            )
+            and isinstance(result["deeper_analysis"], dict)
+            and str(result["assessment"].get("suitability")).lower()
+            in ("yes", "no", "kiv")
+        )
+    except (KeyError, TypeError, AttributeError):
+        return False
+
+
+def format_resumes(cv_tuples: List[Tuple[str, str]]) -> str:
+    """render the resumes of a batch as the JSON array expected by the batch prompt"""
+    return json.dumps(
+        [{"cv_id": cv_id, "resume": cv} for cv_id, cv in cv_tuples],
+        ensure_ascii=False,
+        indent=2,
+    )
+
+
+async def atwo_stage_eval_cv_batch(
+    batch_model_tuples: List[Tuple[str, RunnableSequence]],
+    model_tuples: List[Tuple[str, RunnableSequence]],
+    job_tuple: Tuple[str, str],
+    cv_tuples: List[Tuple[str, str]],
+    output_dir: str,
+) -> Dict[str, Dict[str, dict]]:
+    """evaluate several CVs against one job with a single request per model.
+
+    The batch graders return a JSON array keyed by cv_id. Every item is validated,
+    items that are missing or invalid fall back to a single `atwo_stage_eval_cv` call
+    with the grader of the same name in `model_tuples`. Returns
+    {cv_id: {model_name: result}}.
+    """
+    if isinstance(batch_model_tuples, Tuple):
+        batch_model_tuples = [batch_model_tuples]
+    if isinstance(model_tuples, Tuple):
+        model_tuples = [model_tuples]
+
+    job_id, job_requirements = job_tuple
+    single_graders = dict(model_tuples)
+    results = {cv_id: {} for cv_id, _ in cv_tuples}
+
+    for model_name, batch_grader in batch_model_tuples:
+        try:
+            items = await batch_grader.ainvoke(
+                {
+                    "job_requirements": job_requirements,
+                    "resumes": format_resumes(cv_tuples),
+                }
+            )
+        except Exception as e:
+            logger.error(
+                f"Batch error with {model_name} for job_id: {job_id}. Error: {str(e)}"
+            )
+            items = []
+
+        # JSON-constrained decoding (ollama) only produces objects, the array
+        # comes back wrapped in one
+        if isinstance(items, dict):
+            items = next(
+                (value for value in items.values() if isinstance(value, list)), []
+            )
+        if not isinstance(items, list):
+            items = []
+        items_by_cv_id = {
+            str(item.get("cv_id")): item for item in items if isinstance(item, dict)
+        }
+
+        fallback = []
+        for cv_id, cv in cv_tuples:
+            item = items_by_cv_id.get(cv_id)
+            if item is None or not validate_cv_result(item):
+                fallback.append((cv_id, cv))
+                continue
+            result = {key: value for key, value in item.items() if key != "cv_id"}
+            _save_result(output_dir, f"{job_id}_{cv_id}_{model_name}", result)
+            results[cv_id][model_name] = result
+
+        if fallback and model_name in single_graders:
+            logger.warning(
+                f"{len(fallback)}/{len(cv_tuples)} batch items from {model_name} "
+                f"for job_id: {job_id} were invalid, falling back to single calls."
+            )
+            single_results = await asyncio.gather(
+                *[
+                    atwo_stage_eval_cv(
+                        (model_name, single_graders[model_name]),
+                        job_tuple,
+                        cv_tuple,
+                        output_dir,
+                    )
+                    for cv_tuple in fallback
+                ]
+            )
+            for (cv_id, _), single_result in zip(fallback, single_results):
+                results[cv_id].update(single_result or {})
+
+    return {cv_id: result for cv_id, result in results.items() if result}
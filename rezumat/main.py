@@ -1,10 +1,11 @@
 from __future__ import annotations
 
-from rezumat.config import config  # to ensure all setup is done
+from rezumat.config import config
 from rezumat.app import create_gradio_app
 
 
 def main():
+    config.setup()
     demo = create_gradio_app()
     demo.launch()
 
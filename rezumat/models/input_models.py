@@ -22,8 +22,8 @@ class CandidateEvaluationWeights(BaseModel):
 class InputModel(BaseModel):
     text_input: str
     additional_text: str = ""
-    input_type: Literal["Text", "File"]
+    input_type: Literal["Text", "File", "Pool"]
     api_key: str
-    interface: Literal["Groq", "OpenAI", "Anthropic"]
-    model: Literal["llama3-70b-8192", "gpt-3.5-turbo", "gpt-4"]
+    interface: Literal["Groq", "OpenAI", "Anthropic", "Ollama"]
+    model: Literal["llama3-70b-8192", "gpt-3.5-turbo", "gpt-4", "llama3.1:8b"]
     weights: CandidateEvaluationWeights
@@ -1,22 +1,50 @@
 import os
-from typing import List, Tuple
-from uuid import uuid4
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple, Union
 
 import gradio as gr
 import pandas as pd
 from langchain_core.runnables.base import RunnableSequence
 
 from rezumat.config import config
+from rezumat.evaluators.cascade import get_escalation_check
 from rezumat.evaluators.chains import get_eval_chain
-from rezumat.evaluators.post_analysis import calculate_fit_scores
+from rezumat.evaluators.post_analysis import (
+    ResultStore,
+    final_results,
+    parse_result,
+)
+from rezumat.evaluators.semantic_index import shortlist_pairs
 from rezumat.models.input_models import CandidateEvaluationWeights, InputModel
-from rezumat.preprocessing.parsers.pdf_parser import process_pdfs
-from rezumat.utils.helper import read_job_data, save_upload_file
+from rezumat.preprocessing.parsers.pdf_parser import iter_parsed_pdfs
+from rezumat.utils.candidate_pool import CandidatePool, get_candidate_pool
+from rezumat.utils.estimate_cost import (
+    BudgetExceededError,
+    check_budget,
+    estimate_run,
+    format_estimate,
+)
+from rezumat.utils.hashing import content_id, dedupe
+from rezumat.utils.helper import get_job_data, save_upload_file
+from rezumat.utils.job_analysis_cache import JobAnalysisCache, get_job_analysis_cache
 from rezumat.utils.logger import get_logger
-from rezumat.utils.process_jobs import process_all_jobs, process_all_pairs
+from rezumat.utils.manifest import RunManifest, new_run_id
+from rezumat.utils.metrics import metrics
+from rezumat.utils.process_jobs import (
+    CV_PROMPT_VERSION,
+    finished_in_pool,
+    process_all_jobs,
+    stream_pairs,
+)
+from rezumat.utils.result_cache import get_result_cache
+from rezumat.utils.token_usage import token_usage
 
 logger = get_logger(__name__)
 
+# parsed CVs added to the candidate pool per commit
+POOL_INSERT_BATCH_SIZE = 100
+
 
 def process_input(
     text_input,
@@ -30,11 +58,49 @@ def process_input(
     soft_skills,
     experience,
     education,
-):
+) -> pd.DataFrame:
+    """run the whole pipeline and return the final scoring table, see
+    `iter_process_input`"""
+    eval_results = pd.DataFrame()
+    for eval_results, _ in iter_process_input(
+        text_input,
+        additional_text,
+        file_upload,
+        input_type,
+        api_key,
+        interface,
+        model,
+        technical_skills,
+        soft_skills,
+        experience,
+        education,
+    ):
+        pass
+    return eval_results
 
-    try:
 
+def iter_process_input(
+    text_input,
+    additional_text,
+    file_upload,
+    input_type,
+    api_key,
+    interface,
+    model,
+    technical_skills,
+    soft_skills,
+    experience,
+    education,
+) -> Iterator[Tuple[pd.DataFrame, str]]:
+    """run the pipeline, yield (scoring table so far, progress) as results arrive.
+
+    A snapshot of the table is yielded at most every `config.STREAM_UPDATE_SECONDS`,
+    the final table (also saved as csv) comes last.
+    """
+
+    try:
         logger.info("Starting processing input data.")
+        metrics.reset()
 
         # Validate input
         weights = CandidateEvaluationWeights(
@@ -54,72 +120,340 @@ def process_input(
         )
     except ValueError as e:
         logger.error(f"process_input: Error validating input: {str(e)}")
-        return pd.DataFrame()
+        yield pd.DataFrame(), f"Invalid input: {e}"
+        return
+
+    cv_data = {}
+    pool = get_candidate_pool()
+
+    def record_cv_data(cv_stream):
+        # new CVs go into the pool in batches, one commit each; pool input is
+        # already there
+        pending = []
+        add_to_pool = pool is not None and input_data.input_type != "Pool"
+        try:
+            for cv_id, cv_text in cv_stream:
+                cv_data[cv_id] = cv_text
+                if add_to_pool:
+                    pending.append((cv_id, cv_text))
+                    if len(pending) >= POOL_INSERT_BATCH_SIZE:
+                        pool.add_cvs(pending, source=input_data.input_type)
+                        pending = []
+                yield cv_id, cv_text
+        finally:
+            if pending:
+                pool.add_cvs(pending, source=input_data.input_type)
+
+    cv_stream = record_cv_data(iter_cv_data(input_data, file_upload))
+    interface, model = input_data.interface, input_data.model
+    total_pairs = None
+    if config.COST_ESTIMATE_ENABLED or config.BUDGET_LIMIT is not None:
+        num_cvs = None
+        if config.COST_ESTIMATE_EXACT:
+            # every CV is parsed up front, so parsing no longer overlaps the jd stage
+            cv_stream = list(cv_stream)
+        else:
+            num_cvs = count_cvs(input_data, file_upload)
+        try:
+            interface, model, estimate = plan_within_budget(
+                interface,
+                model,
+                [input_data.text_input],
+                list(cv_data.values()),
+                num_cvs=num_cvs,
+            )
+        except BudgetExceededError as e:
+            logger.error(f"process_input: {e}")
+            gr.Warning(str(e))
+            yield pd.DataFrame(), str(e)
+            return
+        gr.Info(format_estimate(estimate))
+        total_pairs = estimate["pairs"]
+
+    yield pd.DataFrame(), "Analyzing the job description..."
 
     # JD EVALUATION
 
     # get jd eval chain
     logger.info("Starting JD evaluation.")
     jd_grader_tuple = get_eval_chain(
-        input_data.interface,
-        input_data.model,
-        os.getenv("GROQ_API_KEY"),
-        eval_type="jd",
+        interface, model, os.getenv("GROQ_API_KEY"), eval_type="jd"
     )
-    process_job_description(input_data, jd_grader_tuple)
+    memo = get_job_analysis_cache()
+    job_tuples = process_job_description(input_data, jd_grader_tuple, memo)
 
     logger.info("Starting CV evaluation.")
 
-    cv_data = process_cv_data(input_data, file_upload)
-    job_data = read_job_data()
-    job_tuples = pd.read_csv(f"{config.CSV_OUTPUT_DIR}/job_tuples.csv")
-    cv_grader_tuple = get_eval_chain(
-        input_data.interface,
-        input_data.model,
-        os.getenv("GROQ_API_KEY"),
-        eval_type="cv",
-    )
-    evaluate_cv(cv_grader_tuple, job_data, cv_data)
+    # parsing, cv evaluation and scoring are pipelined: each CV is evaluated against
+    # all jobs as soon as its text is ready, and each result goes straight into the
+    # scoring table
+    job_data = get_job_data(job_tuples, jd_grader_tuple[0], memo=memo)
+    cv_grader_tuple = get_cv_graders(interface, model, eval_type="cv")
+    cv_batch_grader_tuple = None
+    if config.CV_BATCH_SIZE > 1:
+        cv_batch_grader_tuple = get_cv_graders(interface, model, eval_type="cv_batch")
+    cascade_grader_tuple = get_cascade_graders(interface, model)
 
-    eval_results = calculate_and_save_fit_scores(
-        input_data, cv_data, job_tuples, job_data
-    )
+    manifest = RunManifest.for_run(config.RUN_ID or new_run_id())
+    logger.info(f"Run id: {manifest.run_id}")
+    yield pd.DataFrame(), "Evaluating the CVs..."
+
+    store = ResultStore()
+    scored_pairs = set()
+    start = time.monotonic()
+    # the first result is shown right away
+    last_update = start - config.STREAM_UPDATE_SECONDS
+    try:
+        for row in evaluate_cv(
+            cv_grader_tuple,
+            job_data,
+            cv_stream,
+            cv_batch_grader_tuple,
+            cascade_grader_tuple,
+            get_escalation_check(input_data.weights),
+            manifest=manifest,
+            pool=pool,
+        ):
+            store.append_row(row)
+            scored_pairs.add((row["job_id"], row["cv_id"]))
+            if time.monotonic() - last_update < config.STREAM_UPDATE_SECONDS:
+                continue
+            last_update = time.monotonic()
+            snapshot = calculate_and_save_fit_scores(
+                input_data,
+                store,
+                list(cv_data.items()),
+                job_tuples,
+                job_data,
+                save=False,
+            )
+            yield (
+                snapshot,
+                format_progress(len(scored_pairs), total_pairs, last_update - start),
+            )
+    finally:
+        logger.info(f"Run {manifest.run_id}: {manifest.summary()}")
+        manifest.close()
+
+    with metrics.timer("rezumat_stage_seconds", stage="post_analysis"):
+        eval_results = calculate_and_save_fit_scores(
+            input_data, store, list(cv_data.items()), job_tuples, job_data
+        )
+
+    cache = get_result_cache()
+    if cache is not None:
+        cache.flush()
+        logger.info(f"result cache stats: {cache.stats()}")
+    logger.info(f"token usage: {token_usage.summary()}")
+    metrics.write_run(manifest.run_id, config.RUNS_DIR)
 
     logger.info(
         f"processing completed. results saved in : {config.CSV_OUTPUT_DIR}, results type: {type(eval_results)}"
     )
-    return eval_results
+    progress = format_progress(
+        len(scored_pairs), total_pairs, time.monotonic() - start, done=True
+    )
+    yield eval_results, progress
+
+
+def format_progress(
+    scored: int, total: Optional[int], elapsed: float, done: bool = False
+) -> str:
+    """progress read-out of the cv stage, with an ETA when the total is known"""
+
+    def duration(seconds: float) -> str:
+        minutes, seconds = divmod(round(seconds), 60)
+        return f"{minutes}m {seconds:02d}s"
+
+    if done:
+        return f"Done: {scored} job-CV pairs scored in {duration(elapsed)}."
+    if not total:
+        return f"{scored} job-CV pairs scored, elapsed {duration(elapsed)}."
+    progress = f"{scored}/{total} job-CV pairs scored ({100 * scored // total}%)"
+    progress += f", elapsed {duration(elapsed)}"
+    if scored:
+        progress += f", ETA {duration(elapsed / scored * max(0, total - scored))}"
+    return progress + "."
 
 
 def process_job_description(
-    input_data: InputModel, jd_grader_tuple: Tuple[str, RunnableSequence]
-) -> None:
-    """process the job description"""
+    input_data: InputModel,
+    jd_grader_tuple: Tuple[str, RunnableSequence],
+    memo: Optional[JobAnalysisCache] = None,
+) -> List[Tuple[str, str]]:
+    """process the job description, return the (job_id, job_text) tuples.
+
+    A job already analyzed by the model (in `memo`) is not analyzed again.
+    """
 
     logger.info("Processing all jobs.")
 
-    process_all_jobs(
+    return process_all_jobs(
         model_tuples=jd_grader_tuple,
         job_text=input_data.text_input,
         output_dir=config.JOBS_OUTPUT_DIR,
+        resume=config.RESUME,
+        memo=memo,
+    )
+
+
+def get_grader_models(interface: str, model: str) -> List[Tuple[str, str]]:
+    """(interface, model) of the selected model and of the `config.ENSEMBLE_MODELS`"""
+    models = [(interface, model)]
+    for ensemble_model in config.ENSEMBLE_MODELS:
+        if tuple(ensemble_model) not in models:
+            models.append(tuple(ensemble_model))
+    return models
+
+
+def get_cv_graders(
+    interface: str, model: str, eval_type: str = "cv"
+) -> List[Tuple[str, RunnableSequence]]:
+    """cv graders of the selected model and of the `config.ENSEMBLE_MODELS`"""
+    return [
+        get_eval_chain(interface, model, os.getenv("GROQ_API_KEY"), eval_type=eval_type)
+        for interface, model in get_grader_models(interface, model)
+    ]
+
+
+def get_cascade_graders(
+    interface: str, model: str
+) -> Optional[List[Tuple[str, RunnableSequence]]]:
+    """cv grader of `config.CASCADE_MODEL`, None when the cascade is off"""
+    if not config.CASCADE_MODEL or tuple(config.CASCADE_MODEL) == (interface, model):
+        return None
+    return [get_eval_chain(*config.CASCADE_MODEL, os.getenv("GROQ_API_KEY"), "cv")]
+
+
+def estimate_run_cost(
+    interface: str,
+    model: str,
+    job_texts: List[str],
+    cv_texts: List[str],
+    max_concurrency: Optional[int] = None,
+    num_cvs: Optional[int] = None,
+) -> dict:
+    """projected cost and duration of a run, see `estimate_cost.estimate_run`.
+
+    The cascade model is counted on every pair and resumed or cached pairs are not
+    subtracted, so this is an upper bound.
+    """
+    cv_models = get_grader_models(interface, model)
+    if config.CASCADE_MODEL and tuple(config.CASCADE_MODEL) not in cv_models:
+        cv_models.append(tuple(config.CASCADE_MODEL))
+    return estimate_run(
+        (interface, model),
+        cv_models,
+        job_texts,
+        cv_texts,
+        max_concurrency=max_concurrency,
+        cvs_per_job=config.SHORTLIST_TOP_K,
+        num_cvs=num_cvs,
+    )
+
+
+def plan_within_budget(
+    interface: str,
+    model: str,
+    job_texts: List[str],
+    cv_texts: List[str],
+    budget: Optional[float] = None,
+    max_concurrency: Optional[int] = None,
+    num_cvs: Optional[int] = None,
+) -> Tuple[str, str, dict]:
+    """(interface, model, estimate) of a run that fits the budget.
+
+    When the run with the selected model is projected above `budget` (default
+    `config.BUDGET_LIMIT`), the model is replaced by `config.BUDGET_FALLBACK_MODEL`.
+    Raises BudgetExceededError when that is over budget too, or has no api key.
+    """
+    estimate = estimate_run_cost(
+        interface, model, job_texts, cv_texts, max_concurrency, num_cvs
     )
+    logger.info(f"{interface}/{model}: {format_estimate(estimate)}")
+    if check_budget(estimate, budget):
+        return interface, model, estimate
+
+    budget = config.BUDGET_LIMIT if budget is None else budget
+    if config.BUDGET_FALLBACK_MODEL:
+        fallback_interface, fallback_model = config.BUDGET_FALLBACK_MODEL
+        fallback_estimate = estimate_run_cost(
+            fallback_interface,
+            fallback_model,
+            job_texts,
+            cv_texts,
+            max_concurrency,
+            num_cvs,
+        )
+        # the model clients read their api key from the environment
+        if fallback_interface.lower() != "ollama" and not os.getenv(
+            f"{fallback_interface.upper()}_API_KEY"
+        ):
+            raise BudgetExceededError(
+                f"Estimated cost ${estimate['cost']:.4f} exceeds the budget of "
+                f"${budget:.2f}, and {fallback_interface}/{fallback_model} has no "
+                "api key to switch to."
+            )
+        if check_budget(fallback_estimate, budget):
+            logger.warning(
+                f"Estimated cost ${estimate['cost']:.4f} of {interface}/{model} "
+                f"exceeds the budget of ${budget:.2f}, "
+                f"switching to {fallback_interface}/{fallback_model}."
+            )
+            return fallback_interface, fallback_model, fallback_estimate
+
+    raise BudgetExceededError(
+        f"Estimated cost ${estimate['cost']:.4f} exceeds the budget of ${budget:.2f}."
+    )
+
 
+def count_cvs(input_data: InputModel, file_upload: List[gr.FileData]) -> int:
+    """number of CVs `iter_cv_data` will yield at most, without parsing them"""
+    if input_data.input_type == "Pool":
+        pool = get_candidate_pool()
+        return len(pool) if pool is not None else 0
+    if input_data.input_type == "Text":
+        return 1 if input_data.additional_text else 0
+    if input_data.input_type == "File" and file_upload is not None:
+        return sum(1 for file in file_upload if file.name.endswith(".pdf"))
+    return 0
 
-def process_cv_data(input_data: InputModel, file_upload: List[gr.FileData]) -> None:
-    """process the cv data"""
+
+def iter_cv_data(
+    input_data: InputModel, file_upload: List[gr.FileData]
+) -> Iterator[Tuple[str, str]]:
+    """yield (cv_id, cv_text) for every CV, as soon as it is parsed.
+
+    With the "Pool" input type, every CV of the candidate pool is evaluated.
+    """
 
     logger.info("Processing all CVs.")
 
-    if input_data.input_type == "Text" and input_data.additional_text:
-        return [(str(uuid4()), input_data.additional_text)]
+    if input_data.input_type == "Pool":
+        pool = get_candidate_pool()
+        if pool is None:
+            logger.warning("The candidate pool is disabled, no CVs to evaluate.")
+            return
+        logger.info(f"Evaluating the {len(pool)} CVs of the candidate pool.")
+        yield from pool.iter_cvs()
+    elif input_data.input_type == "Text" and input_data.additional_text:
+        yield content_id(input_data.additional_text), input_data.additional_text
     elif input_data.input_type == "File" and file_upload is not None:
         try:
+            # uploads of earlier runs are no longer wiped on start
+            for stale_file in config.PDF_UPLOAD_FOLDER.glob("*.pdf"):
+                stale_file.unlink()
             for file in file_upload:
                 if file.name.endswith(".pdf"):
                     save_upload_file(file)
-            cv_data = process_pdfs(config.PDF_UPLOAD_FOLDER)
-            cv_data = [(str(uuid4()), cv) for cv in cv_data]
-            return cv_data
+            for file, cv in iter_parsed_pdfs(config.PDF_UPLOAD_FOLDER):
+                if not cv.strip():
+                    # scanned or broken pdfs, nothing to send to the llm
+                    logger.warning(
+                        f"No text could be parsed from {file.name}, skipped."
+                    )
+                    continue
+                yield content_id(cv), cv
         except Exception as e:
             logger.error(f"Error processing file: {str(e)}")
             raise e
@@ -127,12 +461,19 @@ def process_cv_data(input_data: InputModel, file_upload: List[gr.FileData]) -> N
 
 def calculate_and_save_fit_scores(
     input_data: InputModel,
+    store: ResultStore,
     cv_data: List[Tuple[str, str]],
     job_tuple: List[Tuple[str, dict]],
     job_data: List[Tuple[str, dict]],
+    save: bool = True,
 ) -> pd.DataFrame:
-    """Calculate the fit scores"""
-    fit_scores_df = calculate_fit_scores(config.CV_OUTPUT_DIR, input_data.weights)
+    """Calculate the fit scores, and save them unless `save` is False (e.g. for a
+    snapshot of a run in progress)"""
+    if not len(store):
+        logger.warning("No evaluation results to score.")
+        return pd.DataFrame()
+
+    fit_scores_df = store.to_frame(input_data.weights)
 
     cv_df = pd.DataFrame(cv_data, columns=["cv_id", "cv_text"])
     jd_df = pd.DataFrame(job_tuple, columns=["job_id", "job_text"])
@@ -141,20 +482,108 @@ def calculate_and_save_fit_scores(
     fit_scores_df = pd.merge(fit_scores_df, jd_df, on="job_id", how="left")
     fit_scores_df = pd.merge(fit_scores_df, cv_df, on="cv_id", how="left")
     fit_scores_df = pd.merge(fit_scores_df, job_df, on="job_id", how="left")
-    fit_scores_df.to_csv(
-        f"{config.CSV_OUTPUT_DIR}/fit_scores_with_text.csv", index=False
-    )
-    logger.info("Fit scores calculated and saved.")
-    return fit_scores_df
+    if save:
+        fit_scores_df.to_csv(
+            f"{config.CSV_OUTPUT_DIR}/fit_scores_with_text.csv", index=False
+        )
+        logger.info("Fit scores calculated and saved.")
+
+    return final_results(fit_scores_df)
 
 
 def evaluate_cv(
-    cv_grader_tuple: Tuple[str, RunnableSequence],
+    cv_grader_tuple: List[Tuple[str, RunnableSequence]],
     job_data: List[Tuple[str, dict]],
-    cv_data: List[Tuple[str, str]],
-) -> pd.DataFrame:
-    """Evaluate the CVs"""
+    cv_stream: Iterable[Tuple[str, str]],
+    cv_batch_grader_tuple: Optional[List[Tuple[str, RunnableSequence]]] = None,
+    cascade_grader_tuple: Optional[List[Tuple[str, RunnableSequence]]] = None,
+    escalate: Optional[Callable[[dict], bool]] = None,
+    output_dir: Optional[Union[str, Path]] = None,
+    max_concurrency: Optional[int] = None,
+    resume: Optional[bool] = None,
+    manifest: Optional[RunManifest] = None,
+    shortlist_top_k: Optional[int] = None,
+    pool: Optional[CandidatePool] = None,
+) -> Iterator[dict]:
+    """Evaluate the CVs as they arrive, yield a scoring table row per result.
+
+    With `cv_batch_grader_tuple`, several CVs are evaluated per request. With
+    `cascade_grader_tuple`, CVs are scored by that cheap model first and only
+    re-scored by `cv_grader_tuple` when `escalate` flags the result. With
+    `shortlist_top_k` (default `config.SHORTLIST_TOP_K`), only the CVs most similar
+    to each job in the semantic index are evaluated; this waits for every CV.
+
+    Results are also stored in the candidate `pool`, when given. With `resume`,
+    the pairs that already have results in the pool for the current cv prompt are
+    not evaluated again, their results are yielded instead (see `finished_in_pool`);
+    each CV is looked up as it arrives. The pool is then the only source of
+    finished results: the result files of the other pairs may come from an earlier
+    cv prompt.
+    """
     logger.info("Evaluating all CVs.")
-    process_all_pairs(
-        cv_grader_tuple, job_data, cv_data, output_dir=config.CV_OUTPUT_DIR
-    )
+    resume = config.RESUME if resume is None else resume
+    shortlist_top_k = shortlist_top_k or config.SHORTLIST_TOP_K
+    pairs = None
+    if shortlist_top_k:
+        cv_stream = dedupe(list(cv_stream))
+        pairs = shortlist_pairs(job_data, cv_stream, shortlist_top_k)
+
+    def to_row(job_id, cv_id, model_name, result):
+        try:
+            return parse_result(job_id, cv_id, model_name, result)
+        except Exception as e:
+            logger.error(f"Error parsing result for {job_id}_{cv_id}_{model_name}: {e}")
+
+    finished = None
+    if pool is not None and resume:
+        finished = {}
+        job_ids = [job_id for job_id, _ in job_data]
+
+        def look_up_finished(cv_stream):
+            """runs in the worker thread that consumes the cv stream"""
+            scored = 0
+            for cv_id, cv_text in cv_stream:
+                for job_id, results in finished_in_pool(
+                    pool,
+                    job_ids,
+                    cv_id,
+                    [model_name for model_name, _ in cv_grader_tuple],
+                    [model_name for model_name, _ in cascade_grader_tuple or []],
+                    escalate,
+                    version=CV_PROMPT_VERSION,
+                ).items():
+                    finished[job_id, cv_id] = results
+                    scored += 1
+                yield cv_id, cv_text
+            logger.info(f"{scored} job-CV pairs already scored in the candidate pool.")
+
+        cv_stream = look_up_finished(cv_stream)
+        resume = False
+
+    for job_id, cv_id, model_name, result in stream_pairs(
+        cv_grader_tuple,
+        job_data,
+        cv_stream,
+        output_dir=output_dir or config.CV_OUTPUT_DIR,
+        max_concurrency=max_concurrency,
+        resume=resume,
+        manifest=manifest,
+        batch_model_tuples=cv_batch_grader_tuple,
+        cascade_model_tuples=cascade_grader_tuple,
+        escalate=escalate,
+        pairs=pairs,
+        finished=finished,
+        pre_screen_threshold=(
+            config.PRE_SCREEN_THRESHOLD if config.PRE_SCREEN_ENABLED else None
+        ),
+    ):
+        # pre-screened results are not verdicts of the model, they are not kept
+        if (
+            pool is not None
+            and not result.get("pre_screened")
+            and (finished is None or (job_id, cv_id) not in finished)
+        ):
+            pool.add_result(job_id, cv_id, model_name, result, CV_PROMPT_VERSION)
+        row = to_row(job_id, cv_id, model_name, result)
+        if row is not None:
+            yield row
@@ -1,14 +1,19 @@
 # read all files
+import json
+import multiprocessing
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Union
+from typing import Iterator, List, Optional, Tuple, Union
 
 from pypdf import PdfReader
 from pypdf.errors import EmptyFileError
 from tqdm import tqdm
 
+from rezumat.config import config
+from rezumat.utils.hashing import content_id
 from rezumat.utils.logger import get_logger
+from rezumat.utils.metrics import metrics
 
 logger = get_logger(__name__)
 
@@ -27,18 +32,108 @@ def parse_pdf(file_path: Union[str, Path]) -> List[str]:
         return ""
 
 
-def process_pdfs(pdf_path: Union[str, Path]) -> List[str]:
-    cv_data = []
-    total_pdfs = len(list(Path(pdf_path).glob("*.pdf")))
-    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
-        future_to_file = {
-            executor.submit(parse_pdf, file): file for file in pdf_path.glob("*.pdf")
-        }
+def _parse_chunk(file_paths: List[Path]) -> List[Tuple[Path, List[str]]]:
+    """parse a chunk of pdfs in one worker, to amortize the inter-process overhead"""
+    return [(file_path, parse_pdf(file_path)) for file_path in file_paths]
 
-        for future in tqdm(
-            as_completed(future_to_file), total=total_pdfs, desc="Parsing PDFs"
-        ):
-            cv_data.append(future.result())
 
-    # Join multi-page CVs into a single string
-    return [" ".join(cv) if len(cv) > 1 else cv[0] for cv in cv_data]
+def _read_cached_text(cache_file: Path) -> Optional[List[str]]:
+    try:
+        with open(cache_file, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def _write_cached_text(cache_file: Path, pages: List[str]) -> None:
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = cache_file.with_suffix(".tmp")
+    with open(tmp_file, "w") as f:
+        json.dump(pages, f)
+    os.replace(tmp_file, cache_file)
+
+
+def iter_parsed_pdfs(
+    pdf_path: Union[str, Path],
+    max_workers: Optional[int] = None,
+    backend: Optional[str] = None,
+    cache_dir: Optional[Union[str, Path]] = None,
+) -> Iterator[Tuple[Path, str]]:
+    """yield (file_path, text) for every pdf in `pdf_path` as soon as it is parsed.
+
+    Extracted text is cached in `cache_dir` under the hash of the file content, so a
+    re-uploaded resume is never parsed twice. Cache misses are parsed in chunks on a
+    process pool (pypdf is pure python and would hold the GIL on threads), or on a
+    thread pool with `backend="thread"`.
+    """
+    max_workers = max_workers or os.cpu_count()
+    backend = backend or config.PDF_PARSE_BACKEND
+    cache_dir = Path(cache_dir or config.PDF_TEXT_CACHE_DIR)
+
+    with metrics.timer("rezumat_stage_seconds", stage="pdf_parsing"):
+        yield from _iter_parsed_pdfs(pdf_path, max_workers, backend, cache_dir)
+
+
+def _iter_parsed_pdfs(
+    pdf_path: Union[str, Path],
+    max_workers: int,
+    backend: str,
+    cache_dir: Path,
+) -> Iterator[Tuple[Path, str]]:
+    files = sorted(Path(pdf_path).glob("*.pdf"))
+    cache_files = {}
+    misses = []
+
+    with tqdm(total=len(files), desc="Parsing PDFs") as pbar:
+        for file_path in files:
+            cache_file = cache_dir / f"{content_id(file_path.read_bytes())}.json"
+            pages = _read_cached_text(cache_file)
+            if pages is None:
+                cache_files[file_path] = cache_file
+                misses.append(file_path)
+                continue
+            pbar.update(1)
+            yield file_path, " ".join(pages)
+
+        if not misses:
+            return
+
+        logger.info(
+            f"Parsing {len(misses)} PDFs ({len(files) - len(misses)} cached) "
+            f"with {max_workers} {backend} workers."
+        )
+
+        if backend == "process":
+            # the app runs threads (event loop, http pools), which a forked worker
+            # would copy in whatever state they are, so workers are spawned fresh
+            executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        else:
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+        chunk_size = max(1, min(16, len(misses) // (max_workers * 4)))
+        chunks = [misses[i : i + chunk_size] for i in range(0, len(misses), chunk_size)]
+
+        with executor:
+            futures = [executor.submit(_parse_chunk, chunk) for chunk in chunks]
+            for future in as_completed(futures):
+                for file_path, pages in future.result():
+                    if pages:
+                        _write_cached_text(cache_files[file_path], pages)
+                    pbar.update(1)
+                    yield file_path, " ".join(pages)
+
+
+def process_pdfs(
+    pdf_path: Union[str, Path],
+    max_workers: Optional[int] = None,
+    backend: Optional[str] = None,
+) -> List[str]:
+    """parse every pdf in `pdf_path`, multi-page CVs are joined into a single string"""
+    return [
+        text
+        for _, text in iter_parsed_pdfs(
+            pdf_path, max_workers=max_workers, backend=backend
+        )
+    ]
@@ -0,0 +1,40 @@
+from rezumat.prompts.two_stage_eval_cv import (
+    TWO_STAGE_EVAL_CV_JOB_PROMPT,
+    TWO_STAGE_EVAL_CV_SYSTEM_PROMPT,
+)
+
+# several resumes per request. The instructions and the job requirements are the
+# prefix of the single-resume prompt, so batched and single requests of a job share
+# the provider's prompt cache; only the resumes and the output array differ.
+TWO_STAGE_EVAL_CV_BATCH_RESUMES_PROMPT = """
+6. Resumes
+
+You will evaluate SEVERAL resumes against the same job requirements. Evaluate each resume independently.
+
+the resumes are given as a JSON array, each item has a "cv_id" and a "resume":
+
+{resumes}
+
+7. output format of the batch:
+
+output only VALID JSON FORMAT: a JSON array with exactly one object per resume, in the same order, 
+each object is the output format of section 4 and MUST also contain the "cv_id" of the resume it evaluates:
+
+```json 
+[
+  {{
+    "cv_id": "",
+    "resume_evaluation": {{}},
+    "deeper_analysis": {{}},
+    "recalibrated_scores": {{}},
+    "assessment": {{}}
+  }}
+]
+```
+"""
+
+TWO_STAGE_EVAL_CV_BATCH_PROMPT = (
+    TWO_STAGE_EVAL_CV_SYSTEM_PROMPT
+    + TWO_STAGE_EVAL_CV_JOB_PROMPT
+    + TWO_STAGE_EVAL_CV_BATCH_RESUMES_PROMPT
+)
@@ -0,0 +1,199 @@
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from rezumat.config import config
+from rezumat.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class CandidatePool:
+    """A persistent store of parsed CVs and evaluation results in SQLite.
+
+    CVs are keyed by their content id, so inserting the same text twice is a no-op.
+    It lives outside the directories that `setup_directories` may wipe, so new jobs
+    can be screened against every CV seen in earlier sessions without re-parsing
+    their pdfs. Job analyses are kept by the job analysis cache.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS cvs (
+                cv_id TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                source TEXT,
+                added_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS results (
+                job_id TEXT NOT NULL,
+                cv_id TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                result TEXT NOT NULL,
+                added_at REAL NOT NULL,
+                prompt_version TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (job_id, cv_id, model_name)
+            );
+            CREATE INDEX IF NOT EXISTS idx_results_cv_id ON results (cv_id);
+            CREATE INDEX IF NOT EXISTS idx_results_model_name ON results (model_name);
+            -- the full-text index of earlier pools, a second copy of the CV texts
+            DROP TABLE IF EXISTS cvs_fts;
+            -- job analyses of earlier pools, kept by the job analysis cache
+            DROP TABLE IF EXISTS jobs;
+            """
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(results)")}
+        if "prompt_version" not in columns:
+            # pools created before the results were versioned
+            self._conn.execute(
+                "ALTER TABLE results ADD COLUMN prompt_version TEXT NOT NULL DEFAULT ''"
+            )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cvs").fetchone()[0]
+
+    def __contains__(self, cv_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM cvs WHERE cv_id = ?", (cv_id,)
+            ).fetchone()
+        return row is not None
+
+    def add_cvs(
+        self, cv_tuples: Iterable[Tuple[str, str]], source: Optional[str] = None
+    ) -> int:
+        """add the (cv_id, cv_text) not in the pool yet, return how many were added"""
+        added = 0
+        now = time.time()
+        with self._lock:
+            for cv_id, cv_text in cv_tuples:
+                cursor = self._conn.execute(
+                    "INSERT OR IGNORE INTO cvs (cv_id, text, source, added_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (cv_id, cv_text, source, now),
+                )
+                added += cursor.rowcount
+            self._conn.commit()
+        return added
+
+    def get_cv(self, cv_id: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM cvs WHERE cv_id = ?", (cv_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def iter_cvs(self, batch_size: int = 500) -> Iterator[Tuple[str, str]]:
+        """yield every (cv_id, cv_text) of the pool, in insertion order"""
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, cv_id, text FROM cvs WHERE rowid > ? "
+                    "ORDER BY rowid LIMIT ?",
+                    (last_rowid, batch_size),
+                ).fetchall()
+            if not rows:
+                return
+            for last_rowid, cv_id, cv_text in rows:
+                yield cv_id, cv_text
+
+    def add_results(
+        self, results: Iterable[Tuple[str, str, str, dict]], prompt_version: str = ""
+    ) -> None:
+        """store (job_id, cv_id, model_name, result) made with `prompt_version` of
+        the cv prompt, replacing earlier results"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO results "
+                "(job_id, cv_id, model_name, result, added_at, prompt_version) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    (job_id, cv_id, model_name, json.dumps(result), now, prompt_version)
+                    for job_id, cv_id, model_name, result in results
+                ),
+            )
+            self._conn.commit()
+
+    def add_result(
+        self,
+        job_id: str,
+        cv_id: str,
+        model_name: str,
+        result: dict,
+        prompt_version: str = "",
+    ) -> None:
+        self.add_results([(job_id, cv_id, model_name, result)], prompt_version)
+
+    def get_results(
+        self,
+        job_id: Optional[str] = None,
+        cv_id: Optional[str] = None,
+        model_name: Optional[str] = None,
+        prompt_version: Optional[str] = None,
+    ) -> List[Tuple[str, str, str, dict]]:
+        """(job_id, cv_id, model_name, result) of the stored results, optionally
+        filtered by job, cv, model and prompt version"""
+        query, params = _where(
+            "SELECT job_id, cv_id, model_name, result FROM results",
+            job_id=job_id,
+            cv_id=cv_id,
+            model_name=model_name,
+            prompt_version=prompt_version,
+        )
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            (job_id, cv_id, model_name, json.loads(data))
+            for job_id, cv_id, model_name, data in rows
+        ]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                for table in ("cvs", "results")
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            for table in ("cvs", "results"):
+                self._conn.execute(f"DELETE FROM {table}")
+            self._conn.commit()
+
+
+def _where(query: str, **filters: Optional[str]) -> Tuple[str, List[str]]:
+    """`query` with a WHERE clause on the filters that are not None"""
+    columns = [column for column, value in filters.items() if value is not None]
+    if columns:
+        query += " WHERE " + " AND ".join(f"{column} = ?" for column in columns)
+    return query, [filters[column] for column in columns]
+
+
+_candidate_pool: Optional[CandidatePool] = None
+_candidate_pool_lock = threading.Lock()
+
+
+def get_candidate_pool() -> Optional[CandidatePool]:
+    """return the process-wide candidate pool, or None when it is disabled"""
+    global _candidate_pool
+
+    if not config.CANDIDATE_POOL_ENABLED:
+        return None
+
+    with _candidate_pool_lock:
+        if _candidate_pool is None:
+            _candidate_pool = CandidatePool(config.CANDIDATE_POOL_PATH)
+        return _candidate_pool
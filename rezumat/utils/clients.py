@@ -0,0 +1,87 @@
+import asyncio
+import importlib.util
+import threading
+from typing import Any, Callable, Coroutine, Dict, Hashable, Optional, TypeVar
+
+import httpx
+
+from rezumat.config import config
+from rezumat.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+T = TypeVar("T")
+
+# http/2 needs the optional `h2` package (pip install httpx[http2])
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_lock = threading.RLock()
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_http_clients: Dict[str, httpx.Client] = {}
+_async_http_clients: Dict[str, httpx.AsyncClient] = {}
+_models: Dict[Hashable, Any] = {}
+
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """the background event loop that every async llm call of the process runs on.
+
+    Async connection pools are bound to the loop that opened their connections, so
+    they can only be kept alive between runs when all runs share one loop.
+    """
+    global _loop
+    with _lock:
+        if _loop is None or _loop.is_closed():
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever, name="rezumat-event-loop", daemon=True
+            ).start()
+        return _loop
+
+
+def run_async(coroutine: Coroutine[Any, Any, T]) -> T:
+    """run `coroutine` on the shared event loop and wait for its result"""
+    return asyncio.run_coroutine_threadsafe(coroutine, get_event_loop()).result()
+
+
+def _client_kwargs() -> dict:
+    return {
+        "http2": config.HTTP2 and HTTP2_AVAILABLE,
+        "timeout": httpx.Timeout(config.HTTP_TIMEOUT, connect=10.0),
+        "limits": httpx.Limits(
+            max_connections=config.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=config.HTTP_MAX_CONNECTIONS,
+            keepalive_expiry=config.HTTP_KEEPALIVE_EXPIRY,
+        ),
+    }
+
+
+def get_http_client(name: str) -> httpx.Client:
+    """keep-alive connection pool shared by every sync request to `name`"""
+    with _lock:
+        if name not in _http_clients:
+            logger.info(f"Creating http client for {name}")
+            _http_clients[name] = httpx.Client(**_client_kwargs())
+        return _http_clients[name]
+
+
+def get_async_http_client(name: str) -> httpx.AsyncClient:
+    """keep-alive connection pool shared by every async request to `name`, used on
+    the shared event loop (see `get_event_loop`)"""
+    with _lock:
+        if name not in _async_http_clients:
+            logger.info(f"Creating async http client for {name}")
+            _async_http_clients[name] = httpx.AsyncClient(**_client_kwargs())
+        return _async_http_clients[name]
+
+
+def get_or_create_model(key: Hashable, create: Callable[[], T]) -> T:
+    """the model client registered under `key`, created with `create` on first use"""
+    with _lock:
+        if key not in _models:
+            _models[key] = create()
+        return _models[key]
+
+
+def clear_models() -> None:
+    with _lock:
+        _models.clear()
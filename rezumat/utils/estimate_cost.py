@@ -1,21 +1,230 @@
+import math
+import os
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
 import tiktoken
-import anthropic
+from langchain_core.prompts import PromptTemplate
+
+from rezumat.config import config
+from rezumat.prompts.two_stage_eval_cv import (
+    TWO_STAGE_EVAL_CV_JOB_PROMPT,
+    TWO_STAGE_EVAL_CV_RESUME_PROMPT,
+    TWO_STAGE_EVAL_CV_SYSTEM_PROMPT,
+)
+from rezumat.prompts.two_stage_eval_jd import TWO_STAGE_EVAL_JD_PROMPT
+from rezumat.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+ENCODING = "cl100k_base"
+CHARS_PER_TOKEN = 4  # used when the encoding can not be loaded (offline)
+
+
+class BudgetExceededError(ValueError):
+    """the projected cost of a run is above the budget"""
+
+
+@lru_cache(maxsize=None)
+def get_encoder() -> Optional[tiktoken.Encoding]:
+    """the tiktoken encoder, loaded once per process; None when it is unavailable"""
+    try:
+        return tiktoken.get_encoding(ENCODING)
+    except Exception as e:
+        logger.warning(
+            f"Could not load the {ENCODING} encoding ({e!r}), "
+            "token counts are approximated from the text length."
+        )
+        return None
 
 
-# estimating the cost
 def count_tokens(input_string: str) -> int:
-    tokenizer = tiktoken.get_encoding("cl100k_base")
-    tokens = tokenizer.encode(input_string)
-    return len(tokens)
+    encoder = get_encoder()
+    if encoder is None:
+        return -(-len(input_string) // CHARS_PER_TOKEN)
+    return len(encoder.encode(input_string, disallowed_special=()))
+
+
+def count_tokens_batch(
+    texts: Sequence[str], num_threads: Optional[int] = None
+) -> List[int]:
+    """token counts of `texts`, encoded on a thread pool (tiktoken releases the GIL)"""
+    encoder = get_encoder()
+    if encoder is None:
+        return [count_tokens(text) for text in texts]
+    encoded = encoder.encode_batch(
+        list(texts), num_threads=num_threads or os.cpu_count(), disallowed_special=()
+    )
+    return [len(tokens) for tokens in encoded]
+
+
+def model_price(interface: str, model_id: str) -> Tuple[float, float]:
+    """USD per million (input, output) tokens.
+
+    Looked up in `config.MODEL_PRICES` as "provider/model_id", then model_id, then
+    provider, falling back to `config.DEFAULT_MODEL_PRICE`.
+    """
+    interface = interface.lower()
+    for key in (f"{interface}/{model_id}", model_id, interface):
+        if key in config.MODEL_PRICES:
+            return tuple(config.MODEL_PRICES[key])
+    return tuple(config.DEFAULT_MODEL_PRICE)
+
+
+def calculate_cost(
+    input_tokens: int, output_tokens: int, price: Tuple[float, float]
+) -> float:
+    input_price, output_price = price
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+def render_jd_prompts(job_texts: Sequence[str]) -> List[str]:
+    template = PromptTemplate.from_template(TWO_STAGE_EVAL_JD_PROMPT)
+    return [template.format(job_description=job_text) for job_text in job_texts]
+
+
+def render_cv_prompts(
+    job_requirements: Sequence[object], cv_texts: Sequence[str]
+) -> Tuple[List[str], List[str]]:
+    """(system message per job, user message per cv) of the cv evaluation prompts.
+
+    The prompt of a pair is the system message of its job followed by the user
+    message of its cv, see `chains.get_cv_prompt`, so the tokens of every pair are
+    known from len(jobs) + len(cvs) rendered messages.
+    """
+    instructions = PromptTemplate.from_template(
+        TWO_STAGE_EVAL_CV_SYSTEM_PROMPT
+    ).format()
+    job_prompt = PromptTemplate.from_template(TWO_STAGE_EVAL_CV_JOB_PROMPT)
+    resume_prompt = PromptTemplate.from_template(TWO_STAGE_EVAL_CV_RESUME_PROMPT)
+    return (
+        [
+            instructions + job_prompt.format(job_requirements=requirements)
+            for requirements in job_requirements
+        ],
+        [resume_prompt.format(resume=cv_text) for cv_text in cv_texts],
+    )
+
+
+def _stage_seconds(
+    calls: int, model_usage: Dict[Tuple[str, str], Tuple[int, int]], concurrency: int
+) -> float:
+    """duration of a stage: bound by the llm latency over `concurrency` slots, or by
+    the requests/tokens per minute of the slowest model"""
+    seconds = math.ceil(calls / max(1, concurrency)) * config.ESTIMATED_CALL_SECONDS
+    for (interface, model_id), (model_calls, tokens) in model_usage.items():
+        interface = interface.lower()
+        limits = config.RATE_LIMITS.get(
+            f"{interface}/{model_id}", config.RATE_LIMITS.get(interface, {})
+        )
+        if limits.get("requests_per_minute"):
+            seconds = max(seconds, 60 * model_calls / limits["requests_per_minute"])
+        if limits.get("tokens_per_minute"):
+            seconds = max(seconds, 60 * tokens / limits["tokens_per_minute"])
+    return seconds
+
+
+def estimate_run(
+    jd_model: Optional[Tuple[str, str]],
+    cv_models: Sequence[Tuple[str, str]],
+    job_texts: Sequence[str],
+    cv_texts: Sequence[str],
+    job_requirements: Optional[Sequence[object]] = None,
+    max_concurrency: Optional[int] = None,
+    cvs_per_job: Optional[int] = None,
+    num_cvs: Optional[int] = None,
+) -> dict:
+    """projected tokens, cost and duration of evaluating every cv against every job.
+
+    The actual prompts are rendered and counted. The job analysis of the jd stage is
+    not known before the run, so unless `job_requirements` is given it is counted as
+    `config.ESTIMATED_COMPLETION_TOKENS`, like every completion. `jd_model` is None
+    when the jobs are already analyzed. With `cvs_per_job` (a shortlist), each job
+    is evaluated against that many CVs of average length. With `num_cvs`, the CVs
+    are not parsed yet: `cv_texts` is ignored and every CV is counted as
+    `config.ESTIMATED_CV_TOKENS`.
+    """
+    completion_tokens = config.ESTIMATED_COMPLETION_TOKENS
+    concurrency = max_concurrency or config.MAX_CONCURRENCY
+    if num_cvs is None:
+        num_cvs = len(cv_texts)
+    else:
+        cv_texts = []
+    per_job = min(cvs_per_job or num_cvs, num_cvs)
+    estimate = {"models": {}, "pairs": len(job_texts) * per_job}
+
+    def add(model: Tuple[str, str], calls: int, input_tokens: int) -> None:
+        interface, model_id = model
+        usage = estimate["models"].setdefault(
+            f"{interface.lower()}/{model_id}",
+            {"calls": 0, "input_tokens": 0, "output_tokens": 0, "cost": 0.0},
+        )
+        usage["calls"] += calls
+        usage["input_tokens"] += input_tokens
+        usage["output_tokens"] += calls * completion_tokens
+        usage["cost"] = calculate_cost(
+            usage["input_tokens"], usage["output_tokens"], model_price(*model)
+        )
+
+    seconds = 0.0
+    if jd_model is not None and job_texts:
+        jd_tokens = sum(count_tokens_batch(render_jd_prompts(job_texts)))
+        add(jd_model, len(job_texts), jd_tokens)
+        total_tokens = jd_tokens + len(job_texts) * completion_tokens
+        seconds += _stage_seconds(
+            len(job_texts), {jd_model: (len(job_texts), total_tokens)}, concurrency
+        )
+
+    if job_requirements is None:
+        job_requirements = [""] * len(job_texts)
+        extra_tokens = completion_tokens
+    else:
+        extra_tokens = 0
+    system_messages, user_messages = render_cv_prompts(job_requirements, cv_texts)
+    system_tokens = sum(count_tokens_batch(system_messages)) + extra_tokens * len(
+        system_messages
+    )
+    if cv_texts or not num_cvs:
+        user_tokens = sum(count_tokens_batch(user_messages))
+    else:
+        # the resume template around an average cv
+        empty_resume = render_cv_prompts([], [""])[1][0]
+        user_tokens = num_cvs * (
+            count_tokens(empty_resume) + config.ESTIMATED_CV_TOKENS
+        )
+    # every system message is sent once per cv, every user message once per job
+    pair_tokens = system_tokens * per_job
+    if num_cvs:
+        pair_tokens += round(user_tokens * len(job_texts) * per_job / num_cvs)
+
+    cv_usage = {}
+    for model in dict.fromkeys(tuple(model) for model in cv_models):
+        add(model, estimate["pairs"], pair_tokens)
+        cv_usage[model] = (
+            estimate["pairs"],
+            pair_tokens + estimate["pairs"] * completion_tokens,
+        )
+    seconds += _stage_seconds(estimate["pairs"] * len(cv_usage), cv_usage, concurrency)
+
+    estimate["cost"] = sum(usage["cost"] for usage in estimate["models"].values())
+    estimate["seconds"] = seconds
+    return estimate
 
 
-def calculate_cost(input_string: str, cost_per_million_tokens: float = 5) -> float:
-    num_tokens = count_tokens(input_string)
-    total_cost = (num_tokens / 1_000_000) * cost_per_million_tokens
-    return total_cost
+def format_estimate(estimate: dict) -> str:
+    minutes, seconds = divmod(round(estimate["seconds"]), 60)
+    calls = sum(usage["calls"] for usage in estimate["models"].values())
+    tokens = sum(
+        usage["input_tokens"] + usage["output_tokens"]
+        for usage in estimate["models"].values()
+    )
+    return (
+        f"Estimated cost ${estimate['cost']:.4f} and duration {minutes}m {seconds:02d}s "
+        f"for {estimate['pairs']} job-CV pairs ({calls} llm calls, {tokens} tokens)."
+    )
 
 
-# client = anthropic.Client()
-# token_count = client.count_tokens(complete_template)
-# print(token_count)
-# generate unique id
+def check_budget(estimate: dict, budget: Optional[float] = None) -> bool:
+    """whether the projected cost fits `budget` (default `config.BUDGET_LIMIT`)"""
+    budget = config.BUDGET_LIMIT if budget is None else budget
+    return budget is None or estimate["cost"] <= budget
@@ -0,0 +1,34 @@
+import hashlib
+from typing import List, Tuple, TypeVar, Union
+
+T = TypeVar("T")
+
+ID_LENGTH = 16
+
+
+def normalize_text(text: str) -> str:
+    """collapse all whitespace so that formatting-only differences are ignored"""
+    return " ".join(text.split())
+
+
+def content_id(data: Union[str, bytes]) -> str:
+    """a stable id derived from the content: normalized text or raw bytes (e.g. a pdf)"""
+    if isinstance(data, str):
+        data = normalize_text(data).encode("utf-8")
+    return hashlib.sha256(data).hexdigest()[:ID_LENGTH]
+
+
+def prompt_version(template: str) -> str:
+    """a short hash of a prompt template, stored with results made from it"""
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:ID_LENGTH]
+
+
+def dedupe(tuples: List[Tuple[str, T]]) -> List[Tuple[str, T]]:
+    """drop tuples whose id was already seen, keeping the first occurrence"""
+    seen = set()
+    unique = []
+    for item_id, item in tuples:
+        if item_id not in seen:
+            seen.add(item_id)
+            unique.append((item_id, item))
+    return unique
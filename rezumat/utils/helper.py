@@ -1,20 +1,31 @@
+import hashlib
 import json
 import os
 import shutil
+import time
 from pathlib import Path
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 
 import gradio as gr
-import requests
 
 from rezumat.config import config
+from rezumat.utils.clients import get_http_client
+from rezumat.utils.job_analysis_cache import JobAnalysisCache
 from rezumat.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 
+# (interface, sha256 of the api key) -> time of its last successful verification
+_verified_keys: Dict[Tuple[str, str], float] = {}
+
+
 def set_and_verify_api_key(api_key: str, interface: str) -> str:
-    """set and verify the api key for the model"""
+    """set and verify the api key for the model.
+
+    A verified key is trusted for `config.API_KEY_VERIFY_TTL` seconds, requests go
+    through a shared keep-alive connection pool.
+    """
 
     env_var_map = {
         "groq": "GROQ_API_KEY",
@@ -30,13 +41,33 @@ def set_and_verify_api_key(api_key: str, interface: str) -> str:
 
     interface = interface.lower()
 
-    if interface in env_var_map:
+    if interface == "ollama":
+        # local server, no api key: only check that it is up
+        try:
+            response = get_http_client("verify").get(
+                f"{config.OLLAMA_BASE_URL}/api/tags", timeout=5
+            )
+            response.raise_for_status()
+            logger.info(f"Ollama server is up at {config.OLLAMA_BASE_URL}")
+        except Exception as e:
+            logger.error(f"Error reaching the ollama server: {e}")
+            raise gr.Error(f"Error reaching the ollama server: {e}")
+    elif interface in env_var_map:
         os.environ[env_var_map[interface]] = api_key
+        cache_key = (interface, hashlib.sha256(api_key.encode()).hexdigest())
+        verified_at = _verified_keys.get(cache_key)
+        if (
+            verified_at is not None
+            and time.monotonic() - verified_at < config.API_KEY_VERIFY_TTL
+        ):
+            logger.info(f"API key for {interface} was verified recently")
+            return
         url = url_map[interface]
         headers = {"Authorization": f"Bearer {api_key}"}
         try:
-            response = requests.get(url, headers=headers)
+            response = get_http_client("verify").get(url, headers=headers)
             if response.status_code == 200:
+                _verified_keys[cache_key] = time.monotonic()
                 logger.info(f"API key set successfully for {interface}")
             else:
                 logger.error(f"Error verifying API key: {response.status_code}")
@@ -100,13 +131,51 @@ def save_upload_file(file) -> None:
     gr.Info(f"file is saved to {config.PDF_UPLOAD_FOLDER}{file.name.split('/')[-1]}")
 
 
-# [TODO] to remove?
-def read_job_data() -> List[Tuple[str, dict]]:
-    """Read job data from JOBS_OUTPUT_DIR"""
+# [TODO] to remove? superseded by `get_job_data`
+def read_job_data(
+    job_ids: Optional[List[str]] = None,
+    jobs_dir: Optional[Union[str, Path]] = None,
+) -> List[Tuple[str, dict]]:
+    """Read job data from `jobs_dir` (default JOBS_OUTPUT_DIR), optionally only for
+    the given job ids"""
     job_data = []
-    for file in Path(config.JOBS_OUTPUT_DIR).glob("*.json"):
+    for file in Path(jobs_dir or config.JOBS_OUTPUT_DIR).glob("*.json"):
         job_id = file.stem.split("_")[0]
+        if job_ids is not None and job_id not in job_ids:
+            continue
         with open(file, "r") as f:
             job_analysis = json.load(f)
             job_data.append((job_id, job_analysis))
     return job_data
+
+
+def get_job_data(
+    job_tuples: List[Tuple[str, str]],
+    model_name: str,
+    jobs_dir: Optional[Union[str, Path]] = None,
+    memo: Optional[JobAnalysisCache] = None,
+) -> List[Tuple[str, dict]]:
+    """(job_id, job_analysis) of the (job_id, job_text) analyzed by `model_name`.
+
+    Replaces `read_job_data`: analyses are looked up in `memo` by job text, which
+    only holds analyses made with the current jd prompt. Without it, they are read
+    from their result file in `jobs_dir` (default JOBS_OUTPUT_DIR). Jobs without an
+    analysis are left out.
+    """
+    job_data = []
+    for job_id, job_text in job_tuples:
+        if memo is not None:
+            job_analysis = memo.peek(job_text, model_name)
+        else:
+            file = (
+                Path(jobs_dir or config.JOBS_OUTPUT_DIR) / f"{job_id}_{model_name}.json"
+            )
+            job_analysis = None
+            if file.exists():
+                with open(file, "r") as f:
+                    job_analysis = json.load(f)
+        if job_analysis is None:
+            logger.warning(f"No analysis of job_id: {job_id} by {model_name}.")
+            continue
+        job_data.append((job_id, job_analysis))
+    return job_data
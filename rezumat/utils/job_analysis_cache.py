@@ -0,0 +1,115 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from rezumat.config import config
+from rezumat.prompts.two_stage_eval_jd import TWO_STAGE_EVAL_JD_PROMPT
+from rezumat.utils.hashing import normalize_text, prompt_version
+from rezumat.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# analyses made with an earlier version of the jd prompt are not reused
+JD_PROMPT_VERSION = prompt_version(TWO_STAGE_EVAL_JD_PROMPT)
+
+
+def job_analysis_key(
+    job_text: str, model_name: str, prompt_version: str = JD_PROMPT_VERSION
+) -> str:
+    """hash of the normalized job text, model and jd prompt version"""
+    payload = json.dumps(
+        {
+            "job_text": normalize_text(job_text),
+            "model_name": model_name,
+            "prompt_version": prompt_version,
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class JobAnalysisCache:
+    """A persistent memo of job description analyses in SQLite.
+
+    Every entry is loaded into memory when the cache is opened (there are few jobs
+    compared to CVs), so lookups are a dict access.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS job_analyses (
+                key TEXT PRIMARY KEY,
+                analysis TEXT NOT NULL,
+                added_at REAL NOT NULL
+            )"""
+        )
+        self._conn.commit()
+        self._analyses: Dict[str, dict] = {
+            key: json.loads(analysis)
+            for key, analysis in self._conn.execute(
+                "SELECT key, analysis FROM job_analyses"
+            )
+        }
+
+    def __len__(self) -> int:
+        return len(self._analyses)
+
+    def peek(self, job_text: str, model_name: str) -> Optional[dict]:
+        """like `get`, without counting a hit or a miss"""
+        return self._analyses.get(job_analysis_key(job_text, model_name))
+
+    def get(self, job_text: str, model_name: str) -> Optional[dict]:
+        analysis = self.peek(job_text, model_name)
+        if analysis is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return analysis
+
+    def set(self, job_text: str, model_name: str, analysis: dict) -> None:
+        key = job_analysis_key(job_text, model_name)
+        with self._lock:
+            self._analyses[key] = analysis
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_analyses (key, analysis, added_at) "
+                "VALUES (?, ?, ?)",
+                (key, json.dumps(analysis), time.time()),
+            )
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "entries": len(self)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM job_analyses")
+            self._conn.commit()
+            self._analyses.clear()
+
+
+_job_analysis_cache: Optional[JobAnalysisCache] = None
+_job_analysis_cache_lock = threading.Lock()
+
+
+def get_job_analysis_cache() -> Optional[JobAnalysisCache]:
+    """return the process-wide job analysis cache, or None when it is disabled"""
+    global _job_analysis_cache
+
+    if not config.JOB_ANALYSIS_CACHE_ENABLED:
+        return None
+
+    with _job_analysis_cache_lock:
+        if _job_analysis_cache is None:
+            _job_analysis_cache = JobAnalysisCache(config.JOB_ANALYSIS_CACHE_PATH)
+        return _job_analysis_cache
@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Union
+
+from rezumat.config import config
+from rezumat.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+PENDING = "pending"
+IN_FLIGHT = "in-flight"
+DONE = "done"
+FAILED = "failed"
+
+
+def new_run_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+class RunManifest:
+    """Append-only JSONL journal of the state of every job-cv pair of a run.
+
+    Every state change is one line, flushed and fsynced before the call it
+    describes goes out, so the journal survives a crash at any point; replaying
+    it gives the last state of every pair. A pair left "in-flight" by a crash is
+    treated like a pending one, and the torn last line of a crash is cut off
+    before new lines are appended.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._states: Dict[str, dict] = {}
+
+        if self.path.exists():
+            _truncate_torn_tail(self.path)
+            with open(self.path, "r") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # torn last line of a crashed run
+                        continue
+                    self._states[entry["key"]] = entry
+            logger.info(f"Loaded run manifest {self.path}: {self.summary()}")
+
+        self._file = open(self.path, "a")
+
+    @classmethod
+    def for_run(
+        cls, run_id: str, runs_dir: Optional[Union[str, Path]] = None
+    ) -> "RunManifest":
+        return cls(Path(runs_dir or config.RUNS_DIR) / f"{run_id}.jsonl")
+
+    @property
+    def run_id(self) -> str:
+        return self.path.stem
+
+    def record(self, key: str, state: str, error: Optional[str] = None) -> None:
+        self.record_many([key], state, error)
+
+    def record_many(
+        self, keys: Iterable[str], state: str, error: Optional[str] = None
+    ) -> None:
+        """record the same state for several pairs, with a single fsync"""
+        now = time.time()
+        with self._lock:
+            for key in keys:
+                entry = {"key": key, "state": state, "time": now}
+                if error is not None:
+                    entry["error"] = error
+                self._states[key] = entry
+                self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def state(self, key: str) -> Optional[str]:
+        entry = self._states.get(key)
+        return entry["state"] if entry else None
+
+    def is_done(self, key: str) -> bool:
+        return self.state(key) == DONE
+
+    def failed(self) -> Dict[str, str]:
+        """{key: error} of the pairs whose last state is failed"""
+        return {
+            key: entry.get("error", "")
+            for key, entry in self._states.items()
+            if entry["state"] == FAILED
+        }
+
+    def summary(self) -> Dict[str, int]:
+        return dict(Counter(entry["state"] for entry in self._states.values()))
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+def _truncate_torn_tail(path: Path) -> None:
+    """cut off a last line without its newline, left by a crash mid-write"""
+    with open(path, "rb+") as f:
+        data = f.read()
+        if data and not data.endswith(b"\n"):
+            f.truncate(data.rfind(b"\n") + 1)
@@ -0,0 +1,147 @@
+import json
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple, Union
+
+import numpy as np
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from rezumat.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, str]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, **extra) -> str:
+    items = list(labels) + [(key, str(value)) for key, value in extra.items()]
+    if not items:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in items) + "}"
+
+
+class Metrics:
+    """Thread-safe counters and observations (latencies, sizes) with labels.
+
+    Exported as a JSON summary (`summary`) or in the Prometheus text format
+    (`to_prometheus`), with count, sum and quantiles for the observations.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+        self._observations: Dict[str, Dict[Labels, List[float]]] = defaultdict(
+            lambda: defaultdict(list)
+        )
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        with self._lock:
+            self._counters[name][_labels(labels)] += value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._observations[name][_labels(labels)].append(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels) -> Iterator[None]:
+        """observe the duration of the block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def timed(self, runnable: Runnable, name: str, **labels) -> RunnableLambda:
+        """wrap `runnable` so that the duration of every call is observed"""
+
+        def invoke(inputs):
+            with self.timer(name, **labels):
+                return runnable.invoke(inputs)
+
+        async def ainvoke(inputs):
+            with self.timer(name, **labels):
+                return await runnable.ainvoke(inputs)
+
+        return RunnableLambda(invoke, afunc=ainvoke, name=f"timed_{name}")
+
+    def summary(self) -> Dict[str, List[dict]]:
+        """{metric name: [{labels, value} or {labels, count, sum, min, max, p50..}]}"""
+        summary = {}
+        with self._lock:
+            for name, series in self._counters.items():
+                summary[name] = [
+                    {"labels": dict(labels), "value": value}
+                    for labels, value in series.items()
+                ]
+            for name, series in self._observations.items():
+                summary[name] = []
+                for labels, values in series.items():
+                    entry = {
+                        "labels": dict(labels),
+                        "count": len(values),
+                        "sum": float(np.sum(values)),
+                        "min": float(np.min(values)),
+                        "max": float(np.max(values)),
+                    }
+                    for quantile in QUANTILES:
+                        entry[f"p{int(quantile * 100)}"] = float(
+                            np.quantile(values, quantile)
+                        )
+                    summary[name].append(entry)
+        return summary
+
+    def to_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in series.items():
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            for name, series in sorted(self._observations.items()):
+                lines.append(f"# TYPE {name} summary")
+                for labels, values in series.items():
+                    for quantile in QUANTILES:
+                        value = np.quantile(values, quantile)
+                        lines.append(
+                            f"{name}{_format_labels(labels, quantile=quantile)} {value}"
+                        )
+                    lines.append(f"{name}_sum{_format_labels(labels)} {sum(values)}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {len(values)}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Union[str, Path]) -> Path:
+        """write `to_prometheus` for a .prom path, `summary` as JSON otherwise"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            if path.suffix == ".prom":
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.summary(), f, indent=2)
+        return path
+
+    def write_run(self, run_id: str, runs_dir: Union[str, Path]) -> None:
+        """write the metrics of a run next to its manifest, as JSON and .prom"""
+        for suffix in (".metrics.json", ".prom"):
+            path = self.write(Path(runs_dir) / f"{run_id}{suffix}")
+        logger.info(f"Run metrics written to {path.with_suffix('')}.*")
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._observations.clear()
+
+
+# process-wide metrics, filled in by the eval chains and the pipeline stages
+metrics = Metrics()
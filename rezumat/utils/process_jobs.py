@@ -1,79 +1,675 @@
+import asyncio
+import json
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from functools import partial
 from pathlib import Path
-from typing import List, Tuple, Union
-from uuid import uuid4
+from typing import (
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 import pandas as pd
 from langchain_core.runnables.base import RunnableSequence
 from tqdm import tqdm
 
 from rezumat.config import config
-from rezumat.evaluators.two_stage_evaluators import two_stage_eval_cv, two_stage_eval_jd
+from rezumat.evaluators.ensemble import ENSEMBLE_NAME, combine_results, models_agree
+from rezumat.evaluators.pre_screen import pre_screen
+from rezumat.prompts.two_stage_eval_cv import TWO_STAGE_EVAL_CV_PROMPT
+from rezumat.evaluators.two_stage_evaluators import (
+    _save_result,
+    atwo_stage_eval_cv,
+    atwo_stage_eval_cv_batch,
+    atwo_stage_eval_jd,
+)
+from rezumat.utils.clients import run_async
+from rezumat.utils.estimate_cost import count_tokens
+from rezumat.utils.candidate_pool import CandidatePool
+from rezumat.utils.hashing import content_id, dedupe, prompt_version
+from rezumat.utils.job_analysis_cache import JobAnalysisCache
 from rezumat.utils.logger import get_logger
+from rezumat.utils.manifest import DONE, FAILED, IN_FLIGHT, PENDING, RunManifest
+from rezumat.utils.metrics import metrics
+from rezumat.utils.retry import DeadLetterQueue
+
+# results of an earlier version of the cv prompt are evaluated again
+CV_PROMPT_VERSION = prompt_version(TWO_STAGE_EVAL_CV_PROMPT)
 
 logger = get_logger(__name__)
 
 
+@asynccontextmanager
+async def _slot(semaphore: asyncio.Semaphore) -> AsyncIterator[None]:
+    """acquire `semaphore`, recording the time spent waiting for it"""
+    start = time.perf_counter()
+    async with semaphore:
+        metrics.observe(
+            "rezumat_queue_wait_seconds",
+            time.perf_counter() - start,
+            queue="concurrency",
+        )
+        yield
+
+
+async def _run_bounded(
+    tasks: List[Callable[[], Awaitable]],
+    max_concurrency: int,
+    desc: str,
+) -> List:
+    """run the task factories with at most `max_concurrency` of them in flight.
+
+    Results are collected in completion order, failed tasks are logged and skipped.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(task):
+        async with _slot(semaphore):
+            return await task()
+
+    results = []
+    start = time.perf_counter()
+    pending = [asyncio.ensure_future(run(task)) for task in tasks]
+
+    with tqdm(total=len(pending), desc=desc) as pbar:
+        for future in asyncio.as_completed(pending):
+            try:
+                result = await future
+                if result is not None:
+                    results.append(result)
+            except Exception as e:
+                logger.error(f"{desc}: {e}")
+            pbar.update(1)
+            pbar.set_postfix(rate=f"{pbar.n / (time.perf_counter() - start):.2f}/s")
+
+    elapsed = time.perf_counter() - start
+    throughput = len(pending) / elapsed if elapsed > 0 else 0.0
+    logger.info(
+        f"{desc}: {len(results)}/{len(pending)} succeeded in {elapsed:.1f}s "
+        f"({throughput:.2f} per sec, max_concurrency={max_concurrency})"
+    )
+    return results
+
+
+def _model_names(model_tuples: List[Tuple[str, RunnableSequence]]) -> List[str]:
+    if isinstance(model_tuples, Tuple):
+        model_tuples = [model_tuples]
+    return [model_name for model_name, _ in model_tuples]
+
+
+def _is_done(
+    output_dir: Union[str, Path], file_prefix: str, model_names: List[str]
+) -> bool:
+    """whether every model already has a result file for `file_prefix`"""
+    return all(
+        os.path.exists(os.path.join(output_dir, f"{file_prefix}_{model_name}.json"))
+        for model_name in model_names
+    )
+
+
+def _result_names(model_names: List[str]) -> List[str]:
+    """names of the result files of a pair, including the ensemble of several models"""
+    return model_names + [ENSEMBLE_NAME] if len(model_names) > 1 else model_names
+
+
+def _pair_done_names(model_names: List[str]) -> List[str]:
+    """result files that mark a pair as done (models may be skipped on agreement)"""
+    return [ENSEMBLE_NAME] if len(model_names) > 1 else model_names
+
+
+def _add_ensemble(
+    job_id: str,
+    cv_id: str,
+    model_results: Optional[dict],
+    model_names: List[str],
+    output_dir: Union[str, Path],
+) -> Optional[dict]:
+    """combine the results of several models into an extra "ensemble" result"""
+    if len(model_names) < 2 or not model_results:
+        return model_results
+    combined = combine_results(model_results, config.ENSEMBLE_METHOD)
+    if combined is not None:
+        _save_result(output_dir, f"{job_id}_{cv_id}_{ENSEMBLE_NAME}", combined)
+        model_results[ENSEMBLE_NAME] = combined
+    return model_results
+
+
+async def _evaluate_pair(
+    model_tuples: List[Tuple[str, RunnableSequence]],
+    job: Tuple[str, dict],
+    cv: Tuple[str, str],
+    output_dir: Union[str, Path],
+    cascade_model_tuples: Optional[List[Tuple[str, RunnableSequence]]] = None,
+    escalate: Optional[Callable[[dict], bool]] = None,
+) -> Optional[dict]:
+    """evaluate a pair with every model, plus their ensemble when there are several.
+
+    With `cascade_model_tuples`, their results are returned instead unless
+    `escalate` flags one of them.
+    """
+    if cascade_model_tuples:
+        cheap_results = await atwo_stage_eval_cv(
+            cascade_model_tuples, job, cv, output_dir
+        )
+        if cheap_results and not any(map(escalate, cheap_results.values())):
+            return cheap_results
+        logger.info(f"Escalating cv_id: {cv[0]} for job_id: {job[0]}.")
+
+    stop_early = None
+    if config.ENSEMBLE_TOLERANCE is not None:
+        stop_early = partial(models_agree, tolerance=config.ENSEMBLE_TOLERANCE)
+    model_results = await atwo_stage_eval_cv(
+        model_tuples, job, cv, output_dir, stop_early
+    )
+    return _add_ensemble(
+        job[0], cv[0], model_results, _model_names(model_tuples), output_dir
+    )
+
+
+def _load_finished(
+    output_dir: Union[str, Path],
+    file_prefix: str,
+    model_names: List[str],
+    cascade_names: List[str],
+    escalate: Optional[Callable[[dict], bool]],
+) -> Optional[dict]:
+    """results of a finished pair, or None when it still has to be evaluated.
+
+    A cascaded pair is finished with results of the strong models, or with results
+    of the cheap models that do not need escalation.
+    """
+    if _is_done(output_dir, file_prefix, _pair_done_names(model_names)):
+        return _load_results(output_dir, file_prefix, model_names)
+    if cascade_names and _is_done(output_dir, file_prefix, cascade_names):
+        cheap_results = _load_results(output_dir, file_prefix, cascade_names)
+        if not any(map(escalate, cheap_results.values())):
+            return cheap_results
+    return None
+
+
+def finished_in_pool(
+    pool: CandidatePool,
+    job_ids: Iterable[str],
+    cv_id: str,
+    model_names: List[str],
+    cascade_names: Optional[List[str]] = None,
+    escalate: Optional[Callable[[dict], bool]] = None,
+    version: str = CV_PROMPT_VERSION,
+) -> Dict[str, Dict[str, dict]]:
+    """{job_id: results} of the jobs whose pair with `cv_id` is finished in `pool`.
+
+    A pair is finished when `pool` holds its results by the models for the
+    `version` of the cv prompt, with the rules of `_load_finished`, so only new CVs,
+    new jobs, new models or a new prompt are evaluated.
+    """
+    job_ids = set(job_ids)
+    stored = defaultdict(dict)
+    for job_id, _, model_name, result in pool.get_results(
+        cv_id=cv_id, prompt_version=version
+    ):
+        if job_id in job_ids:
+            stored[job_id][model_name] = result
+
+    finished = {}
+    for job_id, results in stored.items():
+        if all(name in results for name in _pair_done_names(model_names)):
+            finished[job_id] = {
+                name: results[name]
+                for name in _result_names(model_names)
+                if name in results
+            }
+        elif (
+            cascade_names
+            and all(name in results for name in cascade_names)
+            and not any(escalate(results[name]) for name in cascade_names)
+        ):
+            finished[job_id] = {name: results[name] for name in cascade_names}
+    return finished
+
+
+def _screen_pair(
+    job: Tuple[str, dict],
+    cv: Tuple[str, str],
+    model_names: List[str],
+    threshold: Optional[float],
+) -> Optional[dict]:
+    """pre-screen a pair, a rejected pair gets a "no" result for every model.
+
+    The result is not saved: it depends on the threshold, not on the models, so a
+    resumed run with other settings screens the pair again.
+    """
+    if threshold is None:
+        return None
+    result = pre_screen(job[1], cv[1], threshold)
+    if result is None:
+        return None
+
+    logger.info(f"Pre-screened out cv_id: {cv[0]} for job_id: {job[0]}")
+    return {model_name: result for model_name in _result_names(model_names)}
+
+
+async def aprocess_all_jobs(
+    model_tuples: List[Tuple[str, RunnableSequence]],
+    job_tuples: List[Tuple[str, str]],
+    output_dir: Union[str, Path],
+    max_concurrency: Optional[int] = None,
+    resume: bool = False,
+    memo: Optional[JobAnalysisCache] = None,
+) -> List[dict]:
+    """evaluate all job descriptions concurrently.
+
+    With `memo`, jobs already analyzed by every model with the current jd prompt,
+    in any run, are skipped and new analyses are added to it. Without it, `resume`
+    skips the jobs that already have a result file for every model (the files do
+    not record the prompt version, so the memo takes precedence).
+    """
+    model_names = _model_names(model_tuples)
+    if memo is None and resume:
+        job_tuples = [
+            job_tuple
+            for job_tuple in job_tuples
+            if not _is_done(output_dir, job_tuple[0], model_names)
+        ]
+    if memo is not None:
+        pending = [
+            job_tuple
+            for job_tuple in job_tuples
+            if any(memo.get(job_tuple[1], name) is None for name in model_names)
+        ]
+        if len(pending) < len(job_tuples):
+            logger.info(
+                f"Reusing the memoized analyses of {len(job_tuples) - len(pending)} "
+                "jobs."
+            )
+        job_tuples = pending
+
+    async def analyze(job_tuple):
+        model_results = await atwo_stage_eval_jd(model_tuples, job_tuple, output_dir)
+        if memo is not None and model_results:
+            for model_name, analysis in model_results.items():
+                memo.set(job_tuple[1], model_name, analysis)
+        return model_results
+
+    tasks = [lambda job_tuple=job_tuple: analyze(job_tuple) for job_tuple in job_tuples]
+    return await _run_bounded(
+        tasks, max_concurrency or config.MAX_CONCURRENCY, "Processing all jobs"
+    )
+
+
 def process_all_jobs(
     model_tuples: List[Tuple[str, RunnableSequence]],
     job_text: Union[str, List[str]],
     output_dir: Union[str, Path],
-):
+    max_concurrency: Optional[int] = None,
+    resume: bool = False,
+    memo: Optional[JobAnalysisCache] = None,
+) -> List[Tuple[str, str]]:
 
     # create the job tuple which consists of job_id and job_text
     if isinstance(job_text, List):
-        job_tuples = [(str(uuid4()), jt) for jt in job_text]
+        job_tuples = dedupe([(content_id(jt), jt) for jt in job_text])
     else:
-        job_tuples = [(str(uuid4()), job_text)]
+        job_tuples = [(content_id(job_text), job_text)]
 
     pd.DataFrame(job_tuples, columns=["job_id", "job_text"]).to_csv(
         os.path.join(config.CSV_OUTPUT_DIR, "job_tuples.csv"), index=False
     )
-    logger.info(f"saved job tuple")
+    logger.info("saved job tuple")
+
+    with metrics.timer("rezumat_stage_seconds", stage="jd_analysis"):
+        run_async(
+            aprocess_all_jobs(
+                model_tuples, job_tuples, output_dir, max_concurrency, resume, memo
+            )
+        )
+    return job_tuples
 
-    # [TODO] change to the number of cores in the machine (add to config)
-    with ThreadPoolExecutor(max_workers=1) as executor:
 
-        futures = []
+async def aretry_dead_letters(
+    model_tuples: List[Tuple[str, RunnableSequence]],
+    output_dir: Union[str, Path],
+    max_concurrency: Optional[int] = None,
+    on_result: Optional[Callable[[str, str, str, dict], None]] = None,
+) -> Tuple[int, int]:
+    """re-run the failed evaluations queued in `output_dir`, see `DeadLetterQueue`.
 
-        for job_tuple in job_tuples:
-            futures.append(
-                executor.submit(two_stage_eval_jd, model_tuples, job_tuple, output_dir)
+    Entries of models that are not in `model_tuples` are put back. Evaluations
+    that fail again are queued again. `on_result(job_id, cv_id, model_name, result)`
+    is called for every recovered cv result. Returns (retried, succeeded).
+    """
+    if isinstance(model_tuples, Tuple):
+        model_tuples = [model_tuples]
+    graders = dict(model_tuples)
+    queue = DeadLetterQueue.in_dir(output_dir)
+
+    async def retry_cv(model_tuple, job_tuple, cv_tuple):
+        model_results = await atwo_stage_eval_cv(
+            model_tuple, job_tuple, cv_tuple, output_dir
+        )
+        if model_results and on_result is not None:
+            for model_name, result in model_results.items():
+                on_result(job_tuple[0], cv_tuple[0], model_name, result)
+        return model_results
+
+    tasks = []
+    for entry in queue.drain():
+        model_tuple = (entry["model_name"], graders.get(entry["model_name"]))
+        if model_tuple[1] is None:
+            queue.add(entry, RuntimeError(entry.get("error", "")))
+        elif entry["kind"] == "jd":
+            job_tuple = (entry["job_id"], entry["job_description"])
+            tasks.append(
+                lambda m=model_tuple, j=job_tuple: atwo_stage_eval_jd(m, j, output_dir)
+            )
+        else:
+            job_tuple = (entry["job_id"], entry["job_requirements"])
+            cv_tuple = (entry["cv_id"], entry["resume"])
+            tasks.append(
+                lambda m=model_tuple, j=job_tuple, c=cv_tuple: retry_cv(m, j, c)
             )
 
-        for future in tqdm(
-            as_completed(futures), total=len(job_tuples), desc="Processing all jobs"
-        ):
-            try:
-                future = future.result()
-            except Exception as e:
-                print(f"Processing Error: {e}")
+    results = await _run_bounded(
+        tasks, max_concurrency or config.MAX_CONCURRENCY, "Retrying failed evaluations"
+    )
+    return len(tasks), len(results)
 
 
-def process_all_pairs(
+def retry_dead_letters(
+    model_tuples: List[Tuple[str, RunnableSequence]],
+    output_dir: Union[str, Path],
+    max_concurrency: Optional[int] = None,
+    on_result: Optional[Callable[[str, str, str, dict], None]] = None,
+) -> Tuple[int, int]:
+    return run_async(
+        aretry_dead_letters(model_tuples, output_dir, max_concurrency, on_result)
+    )
+
+
+def _load_results(
+    output_dir: Union[str, Path], file_prefix: str, model_names: List[str]
+) -> dict:
+    """read the existing result files of a finished pair"""
+    results = {}
+    for model_name in _result_names(model_names):
+        result_file = os.path.join(output_dir, f"{file_prefix}_{model_name}.json")
+        if os.path.exists(result_file):
+            with open(result_file) as f:
+                results[model_name] = json.load(f)
+    return results
+
+
+def pack_cv_batches(
+    cv_stream: Iterable[Tuple[str, str]],
+    batch_size: int,
+    token_budget: Optional[int] = None,
+) -> Iterator[List[Tuple[str, str]]]:
+    """group CVs into batches of at most `batch_size` CVs and `token_budget` tokens.
+
+    A batch is yielded as soon as it is full, so this works on a lazy stream. A
+    single CV larger than the budget gets a batch of its own.
+    """
+    batch, batch_tokens = [], 0
+    for cv_tuple in cv_stream:
+        tokens = count_tokens(cv_tuple[1]) if token_budget and batch_size > 1 else 0
+        if batch and token_budget and batch_tokens + tokens > token_budget:
+            yield batch
+            batch, batch_tokens = [], 0
+        batch.append(cv_tuple)
+        batch_tokens += tokens
+        if len(batch) >= batch_size:
+            yield batch
+            batch, batch_tokens = [], 0
+    if batch:
+        yield batch
+
+
+def _unique(cv_stream: Iterable[Tuple[str, str]]) -> Iterator[Tuple[str, str]]:
+    seen = set()
+    for cv_id, cv in cv_stream:
+        if cv_id not in seen:
+            seen.add(cv_id)
+            yield cv_id, cv
+
+
+async def astream_pairs(
     model_tuples: List[Tuple[str, RunnableSequence]],
     job_data: List[Tuple[str, str]],
-    cv_data: List[Tuple[str, str]],
-    output_dir: str,
-):
-
-    total_pairs = len(job_data) * len(cv_data)
-
-    with ThreadPoolExecutor(max_workers=1) as executor:
-        futures = []
-        for job in job_data:
-            for cv in cv_data:
-                futures.append(
-                    executor.submit(
-                        two_stage_eval_cv, model_tuples, job, cv, output_dir
-                    )
+    cv_stream: Iterable[Tuple[str, str]],
+    output_dir: Union[str, Path],
+    max_concurrency: Optional[int] = None,
+    resume: bool = False,
+    batch_model_tuples: Optional[List[Tuple[str, RunnableSequence]]] = None,
+    pre_screen_threshold: Optional[float] = None,
+    cascade_model_tuples: Optional[List[Tuple[str, RunnableSequence]]] = None,
+    escalate: Optional[Callable[[dict], bool]] = None,
+    manifest: Optional[RunManifest] = None,
+    pairs: Optional[Set[Tuple[str, str]]] = None,
+    finished: Optional[Dict[Tuple[str, str], Dict[str, dict]]] = None,
+) -> AsyncIterator[Tuple[str, str, str, dict]]:
+    """evaluate CVs against all jobs as soon as each CV comes out of `cv_stream`.
+
+    `cv_stream` is a (possibly slow, blocking) iterator of (cv_id, cv_text), e.g. the
+    pdf parser; it is consumed in a worker thread so parsing overlaps with the llm
+    calls. Yields (job_id, cv_id, model_name, result) in completion order. With
+    `resume`, finished pairs are read back from `output_dir` instead of re-evaluated.
+
+    With `batch_model_tuples`, CVs are packed into batches of `config.CV_BATCH_SIZE`
+    (bounded by `config.CV_BATCH_TOKEN_BUDGET`) and each batch is evaluated against a
+    job in one request, see `atwo_stage_eval_cv_batch`.
+
+    With `pre_screen_threshold`, pairs failing the keyword pre-screen (see
+    `pre_screen`) are marked unfit without an llm call.
+
+    With `cascade_model_tuples`, every pair is scored by these (cheap) models first
+    and only re-scored by `model_tuples` when `escalate(result)` is true for one of
+    their results; batching is not used in this mode.
+
+    With a `manifest`, the state of every pair is journaled (see `RunManifest`) and
+    pairs it records as done are read back from `output_dir`.
+
+    With `pairs`, only these (job_id, cv_id) are evaluated, e.g. a shortlist.
+
+    With `finished`, a {(job_id, cv_id): results} mapping that `cv_stream` fills in
+    before yielding each CV (e.g. from the candidate pool), the pairs in it are not
+    evaluated and their results are yielded as is; it replaces the resume from
+    `output_dir`.
+    """
+    max_concurrency = max_concurrency or config.MAX_CONCURRENCY
+    model_names = _model_names(model_tuples)
+    cascade_names = _model_names(cascade_model_tuples) if cascade_model_tuples else []
+    semaphore = asyncio.Semaphore(max_concurrency)
+    queue: asyncio.Queue = asyncio.Queue()
+    use_batches = batch_model_tuples and not cascade_model_tuples
+    batch_size = config.CV_BATCH_SIZE if use_batches else 1
+    batches = pack_cv_batches(
+        _unique(cv_stream), batch_size, config.CV_BATCH_TOKEN_BUDGET
+    )
+    tasks = set()
+
+    async def mark(job, cvs, state, error=None):
+        # the fsync of the journal is blocking, keep it off the event loop
+        if manifest is not None and cvs:
+            keys = [f"{job[0]}_{cv[0]}" for cv in cvs]
+            await asyncio.to_thread(manifest.record_many, keys, state, error)
+
+    async def evaluate_batch(job, cvs):
+        """returns a list of (job_id, cv_id, model_results)"""
+        results, todo = [], []
+        for cv in cvs:
+            key = f"{job[0]}_{cv[0]}"
+            pair_results = None
+            if finished is not None:
+                pair_results = finished.get((job[0], cv[0]))
+            elif resume or (manifest is not None and manifest.is_done(key)):
+                pair_results = _load_finished(
+                    output_dir, key, model_names, cascade_names, escalate
                 )
+            if pair_results:
+                if manifest is not None and not manifest.is_done(key):
+                    await mark(job, [cv], DONE)
+                results.append((job[0], cv[0], pair_results))
+                continue
+            screened = _screen_pair(job, cv, model_names, pre_screen_threshold)
+            if screened is not None:
+                await mark(job, [cv], DONE)
+                results.append((job[0], cv[0], screened))
+            else:
+                todo.append(cv)
 
-        for future in tqdm(
-            as_completed(futures), total=total_pairs, desc="Processing job-cv pairs"
-        ):
+        await mark(job, todo, PENDING)
+        try:
+            if len(todo) == 1 or (todo and not use_batches):
+                async with _slot(semaphore):
+                    await mark(job, todo, IN_FLIGHT)
+                    pair_results = await asyncio.gather(
+                        *[
+                            _evaluate_pair(
+                                model_tuples,
+                                job,
+                                cv,
+                                output_dir,
+                                cascade_model_tuples,
+                                escalate,
+                            )
+                            for cv in todo
+                        ]
+                    )
+                batch_results = {
+                    cv[0]: model_results
+                    for cv, model_results in zip(todo, pair_results)
+                }
+            elif todo:
+                async with _slot(semaphore):
+                    await mark(job, todo, IN_FLIGHT)
+                    batch_results = await atwo_stage_eval_cv_batch(
+                        batch_model_tuples, model_tuples, job, todo, output_dir
+                    )
+                batch_results = {
+                    cv_id: _add_ensemble(
+                        job[0], cv_id, model_results, model_names, output_dir
+                    )
+                    for cv_id, model_results in batch_results.items()
+                }
+            else:
+                batch_results = {}
+        except Exception as e:
+            await mark(job, todo, FAILED, str(e))
+            raise
+
+        done = [cv for cv in todo if batch_results.get(cv[0])]
+        failed = [cv for cv in todo if not batch_results.get(cv[0])]
+        await mark(job, done, DONE)
+        await mark(job, failed, FAILED, "all models failed")
+        results.extend((job[0], cv[0], batch_results[cv[0]]) for cv in done)
+        return results
+
+    async def produce():
+        while True:
+            batch = await asyncio.to_thread(next, batches, None)
+            if batch is None:
+                break
+            for job in job_data:
+                job_batch = [
+                    cv for cv in batch if pairs is None or (job[0], cv[0]) in pairs
+                ]
+                if not job_batch:
+                    continue
+                task = asyncio.ensure_future(evaluate_batch(job, job_batch))
+                tasks.add(task)
+                task.add_done_callback(queue.put_nowait)
+
+    start = time.perf_counter()
+    producer = asyncio.ensure_future(produce())
+    completed = 0
+    pair_count = 0
+
+    try:
+        while not (producer.done() and completed == len(tasks)):
+            getter = asyncio.ensure_future(queue.get())
+            waiters = {getter} if producer.done() else {getter, producer}
+            await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+            if not getter.done():
+                getter.cancel()
+                # surface errors from the cv stream
+                producer.result()
+                continue
+
+            task = getter.result()
+            completed += 1
             try:
-                future = future.result()
+                batch_results = task.result()
             except Exception as e:
-                print(f"Error: {e}")
+                logger.error(f"Processing job-cv pairs: {e}")
+                continue
+            for job_id, cv_id, model_results in batch_results:
+                pair_count += 1
+                if pair_count == 1:
+                    logger.info(
+                        f"First result after {time.perf_counter() - start:.1f}s."
+                    )
+                for model_name, result in (model_results or {}).items():
+                    yield job_id, cv_id, model_name, result
+    finally:
+        producer.cancel()
+        for task in tasks:
+            task.cancel()
+
+    elapsed = time.perf_counter() - start
+    metrics.observe("rezumat_stage_seconds", elapsed, stage="cv_evaluation")
+    logger.info(
+        f"Streamed {pair_count} job-cv pairs in {completed} requests in {elapsed:.1f}s "
+        f"({pair_count / elapsed if elapsed > 0 else 0.0:.2f} pairs per sec, "
+        f"max_concurrency={max_concurrency})"
+    )
+
+
+def stream_pairs(
+    model_tuples: List[Tuple[str, RunnableSequence]],
+    job_data: List[Tuple[str, str]],
+    cv_stream: Iterable[Tuple[str, str]],
+    output_dir: Union[str, Path],
+    max_concurrency: Optional[int] = None,
+    resume: bool = False,
+    batch_model_tuples: Optional[List[Tuple[str, RunnableSequence]]] = None,
+    pre_screen_threshold: Optional[float] = None,
+    cascade_model_tuples: Optional[List[Tuple[str, RunnableSequence]]] = None,
+    escalate: Optional[Callable[[dict], bool]] = None,
+    manifest: Optional[RunManifest] = None,
+    pairs: Optional[Set[Tuple[str, str]]] = None,
+    finished: Optional[Dict[Tuple[str, str], Dict[str, dict]]] = None,
+) -> Iterator[Tuple[str, str, str, dict]]:
+    """synchronous generator over `astream_pairs`, driven by the shared event loop"""
+    results = astream_pairs(
+        model_tuples,
+        job_data,
+        cv_stream,
+        output_dir,
+        max_concurrency,
+        resume,
+        batch_model_tuples,
+        pre_screen_threshold,
+        cascade_model_tuples,
+        escalate,
+        manifest,
+        pairs,
+        finished,
+    )
+    try:
+        while True:
+            try:
+                yield run_async(results.__anext__())
+            except StopAsyncIteration:
+                break
+    finally:
+        run_async(results.aclose())
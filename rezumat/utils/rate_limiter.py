@@ -0,0 +1,157 @@
+import asyncio
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from rezumat.config import config
+from rezumat.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class TokenBucket:
+    """A token bucket that refills continuously up to `capacity`.
+
+    `reserve` always takes the tokens, letting the balance go negative, and returns
+    how long the caller has to wait until the debt is paid back. Callers are therefore
+    served in the order they reserved, without polling.
+    """
+
+    def __init__(self, capacity: float, refill_per_sec: float):
+        self.capacity = capacity
+        self.refill_per_sec = refill_per_sec
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.refill_per_sec
+        )
+        self.updated_at = now
+
+    def reserve(self, amount: float) -> float:
+        """take `amount` tokens and return the number of seconds to wait"""
+        self._refill()
+        # a single request larger than the bucket can never fit, cap it so it only
+        # has to wait for a full bucket
+        self.tokens -= min(amount, self.capacity)
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.refill_per_sec
+
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limits for one provider/model."""
+
+    def __init__(
+        self,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+    ):
+        self.requests = (
+            TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+            if requests_per_minute
+            else None
+        )
+        self.tokens = (
+            TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+            if tokens_per_minute
+            else None
+        )
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens: int = 0) -> float:
+        """reserve one request and `tokens` tokens, return the seconds to wait"""
+        with self._lock:
+            waits = [0.0]
+            if self.requests is not None:
+                waits.append(self.requests.reserve(1))
+            if self.tokens is not None:
+                waits.append(self.tokens.reserve(tokens))
+            return max(waits)
+
+    def acquire(self, tokens: int = 0) -> float:
+        """block until the request is allowed, return the time waited"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    async def aacquire(self, tokens: int = 0) -> float:
+        """async version of `acquire`"""
+        wait = self.reserve(tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+        return wait
+
+
+class SlotLimiter:
+    """At most `slots` calls in flight at the same time, e.g. the parallel slots of a
+    local inference server, shared by threads and event loops."""
+
+    POLL_INTERVAL = 0.05
+
+    def __init__(self, slots: int):
+        self.slots = slots
+        self._semaphore = threading.BoundedSemaphore(slots)
+
+    def acquire(self) -> float:
+        """block until a slot is free, return the time waited"""
+        start = time.monotonic()
+        self._semaphore.acquire()
+        return time.monotonic() - start
+
+    async def aacquire(self) -> float:
+        """async version of `acquire`, polls so that the event loop is never blocked"""
+        start = time.monotonic()
+        while not self._semaphore.acquire(blocking=False):
+            await asyncio.sleep(self.POLL_INTERVAL)
+        return time.monotonic() - start
+
+    def release(self) -> None:
+        self._semaphore.release()
+
+
+_rate_limiters: Dict[Tuple[str, str], RateLimiter] = {}
+_slot_limiters: Dict[Tuple[str, str], Optional[SlotLimiter]] = {}
+_registry_lock = threading.Lock()
+
+
+def get_rate_limiter(provider: str, model_id: str) -> RateLimiter:
+    """return the rate limiter shared by every grader of `provider`/`model_id`.
+
+    Limits are looked up in `config.RATE_LIMITS`, first as "provider/model_id" and
+    then as "provider". Providers without an entry are not limited.
+    """
+    provider = provider.lower()
+    key = (provider, model_id)
+
+    with _registry_lock:
+        if key not in _rate_limiters:
+            limits = config.RATE_LIMITS.get(
+                f"{provider}/{model_id}", config.RATE_LIMITS.get(provider, {})
+            )
+            logger.info(f"Creating rate limiter for {provider}/{model_id}: {limits}")
+            _rate_limiters[key] = RateLimiter(**limits)
+        return _rate_limiters[key]
+
+
+def get_slot_limiter(provider: str, model_id: str) -> Optional[SlotLimiter]:
+    """return the slot limiter shared by every grader of `provider`/`model_id`.
+
+    Slots are looked up in `config.PARALLEL_SLOTS` like the rate limits. Providers
+    without an entry are not limited (None).
+    """
+    provider = provider.lower()
+    key = (provider, model_id)
+
+    with _registry_lock:
+        if key not in _slot_limiters:
+            slots = config.PARALLEL_SLOTS.get(
+                f"{provider}/{model_id}", config.PARALLEL_SLOTS.get(provider)
+            )
+            _slot_limiters[key] = SlotLimiter(slots) if slots else None
+            if slots:
+                logger.info(f"Creating slot limiter for {provider}/{model_id}: {slots}")
+        return _slot_limiters[key]
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Union
+
+from rezumat.config import config
+from rezumat.utils.hashing import normalize_text
+from rezumat.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def normalize_input(value: Any) -> str:
+    """normalize a prompt input so that whitespace-only differences hit the same entry"""
+    if isinstance(value, str):
+        return normalize_text(value)
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+
+def make_cache_key(
+    template: str, model_id: str, temperature: float, inputs: Dict[str, Any]
+) -> str:
+    """hash of the prompt template, model id, temperature and normalized inputs"""
+    payload = json.dumps(
+        {
+            "template": hashlib.sha256(template.encode("utf-8")).hexdigest(),
+            "model_id": model_id,
+            "temperature": temperature,
+            "inputs": {k: normalize_input(v) for k, v in sorted(inputs.items())},
+        },
+        sort_keys=True,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """A persistent, size-bounded LRU cache of llm evaluation results in SQLite.
+
+    Hits only record their access time in memory; the times are written in one
+    commit before an eviction, or every `ACCESS_FLUSH_SIZE` hits.
+    """
+
+    ACCESS_FLUSH_SIZE = 256
+
+    def __init__(self, path: Union[str, Path], max_bytes: int):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._accessed: Dict[str, float] = {}
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            )"""
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_results_last_access ON results (last_access)"
+        )
+        self._conn.commit()
+        self._size = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()[0]
+
+    def get(self, key: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._accessed[key] = time.time()
+            if len(self._accessed) >= self.ACCESS_FLUSH_SIZE:
+                self._flush_access_times()
+                self._conn.commit()
+            return json.loads(row[0])
+
+    def flush(self) -> None:
+        """write the pending access times"""
+        with self._lock:
+            self._flush_access_times()
+            self._conn.commit()
+
+    def _flush_access_times(self) -> None:
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE results SET last_access = ? WHERE key = ?",
+                [(last_access, key) for key, last_access in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def set(self, key: str, value: dict) -> None:
+        data = json.dumps(value)
+        size = len(data.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT size FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, data, size, time.time()),
+            )
+            self._size += size - (old[0] if old else 0)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """drop the least recently used entries until the cache fits in max_bytes"""
+        if self._size > self.max_bytes:
+            self._flush_access_times()
+        while self._size > self.max_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM results ORDER BY last_access LIMIT 64"
+            ).fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                self._conn.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._size -= size
+                if self._size <= self.max_bytes:
+                    break
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "size_bytes": self._size,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM results")
+            self._conn.commit()
+            self._accessed.clear()
+            self._size = 0
+
+
+_result_cache: Optional[ResultCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> Optional[ResultCache]:
+    """return the process-wide result cache, or None when caching is disabled"""
+    global _result_cache
+
+    if not config.RESULT_CACHE_ENABLED:
+        return None
+
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache(
+                config.RESULT_CACHE_PATH, config.RESULT_CACHE_MAX_BYTES
+            )
+        return _result_cache
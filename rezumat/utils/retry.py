@@ -0,0 +1,175 @@
+import asyncio
+import json
+import os
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Union
+
+import httpx
+from langchain_core.runnables import Runnable, RunnableLambda
+
+from rezumat.config import config
+from rezumat.utils.logger import get_logger
+from rezumat.utils.metrics import metrics
+
+logger = get_logger(__name__)
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+# connection errors of the provider sdks, which do not subclass the httpx ones
+RETRYABLE_ERROR_NAMES = {"APIConnectionError", "APITimeoutError"}
+
+DEAD_LETTER_FILE = "dead_letter.jsonl"
+
+# one lock per queue file, shared by every `DeadLetterQueue` of that path
+_dead_letter_locks: Dict[Path, threading.Lock] = {}
+_dead_letter_locks_lock = threading.Lock()
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status_code = getattr(exc, "status_code", None)
+    if status_code is None:
+        status_code = getattr(getattr(exc, "response", None), "status_code", None)
+    return status_code if isinstance(status_code, int) else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """whether `exc` is a transient provider error: 429, 5xx, timeout or connection"""
+    status_code = _status_code(exc)
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES
+    return isinstance(
+        exc, (TimeoutError, ConnectionError, httpx.TimeoutException, httpx.NetworkError)
+    ) or any(cls.__name__ in RETRYABLE_ERROR_NAMES for cls in type(exc).__mro__)
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """seconds to wait according to the `retry-after(-ms)` header of the response"""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(
+    attempt: int,
+    exc: Optional[BaseException] = None,
+    base_delay: Optional[float] = None,
+    max_delay: Optional[float] = None,
+) -> float:
+    """`Retry-After` when the provider sends one, full-jitter exponential backoff
+    otherwise"""
+    base_delay = config.RETRY_BASE_DELAY if base_delay is None else base_delay
+    max_delay = config.RETRY_MAX_DELAY if max_delay is None else max_delay
+    delay = retry_after(exc) if exc is not None else None
+    if delay is not None:
+        return min(delay, max_delay)
+    return random.uniform(0, min(max_delay, base_delay * 2**attempt))
+
+
+def with_retry(
+    runnable: Runnable,
+    max_retries: Optional[int] = None,
+    retry_if: Callable[[BaseException], bool] = is_retryable,
+    backoff: bool = True,
+    name: str = "retry",
+) -> RunnableLambda:
+    """wrap `runnable` so that errors matching `retry_if` are retried.
+
+    Up to `max_retries` (default `config.MAX_RETRIES`) retries, waiting
+    `backoff_delay` in between unless `backoff` is false. The last error is raised.
+    """
+    max_retries = config.MAX_RETRIES if max_retries is None else max_retries
+
+    def should_retry(attempt: int, exc: Exception) -> Optional[float]:
+        if attempt >= max_retries or not retry_if(exc):
+            return None
+        delay = backoff_delay(attempt, exc) if backoff else 0.0
+        metrics.inc("rezumat_retries_total", retry=name)
+        logger.warning(
+            f"{name}: attempt {attempt + 1}/{max_retries + 1} failed ({exc!r}), "
+            f"retrying in {delay:.1f}s."
+        )
+        return delay
+
+    def invoke(inputs):
+        for attempt in range(max_retries + 1):
+            try:
+                return runnable.invoke(inputs)
+            except Exception as e:
+                delay = should_retry(attempt, e)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def ainvoke(inputs):
+        for attempt in range(max_retries + 1):
+            try:
+                return await runnable.ainvoke(inputs)
+            except Exception as e:
+                delay = should_retry(attempt, e)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    return RunnableLambda(invoke, afunc=ainvoke, name=name)
+
+
+class DeadLetterQueue:
+    """JSONL file of the evaluations that still failed after all retries.
+
+    Entries keep everything needed to re-run the evaluation, see
+    `process_jobs.retry_dead_letters`.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        with _dead_letter_locks_lock:
+            self._lock = _dead_letter_locks.setdefault(
+                self.path.resolve(), threading.Lock()
+            )
+
+    @classmethod
+    def in_dir(cls, output_dir: Union[str, Path]) -> "DeadLetterQueue":
+        return cls(Path(output_dir) / DEAD_LETTER_FILE)
+
+    def add(self, entry: dict, error: BaseException) -> None:
+        entry = {**entry, "error": repr(error), "time": time.time()}
+        with self._lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def entries(self) -> List[dict]:
+        if not self.path.exists():
+            return []
+        entries = []
+        with open(self.path, "r") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return entries
+
+    def drain(self) -> List[dict]:
+        """return all the entries and empty the queue"""
+        with self._lock:
+            entries = self.entries()
+            if self.path.exists():
+                os.remove(self.path)
+        return entries
+
+    def __len__(self) -> int:
+        return len(self.entries())
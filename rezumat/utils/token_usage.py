@@ -0,0 +1,64 @@
+import threading
+from collections import defaultdict
+from typing import Dict
+
+from langchain_core.messages import AIMessage
+
+from rezumat.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+def get_token_counts(message: AIMessage) -> Dict[str, int]:
+    """prompt, completion and cached prompt tokens from a model response.
+
+    Cached tokens are provider specific: Anthropic reports `cache_read_input_tokens`
+    and `cache_creation_input_tokens` in `usage`, OpenAI reports
+    `prompt_tokens_details.cached_tokens` in `token_usage`.
+    """
+    usage_metadata = getattr(message, "usage_metadata", None) or {}
+    response_metadata = getattr(message, "response_metadata", None) or {}
+    anthropic_usage = response_metadata.get("usage") or {}
+    openai_usage = response_metadata.get("token_usage") or {}
+    prompt_details = openai_usage.get("prompt_tokens_details") or {}
+
+    return {
+        "input_tokens": usage_metadata.get("input_tokens", 0),
+        "output_tokens": usage_metadata.get("output_tokens", 0),
+        "cache_read_tokens": (
+            anthropic_usage.get("cache_read_input_tokens")
+            or prompt_details.get("cached_tokens")
+            or 0
+        ),
+        "cache_creation_tokens": anthropic_usage.get("cache_creation_input_tokens")
+        or 0,
+    }
+
+
+class TokenUsage:
+    """Thread-safe running totals of token usage per model."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = defaultdict(lambda: defaultdict(int))
+
+    def record(self, model_name: str, message: AIMessage) -> Dict[str, int]:
+        counts = get_token_counts(message)
+        with self._lock:
+            totals = self._totals[model_name]
+            totals["calls"] += 1
+            for key, value in counts.items():
+                totals[key] += value
+        return counts
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {model: dict(totals) for model, totals in self._totals.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._totals.clear()
+
+
+# process-wide token usage, filled in by the eval chains
+token_usage = TokenUsage()
@@ -4,4 +4,5 @@ setup(
     name="rezumat",
     version="0.1.0",
     packages=find_packages(),
+    entry_points={"console_scripts": ["rezumat=rezumat.cli:main"]},
 )
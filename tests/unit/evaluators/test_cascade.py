@@ -0,0 +1,71 @@
+from unittest.mock import Mock
+
+import pytest
+from langchain_core.runnables import RunnableSequence
+
+from rezumat.evaluators.cascade import get_escalation_check, needs_escalation
+from rezumat.models.input_models import CandidateEvaluationWeights
+from rezumat.utils.process_jobs import stream_pairs
+
+WEIGHTS = CandidateEvaluationWeights(
+    technical_skills=60, soft_skills=10, experience=20, education=10
+)
+
+
+def _cv_result(score, suitability="yes"):
+    scores = {
+        "technical_skills": score,
+        "soft_skills": score,
+        "experience": score,
+        "education": score,
+    }
+    return {
+        "resume_evaluation": {"original_scores": scores},
+        "deeper_analysis": {"inferred_experience": []},
+        "recalibrated_scores": scores,
+        "assessment": {"suitability": suitability, "strengths": "", "concerns": ""},
+    }
+
+
+@pytest.mark.parametrize(
+    "result, expected",
+    [
+        (_cv_result(90), False),
+        (_cv_result(10, "no"), False),
+        (_cv_result(55), True),
+        (_cv_result(90, "kiv"), True),
+        ({"assessment": {"suitability": "yes"}}, True),
+    ],
+)
+def test_needs_escalation(result, expected):
+    assert needs_escalation(result, WEIGHTS, band=(40, 75)) == expected
+
+
+def test_stream_pairs_escalates_only_uncertain_candidates(tmp_path):
+    """check that the strong model only scores the candidates the cheap one is unsure of."""
+    cheap_scores = {"sure": _cv_result(90), "unsure": _cv_result(50)}
+
+    async def cheap_invoke(inputs):
+        return cheap_scores[inputs["resume"]]
+
+    cheap_grader = Mock(spec=RunnableSequence)
+    cheap_grader.ainvoke.side_effect = cheap_invoke
+    strong_grader = Mock(spec=RunnableSequence)
+    strong_grader.ainvoke.return_value = _cv_result(30, "no")
+
+    results = list(
+        stream_pairs(
+            [("strong", strong_grader)],
+            [("job1", "python")],
+            iter([("cv1", "sure"), ("cv2", "unsure")]),
+            tmp_path,
+            cascade_model_tuples=[("cheap", cheap_grader)],
+            escalate=get_escalation_check(WEIGHTS, band=(40, 75)),
+        )
+    )
+
+    assert sorted((cv_id, name) for _, cv_id, name, _ in results) == [
+        ("cv1", "cheap"),
+        ("cv2", "strong"),
+    ]
+    assert strong_grader.ainvoke.await_count == 1
@@ -0,0 +1,145 @@
+from unittest.mock import patch
+
+import pytest
+from langchain_core.exceptions import OutputParserException
+from langchain_core.messages import AIMessage
+from langchain_core.output_parsers import JsonOutputParser
+from langchain_core.prompt_values import StringPromptValue
+from langchain_core.runnables import RunnableLambda
+
+from rezumat.config import config
+from rezumat.evaluators.chains import (
+    _create_model,
+    get_cv_prompt,
+    get_eval_chain,
+    get_model,
+    model_label,
+    with_json_repair,
+)
+from rezumat.prompts.two_stage_eval_cv import TWO_STAGE_EVAL_CV_PROMPT
+from rezumat.prompts.two_stage_eval_cv_batch import (
+    TWO_STAGE_EVAL_CV_BATCH_RESUMES_PROMPT,
+)
+from rezumat.prompts.two_stage_eval_jd import TWO_STAGE_EVAL_JD_PROMPT
+from rezumat.utils.token_usage import get_token_counts
+
+INPUTS = {"job_requirements": "python, sql", "resume": "Python developer"}
+
+
+def test_model_label_has_no_underscores():
+    assert model_label("Groq", "llama3_70b/8192") == "groq-llama3-70b-8192"
+
+
+def test_cv_prompt_puts_the_resume_after_a_stable_prefix():
+    messages = get_cv_prompt("groq").invoke(INPUTS).to_messages()
+
+    assert [message.type for message in messages] == ["system", "human"]
+    assert "python, sql" in messages[0].content
+    assert "Python developer" not in messages[0].content
+    assert "Python developer" in messages[1].content
+
+
+def test_cv_prompt_marks_the_prefix_for_anthropic_caching():
+    system_message = get_cv_prompt("anthropic").invoke(INPUTS).to_messages()[0]
+
+    assert len(system_message.content) == 2
+    assert all(
+        block["cache_control"] == {"type": "ephemeral"}
+        for block in system_message.content
+    )
+    assert "python, sql" in system_message.content[1]["text"]
+
+
+def test_cv_batch_prompt_shares_the_prefix_of_the_cv_prompt():
+    batch_inputs = {"job_requirements": "python, sql", "resumes": '[{"cv_id": "a"}]'}
+    batch_prompt = get_cv_prompt("groq", TWO_STAGE_EVAL_CV_BATCH_RESUMES_PROMPT)
+    messages = batch_prompt.invoke(batch_inputs).to_messages()
+
+    assert messages[0] == get_cv_prompt("groq").invoke(INPUTS).to_messages()[0]
+    assert '[{"cv_id": "a"}]' in messages[1].content
+
+
+def test_get_token_counts_reads_cached_tokens():
+    anthropic_message = AIMessage(
+        content="{}",
+        usage_metadata={
+            "input_tokens": 1200,
+            "output_tokens": 300,
+            "total_tokens": 1500,
+        },
+        response_metadata={
+            "usage": {"cache_read_input_tokens": 1000, "cache_creation_input_tokens": 0}
+        },
+    )
+    openai_message = AIMessage(
+        content="{}",
+        response_metadata={
+            "token_usage": {"prompt_tokens_details": {"cached_tokens": 1024}}
+        },
+    )
+
+    assert get_token_counts(anthropic_message)["cache_read_tokens"] == 1000
+    assert get_token_counts(anthropic_message)["input_tokens"] == 1200
+    assert get_token_counts(openai_message)["cache_read_tokens"] == 1024
+
+
+def test_ollama_model_uses_json_mode_and_keep_alive():
+    model = get_model("Ollama", "llama3.1:8b", max_tokens=512)
+
+    assert model.format == "json"
+    assert model.num_predict == 512
+    assert model.keep_alive == config.OLLAMA_KEEP_ALIVE
+    assert model.base_url == config.OLLAMA_BASE_URL
+
+
+@pytest.mark.parametrize("model_text", ["groq", "openai", "anthropic"])
+def test_provider_clients_leave_retries_to_with_retry(model_text):
+    model = _create_model(model_text, "some-model", 0, 512, "key")
+
+    assert model.max_retries == 0
+
+
+def test_json_repair_sends_the_parser_error_back():
+    """check that an invalid reply is re-asked with the error, not the same prompt."""
+    prompts = []
+
+    def call_model(prompt_value):
+        prompts.append(prompt_value.to_messages())
+        return AIMessage(content="score: 1" if len(prompts) == 1 else '{"score": 1}')
+
+    grader = with_json_repair(RunnableLambda(call_model), JsonOutputParser())
+
+    assert grader.invoke(StringPromptValue(text="rate this cv")) == {"score": 1}
+    assert len(prompts[0]) == 1
+    assert [message.type for message in prompts[1]] == ["human", "ai", "human"]
+    assert "JSON" in prompts[1][-1].content
+
+    broken = with_json_repair(
+        RunnableLambda(lambda _: AIMessage(content="not json")),
+        JsonOutputParser(),
+        max_retries=1,
+    )
+    with pytest.raises(OutputParserException):
+        broken.invoke(StringPromptValue(text="rate this cv"))
+
+
+@pytest.mark.parametrize("memo_enabled", [True, False])
+def test_job_analyses_are_kept_in_one_store(monkeypatch, memo_enabled):
+    """check that the result cache only keeps the jd results without the memo."""
+    monkeypatch.setattr(config, "JOB_ANALYSIS_CACHE_ENABLED", memo_enabled)
+    model = RunnableLambda(lambda prompt: AIMessage(content="{}"))
+
+    with (
+        patch("rezumat.evaluators.chains.get_model", return_value=model),
+        patch("rezumat.evaluators.chains.get_result_cache", return_value=object()),
+        patch(
+            "rezumat.evaluators.chains.with_result_cache",
+            side_effect=lambda grader, *args, **kwargs: grader,
+        ) as with_result_cache,
+    ):
+        get_eval_chain("groq", "llama3-70b-8192", "key", eval_type="jd")
+        get_eval_chain("groq", "llama3-70b-8192", "key", eval_type="cv")
+
+    templates = [call.kwargs["template"] for call in with_result_cache.call_args_list]
+    assert TWO_STAGE_EVAL_CV_PROMPT in templates
+    assert (TWO_STAGE_EVAL_JD_PROMPT in templates) is not memo_enabled
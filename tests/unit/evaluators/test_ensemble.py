@@ -0,0 +1,99 @@
+import asyncio
+from unittest.mock import Mock
+
+import pytest
+from langchain_core.runnables import RunnableSequence
+
+from rezumat.evaluators.ensemble import (
+    combine_results,
+    combine_scores,
+    disagreement,
+    models_agree,
+)
+from rezumat.evaluators.two_stage_evaluators import (
+    atwo_stage_eval_cv,
+    validate_cv_result,
+)
+
+
+def _cv_result(score, suitability="yes"):
+    scores = {
+        "technical_skills": score,
+        "soft_skills": score,
+        "experience": score,
+        "education": score,
+    }
+    return {
+        "resume_evaluation": {"original_scores": scores},
+        "deeper_analysis": {"inferred_experience": [f"skill{score}"]},
+        "recalibrated_scores": scores,
+        "assessment": {"suitability": suitability, "strengths": f"s{score}"},
+    }
+
+
+@pytest.mark.parametrize(
+    "method, expected", [("mean", 40.0), ("median", 20.0), ("trimmed", 20.0)]
+)
+def test_combine_scores(method, expected):
+    assert combine_scores([10, 20, 90], method, trim=0.34) == expected
+
+
+def test_combine_results_reports_disagreement():
+    """check the combined scores, majority vote and disagreement of an ensemble."""
+    model_results = {
+        "a": _cv_result(60),
+        "b": _cv_result(70),
+        "c": _cv_result(95, "kiv"),
+    }
+
+    result = combine_results(model_results, "median")
+
+    assert validate_cv_result(result)
+    assert result["recalibrated_scores"]["technical_skills"] == 70
+    assert result["assessment"]["suitability"] == "yes"
+    assert result["assessment"]["strengths"] == "s70"
+    assert result["ensemble"]["disagreement"]["experience"] == 35
+    assert disagreement({"a": _cv_result(60)}) == {
+        category: 0.0 for category in result["recalibrated_scores"]
+    }
+
+
+def test_models_agree_within_tolerance():
+    assert models_agree({"a": _cv_result(60), "b": _cv_result(65)}, tolerance=5)
+    assert not models_agree({"a": _cv_result(60), "b": _cv_result(70)}, tolerance=5)
+    assert not models_agree({"a": _cv_result(60)}, tolerance=5)
+
+
+def test_atwo_stage_eval_cv_queries_models_concurrently(tmp_path):
+    """check that models run concurrently and the rest are skipped on agreement."""
+    in_flight = 0
+    peak = 0
+
+    def grader(score):
+        async def invoke(inputs):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return _cv_result(score)
+
+        mock_grader = Mock(spec=RunnableSequence)
+        mock_grader.ainvoke.side_effect = invoke
+        return mock_grader
+
+    model_tuples = [("a", grader(60)), ("b", grader(62)), ("c", grader(90))]
+
+    model_results = asyncio.run(
+        atwo_stage_eval_cv(
+            model_tuples,
+            ("job1", {}),
+            ("cv1", "resume"),
+            tmp_path,
+            stop_early=lambda results: models_agree(results, tolerance=5),
+        )
+    )
+
+    assert peak == 2
+    assert set(model_results) == {"a", "b"}
+    model_tuples[2][1].ainvoke.assert_not_awaited()
@@ -0,0 +1,100 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from rezumat.evaluators.post_analysis import (
+    SCORE_COLUMNS,
+    ResultStore,
+    apply_weights,
+    calculate_fit_scores,
+    final_results,
+)
+from rezumat.models.input_models import CandidateEvaluationWeights
+
+WEIGHTS = CandidateEvaluationWeights(
+    technical_skills=60, soft_skills=10, experience=20, education=10
+)
+
+
+def _result(technical, recalibrated_technical, suitability="yes"):
+    scores = {"technical_skills": technical, "soft_skills": 50, "experience": 50}
+    scores["education"] = 50
+    return {
+        "resume_evaluation": {"original_scores": scores},
+        "deeper_analysis": {"inferred_experience": ["python"]},
+        "recalibrated_scores": {**scores, "technical_skills": recalibrated_technical},
+        "assessment": {"suitability": suitability, "strengths": "", "concerns": ""},
+    }
+
+
+def test_result_store_fit_scores_match_weighted_sum():
+    """check that the matrix product gives the weighted sum of the category scores."""
+    store = ResultStore(capacity=1)
+    store.append("job1", "cv1", "model1", _result(100, 80))
+    store.append("job1", "cv2", "model1", _result(0, 10, "no"))
+
+    fit_scores = store.fit_scores(WEIGHTS)
+
+    assert len(store) == 2
+    np.testing.assert_allclose(fit_scores[:, 0], [0.6 * 100 + 20, 20])
+    np.testing.assert_allclose(fit_scores[:, 1], [0.6 * 80 + 20, 0.6 * 10 + 20])
+    df = store.to_frame(WEIGHTS)
+    assert df["suitability"].tolist() == ["yes", "no"]
+    np.testing.assert_allclose(df["recalibrated_overall_score"], fit_scores[:, 1])
+
+
+def test_result_store_replaces_existing_pair():
+    """check that re-appending a (job, cv, model) overwrites its row."""
+    store = ResultStore()
+    store.append("job1", "cv1", "model1", _result(10, 10, "no"))
+    store.append("job1", "cv1", "model1", _result(90, 90, "yes"))
+
+    df = store.to_frame()
+
+    assert len(df) == 1
+    assert df.loc[0, "original_technical_skills"] == 90
+    assert df.loc[0, "suitability"] == "yes"
+
+
+def test_result_store_stores_non_numeric_scores_as_nan():
+    """check that a score such as "N/A" does not stop the run."""
+    result = _result(100, 80)
+    result["resume_evaluation"]["original_scores"]["soft_skills"] = "N/A"
+    store = ResultStore()
+    store.append("job1", "cv1", "model1", result)
+
+    df = store.to_frame(WEIGHTS)
+
+    assert np.isnan(df.loc[0, "original_soft_skills"])
+    assert df.loc[0, "recalibrated_technical_skills"] == 80
+
+
+def test_calculate_fit_scores_from_folder(tmp_path):
+    """check that result files are loaded and weighted like apply_weights does."""
+    for cv_id, score in [("cv1", 100), ("cv2", 40)]:
+        with open(tmp_path / f"job1_{cv_id}_model1.json", "w") as f:
+            json.dump(_result(score, score), f)
+    (tmp_path / "job1_broken_model1.json").write_text("{}")
+
+    df = calculate_fit_scores(tmp_path, WEIGHTS).sort_values("cv_id")
+
+    assert df["cv_id"].tolist() == ["cv1", "cv2"]
+    expected = apply_weights(pd.DataFrame(df[SCORE_COLUMNS]), WEIGHTS)
+    np.testing.assert_allclose(
+        df["original_overall_score"], expected["original_overall_score"]
+    )
+
+
+def test_final_results_prefer_the_ensemble():
+    store = ResultStore()
+    for model_name in ["model1", "model2", "ensemble"]:
+        store.append("job1", "cv1", model_name, _result(80, 80))
+    store.append("job1", "cv2", "model1", _result(40, 40))
+
+    df = final_results(store.to_frame(WEIGHTS))
+
+    assert list(zip(df["cv_id"], df["model_name"])) == [
+        ("cv1", "ensemble"),
+        ("cv2", "model1"),
+    ]
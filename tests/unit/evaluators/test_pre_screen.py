@@ -0,0 +1,71 @@
+from unittest.mock import Mock
+
+from langchain_core.runnables import RunnableSequence
+
+from rezumat.evaluators.pre_screen import pre_screen, skill_coverage
+from rezumat.evaluators.two_stage_evaluators import validate_cv_result
+from rezumat.utils.process_jobs import stream_pairs
+
+JOB_ANALYSIS = {
+    "technical_skills": {
+        "essential": [
+            "Python",
+            "Kubernetes",
+            "3+ years of experience with PostgreSQL",
+            "Machine Learning",
+        ]
+    }
+}
+
+
+def test_skill_coverage_matches_aliases_and_keywords():
+    """check that aliases and keywords of requirement phrases are matched."""
+    cv = "Built ML pipelines in Python, deployed on k8s with a postgres backend."
+
+    coverage, missing = skill_coverage(
+        JOB_ANALYSIS["technical_skills"]["essential"], cv
+    )
+
+    assert coverage == 1.0
+    assert missing == []
+
+
+def test_pre_screen_rejects_cv_below_threshold():
+    """check that a cv missing most essential skills gets a valid "no" result."""
+    result = pre_screen(JOB_ANALYSIS, "Java developer, Spring and Oracle.", 0.5)
+
+    assert validate_cv_result(result)
+    assert result["assessment"]["suitability"] == "no"
+    assert "Kubernetes" in result["assessment"]["concerns"]
+    assert pre_screen(JOB_ANALYSIS, "Python and Kubernetes.", 0.5) is None
+
+
+def test_pre_screen_passes_jobs_without_essential_skills():
+    """check that an incomplete jd analysis never rejects a cv."""
+    assert pre_screen({}, "anything", 0.9) is None
+    assert pre_screen({"technical_skills": {"essential": []}}, "anything", 0.9) is None
+
+
+def test_stream_pairs_skips_llm_for_screened_out_cvs(tmp_path):
+    """check that screened out pairs get a "no" without a grader call."""
+    mock_grader = Mock(spec=RunnableSequence)
+    mock_grader.ainvoke.return_value = {"assessment": {"suitability": "yes"}}
+    cv_data = [("cv1", "Python, Kubernetes, PostgreSQL"), ("cv2", "Java, Oracle")]
+
+    results = list(
+        stream_pairs(
+            [("model1", mock_grader)],
+            [("job1", JOB_ANALYSIS)],
+            iter(cv_data),
+            tmp_path,
+            pre_screen_threshold=0.5,
+        )
+    )
+
+    assert mock_grader.ainvoke.await_count == 1
+    suitability = {
+        cv_id: result["assessment"]["suitability"] for _, cv_id, _, result in results
+    }
+    assert suitability == {"cv1": "yes", "cv2": "no"}
+    # the result depends on the threshold, it is not resumed like a model's
+    assert not (tmp_path / "job1_cv2_model1.json").exists()
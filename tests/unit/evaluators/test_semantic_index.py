@@ -0,0 +1,110 @@
+from unittest.mock import Mock, patch
+
+import numpy as np
+import pytest
+
+from rezumat.evaluators.semantic_index import (
+    HashingEmbedder,
+    SemanticIndex,
+    job_query_text,
+    shortlist_pairs,
+)
+
+CVS = [
+    ("cv1", "Python developer, Django, PostgreSQL and Kubernetes"),
+    ("cv2", "Java engineer with Spring Boot and Kafka"),
+    ("cv3", "Registered nurse, intensive care and patient education"),
+    ("cv4", "Data scientist: python, pandas, machine learning"),
+]
+
+
+@pytest.fixture
+def index():
+    index = SemanticIndex(HashingEmbedder())
+    index.add(CVS)
+    return index
+
+
+def test_hashing_embedder_is_normalized_and_maps_aliases():
+    embedder = HashingEmbedder(dim=256)
+    vectors = embedder.encode(["k8s and postgres", "kubernetes and postgresql", ""])
+
+    np.testing.assert_allclose(np.linalg.norm(vectors[:2], axis=1), 1.0, rtol=1e-5)
+    assert vectors[0] @ vectors[1] == pytest.approx(1.0, abs=1e-5)
+    assert not vectors[2].any()
+
+
+def test_search_ranks_the_most_similar_cvs_first(index):
+    results = index.search("python, django, kubernetes", k=2)
+
+    assert [cv_id for cv_id, _ in results] == ["cv1", "cv4"]
+    assert results[0][1] > results[1][1]
+
+
+def test_add_skips_known_cvs(index):
+    assert index.add(CVS[:2] + [("cv5", "Go developer")]) == 1
+    assert len(index) == 5
+    assert index.search("python", k=2, cv_ids={"cv2", "cv3"})[0][0] in {"cv2", "cv3"}
+
+
+def test_inverted_file_search_finds_the_nearest_cv():
+    rng = np.random.default_rng(0)
+    words = [f"skill{i}" for i in range(300)]
+    cvs = [
+        (f"cv{i}", " ".join(rng.choice(words, size=20, replace=False)))
+        for i in range(400)
+    ]
+    index = SemanticIndex(HashingEmbedder(dim=512), capacity=16, approximate=True)
+    index.add(cvs)
+
+    with patch("rezumat.evaluators.semantic_index.config.SEMANTIC_IVF_MIN_SIZE", 100):
+        results = index.search(cvs[123][1], k=5)
+        index.add([("new", cvs[7][1] + " extra")])
+        after_add = index.search(cvs[7][1], k=2)
+
+    assert results[0] == ("cv123", pytest.approx(1.0, abs=1e-5))
+    assert {cv_id for cv_id, _ in after_add} == {"cv7", "new"}
+
+
+def test_shortlist_pairs_keeps_top_k_per_job():
+    job_data = [
+        ("job1", {"technical_skills": {"essential": ["Python", "Django"]}}),
+        ("job2", {"technical_skills": {"essential": ["nursing"]}, "education": []}),
+    ]
+    assert "Python\nDjango\nPython\nDjango" in job_query_text(job_data[0][1])
+
+    pairs = shortlist_pairs(
+        job_data, CVS, top_k=2, index=SemanticIndex(HashingEmbedder())
+    )
+
+    assert len(pairs) == 4
+    assert ("job1", "cv1") in pairs
+
+
+def test_exact_index_never_builds_the_inverted_file():
+    index = SemanticIndex(HashingEmbedder(dim=64))
+    index.add(CVS)
+
+    with patch("rezumat.evaluators.semantic_index.config.SEMANTIC_IVF_MIN_SIZE", 2):
+        assert index.search("python", k=1)[0][0] in {"cv1", "cv4"}
+
+    assert index._ivf is None
+
+
+def test_shortlist_pairs_embeds_each_cv_once_per_process(monkeypatch):
+    embedder = Mock(wraps=HashingEmbedder())
+    monkeypatch.setattr("rezumat.evaluators.semantic_index._semantic_index", None)
+    monkeypatch.setattr(
+        "rezumat.evaluators.semantic_index.get_embedder", lambda: embedder
+    )
+    job_data = [("job1", {"technical_skills": {"essential": ["Python"]}})]
+
+    first = shortlist_pairs(job_data, CVS[:3], top_k=1)
+    second = shortlist_pairs(job_data, CVS, top_k=1)
+
+    embedded = [text for call in embedder.encode.call_args_list for text in call[0][0]]
+    assert sorted(text for text in embedded if text in dict(CVS).values()) == sorted(
+        dict(CVS).values()
+    )
+    assert first == {("job1", "cv1")}
+    assert second == {("job1", "cv1")}
@@ -1,9 +1,14 @@
+import asyncio
 from unittest.mock import Mock, mock_open, patch
 
 from langchain_core.runnables import RunnableSequence
 
-from rezumat.evaluators.two_stage_evaluators import two_stage_eval_jd, two_stage_eval_cv
-from rezumat.config import config
+from rezumat.evaluators.two_stage_evaluators import (
+    atwo_stage_eval_cv_batch,
+    two_stage_eval_cv,
+    two_stage_eval_jd,
+    validate_cv_result,
+)
 
 
 def test_successful_evaluation(mock_model_tuple, mock_job_tuple, mock_output_dir):
@@ -31,21 +36,26 @@ def test_all_models_fail(mock_job_tuple, mock_output_dir):
 
     model_tuples = [("failed_model", mock_grader)]
 
-    # mock the print function to prevent actual output
-    with patch("builtins.print"):
+    with patch("rezumat.evaluators.two_stage_evaluators.DeadLetterQueue") as mock_queue:
         result = two_stage_eval_jd(model_tuples, mock_job_tuple, mock_output_dir)
 
     assert result is None
+    # the failed call is queued for a later retry
+    entry, error = mock_queue.in_dir.return_value.add.call_args.args
+    assert entry["kind"] == "jd"
+    assert entry["job_id"] == mock_job_tuple[0]
+    assert str(error) == "Model failed"
 
 
 @patch("time.sleep")
-def test_rate_limiting(mock_sleep, mock_model_tuple, mock_job_tuple, mock_output_dir):
+def test_no_fixed_delay(mock_sleep, mock_model_tuple, mock_job_tuple, mock_output_dir):
+    """rate limiting is done by the rate limiter inside the chain, not by sleeping."""
     model_tuples = [mock_model_tuple]
 
     with patch("json.dump"), patch("builtins.open", mock_open()):
         two_stage_eval_jd(model_tuples, mock_job_tuple, mock_output_dir)
 
-    mock_sleep.assert_called_once_with(config.SLEEP_TIME)
+    mock_sleep.assert_not_called()
 
 
 def test_two_stage_eval_cv_success(
@@ -72,3 +82,75 @@ def test_two_stage_eval_cv_success(
     mock_model_tuple[1].invoke.assert_called_once_with(
         {"job_requirements": mock_job_tuple[1], "resume": mock_cv_tuple[1]}
     )
+
+
+def _cv_result(score):
+    scores = {
+        "technical_skills": score,
+        "soft_skills": score,
+        "experience": score,
+        "education": score,
+    }
+    return {
+        "resume_evaluation": {"original_scores": scores, "missing_skills": []},
+        "deeper_analysis": {"inferred_experience": []},
+        "recalibrated_scores": scores,
+        "assessment": {"suitability": "yes", "strengths": "", "concerns": ""},
+    }
+
+
+def test_validate_cv_result():
+    assert validate_cv_result(_cv_result(80))
+    assert not validate_cv_result({"assessment": {"suitability": "yes"}})
+    assert not validate_cv_result(None)
+
+
+def test_two_stage_eval_cv_batch_falls_back_for_invalid_items(mock_job_tuple, tmp_path):
+    """valid batch items are saved as is, missing or invalid ones are re-run singly."""
+    batch_grader = Mock(spec=RunnableSequence)
+    batch_grader.ainvoke.return_value = [
+        {"cv_id": "cv1", **_cv_result(80)},
+        {"cv_id": "cv2", "assessment": {}},
+    ]
+    single_grader = Mock(spec=RunnableSequence)
+    single_grader.ainvoke.return_value = _cv_result(50)
+
+    cv_tuples = [("cv1", "python dev"), ("cv2", "java dev"), ("cv3", "go dev")]
+    results = asyncio.run(
+        atwo_stage_eval_cv_batch(
+            [("model1", batch_grader)],
+            [("model1", single_grader)],
+            mock_job_tuple,
+            cv_tuples,
+            tmp_path,
+        )
+    )
+
+    assert results["cv1"]["model1"] == _cv_result(80)
+    assert results["cv2"]["model1"] == _cv_result(50)
+    assert results["cv3"]["model1"] == _cv_result(50)
+    assert batch_grader.ainvoke.await_count == 1
+    assert single_grader.ainvoke.await_count == 2
+    assert len(list(tmp_path.glob("123456_*_model1.json"))) == 3
+
+
+def test_two_stage_eval_cv_batch_unwraps_json_object(mock_job_tuple, tmp_path):
+    """JSON-mode models wrap the array of results in an object."""
+    batch_grader = Mock(spec=RunnableSequence)
+    batch_grader.ainvoke.return_value = {
+        "results": [{"cv_id": "cv1", **_cv_result(80)}]
+    }
+    single_grader = Mock(spec=RunnableSequence)
+
+    results = asyncio.run(
+        atwo_stage_eval_cv_batch(
+            [("model1", batch_grader)],
+            [("model1", single_grader)],
+            mock_job_tuple,
+            [("cv1", "python dev")],
+            tmp_path,
+        )
+    )
+
+    assert results["cv1"]["model1"] == _cv_result(80)
+    single_grader.ainvoke.assert_not_awaited()
@@ -0,0 +1,227 @@
+from pathlib import Path
+from unittest.mock import Mock, patch
+
+import pytest
+from langchain_core.runnables import RunnableSequence
+
+from rezumat.config import config
+from rezumat.models.input_models import CandidateEvaluationWeights, InputModel
+from rezumat.preprocessing.input_data_processing import (
+    evaluate_cv,
+    format_progress,
+    iter_cv_data,
+    iter_process_input,
+    plan_within_budget,
+)
+from rezumat.utils.candidate_pool import CandidatePool
+from rezumat.utils.estimate_cost import BudgetExceededError
+from rezumat.utils.process_jobs import CV_PROMPT_VERSION
+
+
+def _grader(inputs):
+    if "job_description" in inputs:
+        return {"technical_skills": {"essential": ["python"]}}
+    scores = {
+        "technical_skills": 80,
+        "soft_skills": 80,
+        "experience": 80,
+        "education": 80,
+    }
+    return {
+        "resume_evaluation": {"original_scores": scores},
+        "deeper_analysis": {"inferred_experience": []},
+        "recalibrated_scores": scores,
+        "assessment": {"suitability": "yes"},
+    }
+
+
+@pytest.fixture
+def output_dirs(tmp_path, monkeypatch):
+    for name in ["JOBS_OUTPUT_DIR", "CV_OUTPUT_DIR", "CSV_OUTPUT_DIR", "RUNS_DIR"]:
+        (tmp_path / name).mkdir()
+        monkeypatch.setattr(config, name, tmp_path / name)
+    monkeypatch.setattr(config, "COST_ESTIMATE_ENABLED", False)
+    monkeypatch.setattr(config, "CANDIDATE_POOL_ENABLED", False)
+    monkeypatch.setattr(config, "JOB_ANALYSIS_CACHE_ENABLED", False)
+    monkeypatch.setattr(config, "RESULT_CACHE_ENABLED", False)
+
+
+def test_format_progress_reports_the_eta():
+    assert format_progress(25, 100, 60) == (
+        "25/100 job-CV pairs scored (25%), elapsed 1m 00s, ETA 3m 00s."
+    )
+    assert format_progress(0, None, 5) == "0 job-CV pairs scored, elapsed 0m 05s."
+    assert format_progress(3, 4, 61, done=True) == (
+        "Done: 3 job-CV pairs scored in 1m 01s."
+    )
+
+
+def test_iter_process_input_streams_the_results(output_dirs):
+    """check that the scoring table is yielded as results arrive, then in full."""
+    grader = Mock(spec=RunnableSequence)
+    grader.ainvoke.side_effect = _grader
+
+    with patch(
+        "rezumat.preprocessing.input_data_processing.get_eval_chain",
+        return_value=("test-model", grader),
+    ):
+        updates = list(
+            iter_process_input(
+                "Backend engineer, python",
+                "python developer",
+                None,
+                "Text",
+                "key",
+                "Groq",
+                "llama3-70b-8192",
+                60,
+                10,
+                20,
+                10,
+            )
+        )
+
+    progress = [message for _, message in updates]
+    assert progress[:2] == ["Analyzing the job description...", "Evaluating the CVs..."]
+    assert progress[2].startswith("1 job-CV pairs scored")
+    assert progress[-1].startswith("Done: 1 job-CV pairs scored")
+    snapshot, final = updates[2][0], updates[-1][0]
+    assert snapshot["cv_id"].tolist() == final["cv_id"].tolist()
+    assert final["suitability"].tolist() == ["yes"]
+    assert (config.CSV_OUTPUT_DIR / "fit_scores_with_text.csv").exists()
+
+
+def test_evaluate_cv_reevaluates_the_pool_results_of_an_older_cv_prompt(
+    output_dirs, tmp_path
+):
+    """check that a resumed run does not reuse the result files of an old prompt."""
+    grader = Mock(spec=RunnableSequence)
+    grader.ainvoke.side_effect = _grader
+    pool = CandidatePool(tmp_path / "pool.sqlite")
+    job_data = [("job1", {"technical_skills": {"essential": ["python"]}})]
+    cv_data = [("cv1", "python developer")]
+
+    def run():
+        return list(
+            evaluate_cv([("model1", grader)], job_data, cv_data, resume=True, pool=pool)
+        )
+
+    with patch("rezumat.preprocessing.input_data_processing.CV_PROMPT_VERSION", "v1"):
+        assert len(run()) == 1
+        assert len(run()) == 1
+    assert grader.ainvoke.await_count == 1
+
+    with patch("rezumat.preprocessing.input_data_processing.CV_PROMPT_VERSION", "v2"):
+        assert len(run()) == 1
+    assert grader.ainvoke.await_count == 2
+    assert len(pool.get_results(prompt_version="v2")) == 1
+
+
+def test_budget_fallback_requires_an_api_key(monkeypatch):
+    """check that the run is not switched to a provider it can not call."""
+    monkeypatch.setattr(config, "BUDGET_FALLBACK_MODEL", ("OpenAI", "gpt-4o-mini"))
+    monkeypatch.setattr(config, "MODEL_PRICES", {"gpt-4o-mini": (0.0, 0.0)})
+    monkeypatch.setattr(config, "CASCADE_MODEL", None)
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    args = ("Groq", "llama3-70b-8192", ["Backend engineer"], ["python developer"])
+
+    with patch("rezumat.utils.estimate_cost.get_encoder", return_value=None):
+        with pytest.raises(BudgetExceededError, match="no api key"):
+            plan_within_budget(*args, budget=0.0001)
+
+        monkeypatch.setenv("OPENAI_API_KEY", "key")
+        interface, model, _ = plan_within_budget(*args, budget=0.0001)
+    assert (interface, model) == ("OpenAI", "gpt-4o-mini")
+
+
+def test_evaluate_cv_looks_up_the_pool_as_cvs_arrive(output_dirs, tmp_path):
+    """check that a pool run does not wait for every CV before the first llm call."""
+    parsed = []
+    parsed_at_first_call = []
+
+    def cv_stream():
+        for cv_id in ["cv1", "cv2", "cv3", "cv4"]:
+            parsed.append(cv_id)
+            yield cv_id, f"python developer {cv_id}"
+
+    def invoke(inputs):
+        parsed_at_first_call.append(len(parsed))
+        return _grader(inputs)
+
+    grader = Mock(spec=RunnableSequence)
+    grader.ainvoke.side_effect = invoke
+    pool = CandidatePool(tmp_path / "pool.sqlite")
+    job_data = [("job1", {"technical_skills": {"essential": ["python"]}})]
+    pool.add_result("job1", "cv4", "model1", _grader({}), CV_PROMPT_VERSION)
+
+    rows = list(
+        evaluate_cv([("model1", grader)], job_data, cv_stream(), resume=True, pool=pool)
+    )
+
+    assert sorted(row["cv_id"] for row in rows) == ["cv1", "cv2", "cv3", "cv4"]
+    assert grader.ainvoke.await_count == 3
+    assert parsed_at_first_call[0] < 4
+
+
+@pytest.mark.parametrize("input_type, inserts", [("Text", 1), ("Pool", 0)])
+def test_iter_process_input_adds_only_new_input_to_the_pool(
+    output_dirs, tmp_path, input_type, inserts
+):
+    """check that the CVs of the pool are not inserted into it again."""
+    grader = Mock(spec=RunnableSequence)
+    grader.ainvoke.side_effect = _grader
+    pool = CandidatePool(tmp_path / "pool.sqlite")
+    pool.add_cvs([("cv1", "go developer"), ("cv2", "java developer")])
+
+    with (
+        patch(
+            "rezumat.preprocessing.input_data_processing.get_eval_chain",
+            return_value=("test-model", grader),
+        ),
+        patch(
+            "rezumat.preprocessing.input_data_processing.get_candidate_pool",
+            return_value=pool,
+        ),
+        patch.object(pool, "add_cvs", wraps=pool.add_cvs) as add_cvs,
+    ):
+        updates = list(
+            iter_process_input(
+                "Backend engineer, python",
+                "python developer",
+                None,
+                input_type,
+                "key",
+                "Groq",
+                "llama3-70b-8192",
+                60,
+                10,
+                20,
+                10,
+            )
+        )
+
+    assert add_cvs.call_count == inserts
+    assert len(updates[-1][0]) == (1 if input_type == "Text" else 2)
+
+
+def test_iter_cv_data_skips_pdfs_without_text(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PDF_UPLOAD_FOLDER", tmp_path)
+    input_data = InputModel(
+        text_input="Backend engineer",
+        input_type="File",
+        api_key="key",
+        interface="Groq",
+        model="llama3-70b-8192",
+        weights=CandidateEvaluationWeights(
+            technical_skills=60, soft_skills=10, experience=20, education=10
+        ),
+    )
+    parsed = [(Path("scan.pdf"), " "), (Path("cv.pdf"), "python developer")]
+
+    with patch(
+        "rezumat.preprocessing.input_data_processing.iter_parsed_pdfs",
+        return_value=iter(parsed),
+    ):
+        cvs = list(iter_cv_data(input_data, []))
+
+    assert [text for _, text in cvs] == ["python developer"]
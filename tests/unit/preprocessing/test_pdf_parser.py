@@ -1,8 +1,12 @@
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
 
-from rezumat.preprocessing.parsers.pdf_parser import parse_pdf
+from rezumat.config import config
+from rezumat.preprocessing.parsers.pdf_parser import parse_pdf, process_pdfs
 
 
 def test_parse_pdf_valid_file():
@@ -22,3 +26,69 @@ def test_parse_pdf_empty_file():
     empty_pdf.touch()
     result = parse_pdf(empty_pdf)
     assert result == ""
+
+
+@pytest.mark.parametrize("backend", ["process", "thread"])
+def test_process_pdfs_parses_every_file(tmp_path, backend):
+    pdf_dir = tmp_path / "pdf"
+    pdf_dir.mkdir()
+    for name in ("a.pdf", "b.pdf"):
+        shutil.copy("tests/fixtures/sample_resume.pdf", pdf_dir / name)
+
+    with patch.object(config, "PDF_TEXT_CACHE_DIR", tmp_path / "cache"):
+        result = process_pdfs(pdf_dir, max_workers=2, backend=backend)
+
+    assert len(result) == 2
+    assert all(isinstance(text, str) and text for text in result)
+
+
+def test_process_workers_are_spawned_not_forked(tmp_path):
+    pdf_dir = tmp_path / "pdf"
+    pdf_dir.mkdir()
+    shutil.copy("tests/fixtures/sample_resume.pdf", pdf_dir / "a.pdf")
+
+    with (
+        patch.object(config, "PDF_TEXT_CACHE_DIR", tmp_path / "cache"),
+        patch(
+            "rezumat.preprocessing.parsers.pdf_parser.ProcessPoolExecutor",
+            wraps=ProcessPoolExecutor,
+        ) as mock_executor,
+    ):
+        assert len(process_pdfs(pdf_dir, max_workers=1, backend="process")) == 1
+
+    assert mock_executor.call_args.kwargs["mp_context"].get_start_method() == "spawn"
+
+
+def test_spawned_workers_leave_the_output_dirs_alone(tmp_path, monkeypatch):
+    """check that importing the config in a worker does not reset the directories."""
+    pdf_dir = tmp_path / "pdf"
+    pdf_dir.mkdir()
+    shutil.copy("tests/fixtures/sample_resume.pdf", pdf_dir / "a.pdf")
+    result_file = tmp_path / "cv" / "job1_cv1_model1.json"
+    result_file.parent.mkdir()
+    result_file.write_text("{}")
+    monkeypatch.setenv("RESET_OUTPUT_DIRS", "true")
+    monkeypatch.setenv("PDF_UPLOAD_FOLDER", str(pdf_dir))
+    monkeypatch.setenv("CV_OUTPUT_DIR", str(result_file.parent))
+
+    with patch.object(config, "PDF_TEXT_CACHE_DIR", tmp_path / "cache"):
+        assert len(process_pdfs(pdf_dir, max_workers=1, backend="process")) == 1
+
+    assert result_file.exists()
+
+
+def test_process_pdfs_reuses_cached_text(tmp_path):
+    pdf_dir = tmp_path / "pdf"
+    pdf_dir.mkdir()
+    shutil.copy("tests/fixtures/sample_resume.pdf", pdf_dir / "resume.pdf")
+
+    with patch.object(config, "PDF_TEXT_CACHE_DIR", tmp_path / "cache"):
+        first = process_pdfs(pdf_dir, backend="thread")
+        with patch(
+            "rezumat.preprocessing.parsers.pdf_parser.parse_pdf"
+        ) as mock_parse_pdf:
+            second = process_pdfs(pdf_dir, backend="thread")
+
+    mock_parse_pdf.assert_not_called()
+    assert first == second
+    assert len(list((tmp_path / "cache").glob("*.json"))) == 1
@@ -0,0 +1,59 @@
+import gradio as gr
+
+from rezumat.app import rerank_candidates, with_current_weights
+from rezumat.evaluators.post_analysis import ResultStore
+
+
+def _result(technical, soft):
+    scores = {
+        "technical_skills": technical,
+        "soft_skills": soft,
+        "experience": 50,
+        "education": 50,
+    }
+    return {
+        "resume_evaluation": {"original_scores": scores},
+        "deeper_analysis": {"inferred_experience": []},
+        "recalibrated_scores": scores,
+        "assessment": {"suitability": "yes", "strengths": "", "concerns": ""},
+    }
+
+
+def _results():
+    store = ResultStore()
+    store.append("job1", "coder", "model1", _result(100, 0))
+    store.append("job1", "talker", "model1", _result(0, 100))
+    return store
+
+
+def test_rerank_candidates_ranks_with_the_slider_weights():
+    current_weights = {}
+    results_df = _results().to_frame()
+
+    reranked, candidates = rerank_candidates(
+        10, 70, 10, 10, "All", results_df, current_weights
+    )
+
+    assert candidates.choices[0][0] == "talker"
+    assert reranked.set_index("cv_id").loc["talker", "recalibrated_overall_score"] == 80
+    assert current_weights["weights"].soft_skills == 70
+    # invalid totals while a slider is being dragged keep the last weights
+    assert rerank_candidates(90, 70, 10, 10, "All", reranked, current_weights) == (
+        gr.update(),
+        gr.update(),
+    )
+    assert current_weights["weights"].soft_skills == 70
+
+
+def test_streamed_results_keep_the_slider_weights():
+    """check that results streamed after a re-rank are ranked with its weights."""
+    current_weights = {}
+    store = _results()
+    rerank_candidates(10, 70, 10, 10, "All", store.to_frame(), current_weights)
+    store.append("job1", "newcomer", "model1", _result(50, 90))
+
+    streamed = with_current_weights(store.to_frame(), current_weights)
+
+    ranking = streamed.sort_values("recalibrated_overall_score", ascending=False)
+    assert ranking["cv_id"].tolist() == ["talker", "newcomer", "coder"]
+    assert with_current_weights(None, current_weights) is None
@@ -0,0 +1,241 @@
+import sys
+from unittest.mock import Mock, patch
+
+import pandas as pd
+import pytest
+from langchain_core.runnables import RunnableSequence
+
+from rezumat.cli import main
+from rezumat.utils import job_analysis_cache
+from rezumat.utils.candidate_pool import CandidatePool
+
+
+def _grader(inputs):
+    if "job_description" in inputs:
+        return {"technical_skills": {"essential": ["python"]}}
+    score = 90 if "python" in inputs["resume"] else 20
+    scores = {
+        "technical_skills": score,
+        "soft_skills": score,
+        "experience": score,
+        "education": score,
+    }
+    return {
+        "resume_evaluation": {"original_scores": scores},
+        "deeper_analysis": {"inferred_experience": []},
+        "recalibrated_scores": scores,
+        "assessment": {"suitability": "yes" if score > 50 else "no"},
+    }
+
+
+grader = Mock(spec=RunnableSequence)
+grader.ainvoke.side_effect = _grader
+
+
+@pytest.fixture(autouse=True)
+def job_analysis_memo(tmp_path, monkeypatch):
+    """an empty job analysis cache per test"""
+    monkeypatch.setattr(
+        job_analysis_cache.config, "JOB_ANALYSIS_CACHE_PATH", tmp_path / "jobs.sqlite"
+    )
+    monkeypatch.setattr(job_analysis_cache, "_job_analysis_cache", None)
+
+
+def test_batch_writes_scoring_table_and_resumes(tmp_path):
+    """check that `rezumat batch` scores every pair and --resume skips them later."""
+    jobs, cvs = tmp_path / "jobs", tmp_path / "cvs"
+    jobs.mkdir()
+    cvs.mkdir()
+    (jobs / "backend.txt").write_text("Backend engineer, python")
+    (cvs / "alice.txt").write_text("python developer")
+    (cvs / "bob.txt").write_text("java developer")
+    output = tmp_path / "out" / "scores.csv"
+    argv = ["batch", "--jobs", str(jobs), "--cvs", str(cvs)]
+    argv += ["--output-dir", str(tmp_path / "out"), "--output", str(output)]
+
+    grader.ainvoke.reset_mock()
+
+    with (
+        patch("rezumat.cli.get_eval_chain", return_value=("test-model", grader)),
+        patch(
+            "rezumat.preprocessing.input_data_processing.get_eval_chain",
+            return_value=("test-model", grader),
+        ),
+    ):
+        assert main(argv) == 0
+        df = pd.read_csv(output)
+        assert df["cv_file"].tolist() == ["alice.txt", "bob.txt"]
+        assert df["job_file"].unique().tolist() == ["backend.txt"]
+        assert grader.ainvoke.await_count == 3
+
+        assert main(argv) == 0
+    assert grader.ainvoke.await_count == 3
+    assert len(pd.read_csv(output)) == 2
+
+
+def test_batch_closes_the_run_when_evaluation_fails(tmp_path):
+    """check that the manifest is closed and the metrics written after an error."""
+    jobs, cvs = tmp_path / "jobs", tmp_path / "cvs"
+    jobs.mkdir()
+    cvs.mkdir()
+    (jobs / "backend.txt").write_text("Backend engineer, python")
+    (cvs / "alice.txt").write_text("python developer")
+    argv = ["batch", "--jobs", str(jobs), "--cvs", str(cvs), "--run-id", "run1"]
+    argv += ["--output-dir", str(tmp_path / "out")]
+
+    with (
+        patch("rezumat.cli.get_eval_chain", return_value=("test-model", grader)),
+        patch(
+            "rezumat.preprocessing.input_data_processing.get_eval_chain",
+            return_value=("test-model", grader),
+        ),
+        patch("rezumat.cli.evaluate_cv", side_effect=RuntimeError("provider down")),
+        patch("rezumat.cli.RunManifest.close") as mock_close,
+        pytest.raises(RuntimeError),
+    ):
+        main(argv)
+
+    mock_close.assert_called_once()
+    assert (tmp_path / "out" / "runs" / "run1.metrics.json").exists()
+
+
+def test_batch_checks_the_output_format_before_the_llm_calls(tmp_path, capsys):
+    jobs, cvs = tmp_path / "jobs", tmp_path / "cvs"
+    jobs.mkdir()
+    cvs.mkdir()
+    (jobs / "backend.txt").write_text("Backend engineer, python")
+    (cvs / "alice.txt").write_text("python developer")
+    argv = ["batch", "--jobs", str(jobs), "--cvs", str(cvs)]
+    argv += ["--output-dir", str(tmp_path / "out")]
+    argv += ["--output", str(tmp_path / "scores.parquet")]
+
+    grader.ainvoke.reset_mock()
+    with (
+        patch.dict(sys.modules, {"pyarrow": None}),
+        patch("rezumat.cli.get_eval_chain", return_value=("test-model", grader)),
+    ):
+        assert main(argv) == 1
+    assert "needs pyarrow" in capsys.readouterr().err
+    grader.ainvoke.assert_not_awaited()
+
+
+def test_batch_rejects_invalid_weights(tmp_path, capsys):
+    argv = ["batch", "--jobs", str(tmp_path), "--cvs", str(tmp_path)]
+    assert main(argv + ["--weights", "50", "50", "50", "50"]) == 1
+    assert "Total weight must be 100" in capsys.readouterr().err
+
+
+def test_batch_aborts_over_budget(tmp_path, capsys):
+    jobs, cvs = tmp_path / "jobs", tmp_path / "cvs"
+    jobs.mkdir()
+    cvs.mkdir()
+    (jobs / "backend.txt").write_text("Backend engineer, python")
+    (cvs / "alice.txt").write_text("python developer")
+    argv = ["batch", "--jobs", str(jobs), "--cvs", str(cvs)]
+    argv += ["--output-dir", str(tmp_path / "out"), "--budget", "0"]
+
+    grader.ainvoke.reset_mock()
+
+    with (
+        patch("rezumat.cli.get_eval_chain", return_value=("test-model", grader)),
+        patch("rezumat.utils.estimate_cost.get_encoder", return_value=None),
+    ):
+        assert main(argv) == 1
+    assert "exceeds the budget" in capsys.readouterr().err
+    grader.ainvoke.assert_not_awaited()
+
+
+def test_batch_screens_new_jobs_against_the_pool(tmp_path):
+    """check that CVs added to the --pool are evaluated in later runs without --cvs."""
+    jobs, cvs = tmp_path / "jobs", tmp_path / "cvs"
+    jobs.mkdir()
+    cvs.mkdir()
+    (jobs / "backend.txt").write_text("Backend engineer, python")
+    (cvs / "alice.txt").write_text("python developer")
+    pool = str(tmp_path / "pool.sqlite")
+    argv = ["batch", "--jobs", str(jobs), "--pool", pool]
+
+    with (
+        patch("rezumat.cli.get_eval_chain", return_value=("test-model", grader)),
+        patch(
+            "rezumat.preprocessing.input_data_processing.get_eval_chain",
+            return_value=("test-model", grader),
+        ),
+    ):
+        first_run = ["--cvs", str(cvs), "--output-dir", str(tmp_path / "a")]
+        assert main(argv + first_run) == 0
+        (jobs / "backend.txt").write_text("Data engineer, python")
+        assert main(argv + ["--output-dir", str(tmp_path / "b")]) == 0
+
+    df = pd.read_csv(tmp_path / "b" / "fit_scores.csv")
+    assert len(df) == 1
+    assert df["job_file"].tolist() == ["backend.txt"]
+
+
+def test_batch_with_a_pool_only_scores_new_cvs(tmp_path):
+    """check that new applicants are scored and merged with the earlier results."""
+    jobs, cvs = tmp_path / "jobs", tmp_path / "cvs"
+    jobs.mkdir()
+    cvs.mkdir()
+    (jobs / "backend.txt").write_text("Backend engineer, python")
+    (cvs / "alice.txt").write_text("python developer")
+    (cvs / "bob.txt").write_text("java developer")
+    argv = ["batch", "--jobs", str(jobs), "--cvs", str(cvs)]
+    argv += ["--pool", str(tmp_path / "pool.sqlite")]
+
+    grader.ainvoke.reset_mock()
+    with (
+        patch("rezumat.cli.get_eval_chain", return_value=("test-model", grader)),
+        patch(
+            "rezumat.preprocessing.input_data_processing.get_eval_chain",
+            return_value=("test-model", grader),
+        ),
+    ):
+        assert main(argv + ["--output-dir", str(tmp_path / "a")]) == 0
+        (cvs / "carol.txt").write_text("python engineer")
+        assert main(argv + ["--output-dir", str(tmp_path / "b")]) == 0
+
+    # one jd and two cv calls, then only the new cv
+    assert grader.ainvoke.await_count == 4
+    df = pd.read_csv(tmp_path / "b" / "fit_scores.csv")
+    assert sorted(df["cv_file"]) == ["alice.txt", "bob.txt", "carol.txt"]
+
+
+def test_retry_merges_recovered_results_into_the_table_and_pool(tmp_path):
+    """check that `rezumat retry` updates the outputs of the failed batch run."""
+    jobs, cvs = tmp_path / "jobs", tmp_path / "cvs"
+    jobs.mkdir()
+    cvs.mkdir()
+    (jobs / "backend.txt").write_text("Backend engineer, python")
+    (cvs / "alice.txt").write_text("python developer")
+    (cvs / "bob.txt").write_text("java developer")
+    pool = tmp_path / "pool.sqlite"
+    out = ["--output-dir", str(tmp_path / "out"), "--pool", str(pool)]
+
+    def flaky(inputs):
+        if "java" in inputs.get("resume", ""):
+            raise RuntimeError("provider down")
+        return _grader(inputs)
+
+    flaky_grader = Mock(spec=RunnableSequence)
+    flaky_grader.ainvoke.side_effect = flaky
+
+    for argv, model in [
+        (["batch", "--jobs", str(jobs), "--cvs", str(cvs)] + out, flaky_grader),
+        (["retry", "--jobs", str(jobs), "--cvs", str(cvs)] + out, grader),
+    ]:
+        with (
+            patch("rezumat.cli.get_eval_chain", return_value=("test-model", model)),
+            patch(
+                "rezumat.preprocessing.input_data_processing.get_eval_chain",
+                return_value=("test-model", model),
+            ),
+        ):
+            assert main(argv) == 0
+        if argv[0] == "batch":
+            table = pd.read_csv(tmp_path / "out" / "fit_scores.csv")
+            assert table["cv_file"].tolist() == ["alice.txt"]
+
+    table = pd.read_csv(tmp_path / "out" / "fit_scores.csv")
+    assert sorted(table["cv_file"]) == ["alice.txt", "bob.txt"]
+    assert len(CandidatePool(pool).get_results()) == 2
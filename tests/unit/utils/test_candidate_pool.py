@@ -0,0 +1,60 @@
+import sqlite3
+
+from rezumat.utils.candidate_pool import CandidatePool
+
+
+def test_add_cvs_dedupes_and_persists(tmp_path):
+    pool = CandidatePool(tmp_path / "pool.sqlite")
+
+    assert pool.add_cvs([("cv1", "python developer"), ("cv2", "java developer")]) == 2
+    assert pool.add_cvs([("cv1", "python developer"), ("cv3", "go developer")]) == 1
+
+    reopened = CandidatePool(tmp_path / "pool.sqlite")
+    assert len(reopened) == 3
+    assert "cv2" in reopened
+    assert reopened.get_cv("cv3") == "go developer"
+    assert [cv_id for cv_id, _ in reopened.iter_cvs(batch_size=2)] == [
+        "cv1",
+        "cv2",
+        "cv3",
+    ]
+
+
+def test_results_lookups(tmp_path):
+    pool = CandidatePool(tmp_path / "pool.sqlite")
+    job_id = "job1"
+
+    pool.add_results(
+        [
+            (job_id, "cv1", "model1", {"score": 1}),
+            (job_id, "cv2", "model1", {"score": 2}),
+            (job_id, "cv1", "model2", {"score": 3}),
+        ]
+    )
+    pool.add_result(job_id, "cv1", "model1", {"score": 4})
+
+    assert len(pool.get_results(job_id=job_id)) == 3
+    assert pool.get_results(cv_id="cv1", model_name="model1") == [
+        (job_id, "cv1", "model1", {"score": 4})
+    ]
+    assert pool.stats() == {"cvs": 0, "results": 3}
+
+
+def test_results_table_of_an_older_pool_is_versioned(tmp_path):
+    conn = sqlite3.connect(tmp_path / "pool.sqlite")
+    conn.execute(
+        "CREATE TABLE results (job_id TEXT NOT NULL, cv_id TEXT NOT NULL, "
+        "model_name TEXT NOT NULL, result TEXT NOT NULL, added_at REAL NOT NULL, "
+        "PRIMARY KEY (job_id, cv_id, model_name))"
+    )
+    conn.execute("INSERT INTO results VALUES ('job1', 'cv1', 'model1', '{}', 0)")
+    conn.commit()
+    conn.close()
+
+    pool = CandidatePool(tmp_path / "pool.sqlite")
+    pool.add_result("job1", "cv2", "model1", {"score": 1}, prompt_version="v1")
+
+    assert pool.get_results(prompt_version="") == [("job1", "cv1", "model1", {})]
+    assert pool.get_results(prompt_version="v1") == [
+        ("job1", "cv2", "model1", {"score": 1})
+    ]
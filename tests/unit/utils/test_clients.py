@@ -0,0 +1,35 @@
+import asyncio
+
+from rezumat.utils.clients import (
+    get_async_http_client,
+    get_event_loop,
+    get_http_client,
+    get_or_create_model,
+    run_async,
+)
+
+
+def test_http_clients_are_shared_per_name():
+    assert get_http_client("test") is get_http_client("test")
+    assert get_http_client("test") is not get_http_client("other")
+    assert get_async_http_client("test") is get_async_http_client("test")
+
+
+def test_get_or_create_model_creates_once():
+    created = []
+
+    def create():
+        created.append(object())
+        return created[-1]
+
+    model = get_or_create_model(("test", "model"), create)
+    assert get_or_create_model(("test", "model"), create) is model
+    assert len(created) == 1
+
+
+def test_run_async_uses_one_loop_for_every_run():
+    async def current_loop():
+        return asyncio.get_running_loop()
+
+    loop = run_async(current_loop())
+    assert run_async(current_loop()) is loop is get_event_loop()
@@ -0,0 +1,97 @@
+from unittest.mock import patch
+
+import pytest
+
+from rezumat.config import config
+from rezumat.utils.estimate_cost import (
+    calculate_cost,
+    check_budget,
+    count_tokens,
+    count_tokens_batch,
+    estimate_run,
+    model_price,
+    render_cv_prompts,
+)
+
+
+@pytest.fixture(autouse=True)
+def offline_encoder():
+    """count 1 token per 4 characters, as when the encoding can not be downloaded"""
+    with patch("rezumat.utils.estimate_cost.get_encoder", return_value=None):
+        yield
+
+
+def test_count_tokens_batch_matches_count_tokens():
+    texts = ["python developer", "", "x" * 41]
+    assert count_tokens_batch(texts) == [count_tokens(text) for text in texts]
+    assert count_tokens_batch(texts) == [4, 0, 11]
+
+
+def test_model_price_lookup():
+    with patch.object(
+        config,
+        "MODEL_PRICES",
+        {"groq/llama3-70b-8192": (1.0, 2.0), "gpt-4": (30.0, 60.0), "ollama": (0, 0)},
+    ):
+        assert model_price("Groq", "llama3-70b-8192") == (1.0, 2.0)
+        assert model_price("OpenAI", "gpt-4") == (30.0, 60.0)
+        assert model_price("Ollama", "llama3") == (0, 0)
+        assert model_price("OpenAI", "unknown") == tuple(config.DEFAULT_MODEL_PRICE)
+
+
+def test_calculate_cost():
+    assert calculate_cost(1_000_000, 500_000, (2.0, 10.0)) == pytest.approx(7.0)
+
+
+def test_estimate_run_counts_every_pair():
+    """the tokens of the pairs add up to the rendered prompt of every pair."""
+    job_texts, cv_texts = ["backend job", "frontend job"], ["cv one", "cv two", "cv 3"]
+    model = ("OpenAI", "gpt-4")
+
+    estimate = estimate_run(None, [model], job_texts, cv_texts, ["a", "b"])
+
+    system_messages, user_messages = render_cv_prompts(["a", "b"], cv_texts)
+    expected = sum(
+        count_tokens(system) + count_tokens(user)
+        for system in system_messages
+        for user in user_messages
+    )
+    usage = estimate["models"]["openai/gpt-4"]
+    assert estimate["pairs"] == 6
+    assert usage["calls"] == 6
+    assert usage["input_tokens"] == expected
+    assert usage["output_tokens"] == 6 * config.ESTIMATED_COMPLETION_TOKENS
+    assert estimate["cost"] == pytest.approx(
+        calculate_cost(expected, usage["output_tokens"], model_price(*model))
+    )
+
+
+def test_estimate_run_without_the_cv_texts():
+    """check that unparsed CVs are counted as the average cv length."""
+    model = ("OpenAI", "gpt-4")
+    with patch.object(config, "ESTIMATED_CV_TOKENS", 100):
+        estimate = estimate_run(None, [model], ["job"], [], ["a"], num_cvs=3)
+        exact = estimate_run(None, [model], ["job"], ["x" * 400] * 3, ["a"])
+
+    assert estimate["pairs"] == 3
+    assert estimate["models"] == exact["models"]
+
+
+def test_estimate_run_jd_stage_and_duration():
+    model = ("Groq", "llama3-70b-8192")
+    with (
+        patch.object(config, "ESTIMATED_CALL_SECONDS", 10.0),
+        patch.object(config, "RATE_LIMITS", {"groq": {"requests_per_minute": 1000}}),
+    ):
+        estimate = estimate_run(model, [model], ["job"], ["cv"] * 4, max_concurrency=2)
+
+    assert estimate["models"]["groq/llama3-70b-8192"]["calls"] == 5
+    # 1 jd call, then 4 cv calls on 2 slots
+    assert estimate["seconds"] == pytest.approx(10.0 + 20.0)
+
+
+def test_check_budget():
+    assert check_budget({"cost": 1.0}, 2.0)
+    assert not check_budget({"cost": 3.0}, 2.0)
+    with patch.object(config, "BUDGET_LIMIT", None):
+        assert check_budget({"cost": 3.0})
@@ -0,0 +1,18 @@
+from rezumat.utils.hashing import content_id, dedupe
+
+
+def test_content_id_is_stable_and_ignores_formatting():
+    assert content_id("Python developer\n\n 7 years") == content_id(
+        "Python developer 7 years"
+    )
+    assert content_id("Python developer") != content_id("Java developer")
+
+
+def test_content_id_accepts_bytes():
+    assert content_id(b"%PDF-1.4") == content_id(b"%PDF-1.4")
+    assert len(content_id(b"%PDF-1.4")) == 16
+
+
+def test_dedupe_keeps_first_occurrence_in_order():
+    tuples = [("a", "first"), ("b", "second"), ("a", "duplicate")]
+    assert dedupe(tuples) == [("a", "first"), ("b", "second")]
@@ -0,0 +1,41 @@
+from unittest.mock import Mock, patch
+
+import gradio as gr
+import pytest
+
+from rezumat.utils import helper
+from rezumat.utils.helper import set_and_verify_api_key
+
+
+@pytest.fixture
+def http_client():
+    client = Mock()
+    client.get.return_value = Mock(status_code=200)
+    with (
+        patch("rezumat.utils.helper.get_http_client", return_value=client),
+        patch.dict(helper._verified_keys, clear=True),
+        patch.dict("os.environ"),
+    ):
+        yield client
+
+
+def test_verified_api_key_is_cached_until_the_ttl(http_client):
+    set_and_verify_api_key("key-1", "Groq")
+    set_and_verify_api_key("key-1", "Groq")
+    assert http_client.get.call_count == 1
+
+    set_and_verify_api_key("key-2", "Groq")
+    assert http_client.get.call_count == 2
+
+    with patch("rezumat.utils.helper.config.API_KEY_VERIFY_TTL", 0):
+        set_and_verify_api_key("key-1", "Groq")
+    assert http_client.get.call_count == 3
+
+
+def test_rejected_api_key_is_not_cached(http_client):
+    http_client.get.return_value = Mock(status_code=401)
+
+    for _ in range(2):
+        with pytest.raises(gr.Error):
+            set_and_verify_api_key("bad-key", "OpenAI")
+    assert http_client.get.call_count == 2
@@ -0,0 +1,65 @@
+from unittest.mock import Mock
+
+from langchain_core.runnables import RunnableSequence
+
+from rezumat.utils.helper import get_job_data
+from rezumat.utils.job_analysis_cache import JobAnalysisCache, job_analysis_key
+from rezumat.utils.process_jobs import process_all_jobs
+
+ANALYSIS = {"technical_skills": {"essential": ["python"]}}
+
+
+def test_key_ignores_whitespace_and_depends_on_model_and_prompt():
+    key = job_analysis_key("Backend  engineer\n", "model1")
+    assert key == job_analysis_key("Backend engineer", "model1")
+    assert key != job_analysis_key("Backend engineer", "model2")
+    assert key != job_analysis_key("Backend engineer", "model1", prompt_version="v2")
+
+
+def test_analyses_persist_across_instances(tmp_path):
+    memo = JobAnalysisCache(tmp_path / "jobs.sqlite")
+    assert memo.get("Backend engineer", "model1") is None
+    memo.set("Backend engineer", "model1", ANALYSIS)
+
+    reopened = JobAnalysisCache(tmp_path / "jobs.sqlite")
+    assert reopened.get("Backend  engineer", "model1") == ANALYSIS
+    assert reopened.get("Backend engineer", "model2") is None
+    assert reopened.stats() == {"hits": 1, "misses": 1, "entries": 1}
+
+
+def test_memoized_jobs_skip_the_jd_stage(tmp_path):
+    """check that a job analyzed in an earlier run is not sent to the model again."""
+    grader = Mock(spec=RunnableSequence)
+    grader.ainvoke.return_value = ANALYSIS
+    memo = JobAnalysisCache(tmp_path / "jobs.sqlite")
+
+    first_dir, second_dir = tmp_path / "first", tmp_path / "second"
+    first_dir.mkdir()
+    second_dir.mkdir()
+    process_all_jobs(("model1", grader), "Backend engineer", first_dir, memo=memo)
+    job_tuples = process_all_jobs(
+        ("model1", grader), ["Backend engineer", "Data engineer"], second_dir, memo=memo
+    )
+
+    assert grader.ainvoke.await_count == 2
+    # the analysis of the first job is not in `second_dir`, only in the memo
+    assert len(list(second_dir.glob("*.json"))) == 1
+    job_data = get_job_data(job_tuples, "model1", jobs_dir=second_dir, memo=memo)
+    assert [job_id for job_id, _ in job_data] == [job_id for job_id, _ in job_tuples]
+    assert all(job_analysis == ANALYSIS for _, job_analysis in job_data)
+
+
+def test_memo_takes_precedence_over_resumed_result_files(tmp_path):
+    """check that a result file of an older jd prompt is not resumed with a memo."""
+    grader = Mock(spec=RunnableSequence)
+    grader.ainvoke.return_value = ANALYSIS
+    memo = JobAnalysisCache(tmp_path / "jobs.sqlite")
+    job_tuples = process_all_jobs(("model1", grader), "Backend engineer", tmp_path)
+
+    process_all_jobs(
+        ("model1", grader), "Backend engineer", tmp_path, resume=True, memo=memo
+    )
+    get_job_data(job_tuples, "model1", jobs_dir=tmp_path, memo=memo)
+
+    assert grader.ainvoke.await_count == 2
+    assert memo.stats() == {"hits": 0, "misses": 1, "entries": 1}
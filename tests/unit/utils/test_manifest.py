@@ -0,0 +1,77 @@
+from unittest.mock import Mock
+
+from langchain_core.runnables import RunnableSequence
+
+from rezumat.utils.manifest import DONE, FAILED, IN_FLIGHT, RunManifest
+from rezumat.utils.process_jobs import stream_pairs
+
+
+def test_manifest_replays_last_state(tmp_path):
+    """check that a reopened manifest keeps the last state and skips a torn line."""
+    manifest = RunManifest.for_run("run1", tmp_path)
+    manifest.record("job1_cv1", IN_FLIGHT)
+    manifest.record("job1_cv1", DONE)
+    manifest.record("job1_cv2", FAILED, "timeout")
+    manifest.close()
+    with open(tmp_path / "run1.jsonl", "a") as f:
+        f.write('{"key": "job1_cv3", "sta')
+
+    manifest = RunManifest.for_run("run1", tmp_path)
+
+    assert manifest.is_done("job1_cv1")
+    assert manifest.failed() == {"job1_cv2": "timeout"}
+    assert manifest.summary() == {DONE: 1, FAILED: 1}
+
+
+def test_torn_tail_does_not_swallow_the_next_record(tmp_path):
+    """check that the first record after a crash mid-write is replayed."""
+    manifest = RunManifest.for_run("run1", tmp_path)
+    manifest.record("job1_cv1", DONE)
+    manifest.close()
+    with open(tmp_path / "run1.jsonl", "a") as f:
+        f.write('{"key": "job1_cv2", "sta')
+
+    manifest = RunManifest.for_run("run1", tmp_path)
+    manifest.record_many(["job1_cv2", "job1_cv3"], DONE)
+    manifest.close()
+
+    manifest = RunManifest.for_run("run1", tmp_path)
+    assert manifest.summary() == {DONE: 3}
+
+
+def test_resumed_run_only_redoes_unfinished_pairs(tmp_path):
+    """check that rerunning a run id only re-evaluates the pairs that failed."""
+    calls = []
+
+    def invoke(inputs):
+        calls.append(inputs["resume"])
+        if inputs["resume"] == "flaky" and calls.count("flaky") == 1:
+            raise RuntimeError("rate limited")
+        return {"assessment": {"suitability": "yes"}}
+
+    mock_grader = Mock(spec=RunnableSequence)
+    mock_grader.ainvoke.side_effect = invoke
+    cv_data = [("cv1", "stable"), ("cv2", "flaky")]
+
+    def run():
+        manifest = RunManifest.for_run("run1", tmp_path / "runs")
+        results = list(
+            stream_pairs(
+                [("model1", mock_grader)],
+                [("job1", "python")],
+                iter(cv_data),
+                tmp_path,
+                manifest=manifest,
+            )
+        )
+        manifest.close()
+        return manifest, results
+
+    manifest, results = run()
+    assert len(results) == 1
+    assert set(manifest.failed()) == {"job1_cv2"}
+
+    manifest, results = run()
+    assert len(results) == 2
+    assert sorted(calls) == ["flaky", "flaky", "stable"]
+    assert manifest.summary() == {DONE: 2}
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+from langchain_core.runnables import RunnableLambda
+
+from rezumat.utils.metrics import Metrics
+
+
+@pytest.fixture
+def metrics():
+    return Metrics()
+
+
+def test_summary_quantiles(metrics):
+    for value in range(1, 101):
+        metrics.observe("latency", value, model="m")
+    metrics.inc("calls", model="m")
+    metrics.inc("calls", 2, model="m")
+
+    summary = metrics.summary()
+    assert summary["calls"] == [{"labels": {"model": "m"}, "value": 3}]
+    (latency,) = summary["latency"]
+    assert latency["count"] == 100
+    assert latency["sum"] == 5050
+    assert latency["min"] == 1 and latency["max"] == 100
+    assert latency["p50"] == pytest.approx(50.5)
+    assert latency["p99"] == pytest.approx(99.01)
+
+
+def test_to_prometheus(metrics):
+    metrics.inc("rezumat_llm_calls_total", model="m")
+    metrics.observe("rezumat_stage_seconds", 2.0, stage="jd_analysis")
+
+    text = metrics.to_prometheus()
+    assert "# TYPE rezumat_llm_calls_total counter" in text
+    assert 'rezumat_llm_calls_total{model="m"} 1' in text
+    assert "# TYPE rezumat_stage_seconds summary" in text
+    assert 'rezumat_stage_seconds{stage="jd_analysis",quantile="0.5"} 2.0' in text
+    assert 'rezumat_stage_seconds_count{stage="jd_analysis"} 1' in text
+
+
+def test_timed_runnable(metrics):
+    timed = metrics.timed(RunnableLambda(lambda x: x * 2), "call_seconds", model="m")
+
+    assert timed.invoke(2) == 4
+    assert metrics.summary()["call_seconds"][0]["count"] == 1
+
+
+def test_timer_records_on_error(metrics):
+    with pytest.raises(ValueError):
+        with metrics.timer("stage_seconds", stage="s"):
+            raise ValueError
+
+    assert metrics.summary()["stage_seconds"][0]["count"] == 1
+
+
+def test_write_run(metrics, tmp_path):
+    metrics.inc("calls")
+    metrics.write_run("run-1", tmp_path)
+
+    assert json.loads((tmp_path / "run-1.metrics.json").read_text())["calls"]
+    assert "calls 1" in (tmp_path / "run-1.prom").read_text()
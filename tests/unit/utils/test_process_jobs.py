@@ -0,0 +1,214 @@
+import asyncio
+import time
+from unittest.mock import Mock, patch
+
+from langchain_core.runnables import RunnableSequence
+
+from rezumat.utils.candidate_pool import CandidatePool
+from rezumat.utils.process_jobs import (
+    finished_in_pool,
+    pack_cv_batches,
+    stream_pairs,
+)
+
+
+def test_stream_pairs_evaluates_every_pair(tmp_path):
+    """check that stream_pairs() calls the grader once for every job x cv pair."""
+    mock_grader = Mock(spec=RunnableSequence)
+    mock_grader.ainvoke.return_value = {"assessment": {"suitability": "yes"}}
+
+    job_data = [("job1", "python"), ("job2", "java")]
+    cv_data = [("cv1", "python dev"), ("cv2", "java dev"), ("cv3", "go dev")]
+
+    results = list(
+        stream_pairs([("model1", mock_grader)], job_data, iter(cv_data), tmp_path)
+    )
+
+    assert len(results) == 6
+    assert mock_grader.ainvoke.await_count == 6
+    assert len(list(tmp_path.glob("*.json"))) == 6
+
+
+def test_stream_pairs_respects_max_concurrency(tmp_path):
+    """check that no more than max_concurrency calls are in flight at the same time."""
+    in_flight = 0
+    peak = 0
+
+    async def slow_invoke(inputs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return {}
+
+    mock_grader = Mock(spec=RunnableSequence)
+    mock_grader.ainvoke.side_effect = slow_invoke
+
+    job_data = [("job1", "python")]
+    cv_data = [(f"cv{i}", "resume") for i in range(10)]
+
+    list(
+        stream_pairs(
+            [("model1", mock_grader)],
+            job_data,
+            iter(cv_data),
+            tmp_path,
+            max_concurrency=3,
+        )
+    )
+
+    assert peak == 3
+
+
+def test_stream_pairs_resume_skips_finished_pairs(tmp_path):
+    """check that pairs with an existing result file are not evaluated again."""
+    mock_grader = Mock(spec=RunnableSequence)
+    mock_grader.ainvoke.return_value = {}
+    (tmp_path / "job1_cv1_model1.json").write_text("{}")
+
+    job_data = [("job1", "python")]
+    cv_data = [("cv1", "python dev"), ("cv2", "java dev"), ("cv2", "java dev")]
+
+    list(
+        stream_pairs(
+            [("model1", mock_grader)], job_data, iter(cv_data), tmp_path, resume=True
+        )
+    )
+
+    mock_grader.ainvoke.assert_awaited_once_with(
+        {"job_requirements": "python", "resume": "java dev"}
+    )
+
+
+def test_stream_pairs_evaluates_cvs_while_the_stream_is_still_producing(tmp_path):
+    """check that the first CV is evaluated before the last CV is produced."""
+    events = []
+
+    async def invoke(inputs):
+        events.append(f"evaluated {inputs['resume']}")
+        return {"resume": inputs["resume"]}
+
+    mock_grader = Mock(spec=RunnableSequence)
+    mock_grader.ainvoke.side_effect = invoke
+
+    def cv_stream():
+        for i in range(3):
+            events.append(f"parsed cv{i}")
+            time.sleep(0.05)
+            yield f"cv{i}", f"cv{i}"
+
+    job_data = [("job1", "python"), ("job2", "java")]
+    results = list(
+        stream_pairs([("model1", mock_grader)], job_data, cv_stream(), tmp_path)
+    )
+
+    assert len(results) == 6
+    assert {(job_id, cv_id) for job_id, cv_id, _, _ in results} == {
+        (job, f"cv{i}") for job in ("job1", "job2") for i in range(3)
+    }
+    assert events.index("evaluated cv0") < events.index("parsed cv2")
+
+
+def test_stream_pairs_resume_reads_finished_pairs_back(tmp_path):
+    mock_grader = Mock(spec=RunnableSequence)
+    mock_grader.ainvoke.return_value = {"new": True}
+    (tmp_path / "job1_cv1_model1.json").write_text('{"new": false}')
+
+    results = list(
+        stream_pairs(
+            [("model1", mock_grader)],
+            [("job1", "python")],
+            iter([("cv1", "python dev"), ("cv2", "java dev")]),
+            tmp_path,
+            resume=True,
+        )
+    )
+
+    assert sorted(results) == [
+        ("job1", "cv1", "model1", {"new": False}),
+        ("job1", "cv2", "model1", {"new": True}),
+    ]
+    mock_grader.ainvoke.assert_awaited_once()
+
+
+@patch("rezumat.utils.process_jobs.count_tokens", side_effect=len)
+def test_pack_cv_batches_respects_size_and_token_budget(mock_count_tokens):
+    cvs = [("cv1", "x" * 40), ("cv2", "x" * 40), ("cv3", "x" * 40), ("cv4", "x" * 200)]
+
+    assert [len(batch) for batch in pack_cv_batches(cvs, 2)] == [2, 2]
+    assert [len(batch) for batch in pack_cv_batches(cvs, 10, token_budget=100)] == [
+        2,
+        1,
+        1,
+    ]
+
+
+def test_stream_pairs_adds_ensemble_of_several_models(tmp_path):
+    """check that several models get a combined "ensemble" result per pair."""
+    scores = {
+        "technical_skills": 60,
+        "soft_skills": 60,
+        "experience": 60,
+        "education": 60,
+    }
+    result = {
+        "resume_evaluation": {"original_scores": scores},
+        "deeper_analysis": {"inferred_experience": []},
+        "recalibrated_scores": scores,
+        "assessment": {"suitability": "yes", "strengths": "", "concerns": ""},
+    }
+    model_tuples = []
+    for model_name in ["model1", "model2"]:
+        mock_grader = Mock(spec=RunnableSequence)
+        mock_grader.ainvoke.return_value = result
+        model_tuples.append((model_name, mock_grader))
+
+    results = list(
+        stream_pairs(
+            model_tuples, [("job1", "python")], iter([("cv1", "cv")]), tmp_path
+        )
+    )
+
+    assert sorted(model_name for _, _, model_name, _ in results) == [
+        "ensemble",
+        "model1",
+        "model2",
+    ]
+    assert (tmp_path / "job1_cv1_ensemble.json").exists()
+
+
+def test_stream_pairs_only_evaluates_the_given_pairs(tmp_path):
+    mock_grader = Mock(spec=RunnableSequence)
+    mock_grader.ainvoke.return_value = {"assessment": {"suitability": "yes"}}
+    job_data = [("job1", "python"), ("job2", "java")]
+    cv_data = [("cv1", "python dev"), ("cv2", "java dev")]
+
+    results = list(
+        stream_pairs(
+            [("model1", mock_grader)],
+            job_data,
+            iter(cv_data),
+            tmp_path,
+            pairs={("job1", "cv1"), ("job2", "cv2")},
+        )
+    )
+
+    assert sorted((job_id, cv_id) for job_id, cv_id, _, _ in results) == [
+        ("job1", "cv1"),
+        ("job2", "cv2"),
+    ]
+    assert mock_grader.ainvoke.await_count == 2
+
+
+def test_finished_in_pool_reevaluates_other_models_and_prompt_versions(tmp_path):
+    pool = CandidatePool(tmp_path / "pool.sqlite")
+    pool.add_result("job1", "cv1", "model1", {"score": 1}, "v1")
+    pool.add_result("job1", "cv2", "model1", {"score": 2}, "v0")
+
+    assert finished_in_pool(pool, ["job1"], "cv1", ["model1"], version="v1") == {
+        "job1": {"model1": {"score": 1}}
+    }
+    assert finished_in_pool(pool, ["job1"], "cv2", ["model1"], version="v1") == {}
+    assert finished_in_pool(pool, ["job1"], "cv1", ["model2"], version="v1") == {}
+    assert finished_in_pool(pool, ["job2"], "cv1", ["model1"], version="v1") == {}
@@ -0,0 +1,79 @@
+import asyncio
+from unittest.mock import patch
+
+from rezumat.utils.rate_limiter import (
+    RateLimiter,
+    SlotLimiter,
+    TokenBucket,
+    get_rate_limiter,
+    get_slot_limiter,
+)
+
+
+def test_token_bucket_allows_burst_up_to_capacity():
+    bucket = TokenBucket(capacity=3, refill_per_sec=1)
+    assert [bucket.reserve(1) for _ in range(3)] == [0.0, 0.0, 0.0]
+
+
+def test_token_bucket_waits_for_refill_when_empty():
+    bucket = TokenBucket(capacity=2, refill_per_sec=2)
+    bucket.reserve(2)
+    wait = bucket.reserve(1)
+    assert 0.4 < wait <= 0.5
+
+
+def test_token_bucket_caps_oversized_requests():
+    """a request larger than the bucket only waits for a full bucket."""
+    bucket = TokenBucket(capacity=10, refill_per_sec=10)
+    assert bucket.reserve(1000) == 0.0
+    assert bucket.reserve(1000) <= 1.0
+
+
+def test_rate_limiter_waits_for_the_slowest_bucket():
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=600)
+    assert limiter.reserve(600) == 0.0
+    # one request is refilled after 1s, 300 tokens only after 30s
+    assert 29 < limiter.reserve(300) <= 30
+
+
+def test_rate_limiter_without_limits_never_waits():
+    limiter = RateLimiter()
+    assert limiter.reserve(10**6) == 0.0
+
+
+def test_get_rate_limiter_is_shared_and_uses_model_override():
+    limits = {
+        "groq": {"requests_per_minute": 30},
+        "groq/llama3-8b-8192": {"requests_per_minute": 100},
+    }
+    with patch("rezumat.utils.rate_limiter.config.RATE_LIMITS", limits):
+        limiter = get_rate_limiter("Groq", "llama3-70b-test")
+        assert limiter is get_rate_limiter("groq", "llama3-70b-test")
+        assert limiter.requests.capacity == 30
+        assert get_rate_limiter("groq", "llama3-8b-8192").requests.capacity == 100
+
+
+def test_slot_limiter_bounds_calls_in_flight():
+    limiter = SlotLimiter(2)
+    in_flight, peak = 0, 0
+
+    async def call():
+        nonlocal in_flight, peak
+        await limiter.aacquire()
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        limiter.release()
+
+    async def run():
+        await asyncio.gather(*[call() for _ in range(6)])
+
+    asyncio.run(run())
+    assert peak == 2
+
+
+def test_get_slot_limiter_only_for_configured_providers():
+    with patch("rezumat.utils.rate_limiter.config.PARALLEL_SLOTS", {"ollama": 3}):
+        assert get_slot_limiter("Ollama", "slots-test").slots == 3
+        assert get_slot_limiter("Groq", "slots-test") is None
@@ -0,0 +1,67 @@
+from rezumat.utils.result_cache import ResultCache, make_cache_key
+
+
+def test_cache_key_ignores_whitespace_differences():
+    key1 = make_cache_key("tpl", "groq/llama3", 0.0, {"resume": "Python  developer\n"})
+    key2 = make_cache_key("tpl", "groq/llama3", 0.0, {"resume": "Python developer"})
+    assert key1 == key2
+
+
+def test_cache_key_depends_on_template_model_and_temperature():
+    inputs = {"resume": "Python developer"}
+    key = make_cache_key("tpl", "groq/llama3", 0.0, inputs)
+    assert key != make_cache_key("tpl v2", "groq/llama3", 0.0, inputs)
+    assert key != make_cache_key("tpl", "openai/gpt-4", 0.0, inputs)
+    assert key != make_cache_key("tpl", "groq/llama3", 0.5, inputs)
+
+
+def test_get_and_set_count_hits_and_misses(tmp_path):
+    cache = ResultCache(tmp_path / "cache.sqlite", max_bytes=1024 * 1024)
+
+    assert cache.get("key") is None
+    cache.set("key", {"assessment": {"suitability": "yes"}})
+    assert cache.get("key") == {"assessment": {"suitability": "yes"}}
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["entries"] == 1
+
+
+def test_cache_persists_across_instances(tmp_path):
+    ResultCache(tmp_path / "cache.sqlite", max_bytes=1024).set("key", {"a": 1})
+    assert ResultCache(tmp_path / "cache.sqlite", max_bytes=1024).get("key") == {"a": 1}
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    value = {"text": "x" * 100}
+    cache = ResultCache(tmp_path / "cache.sqlite", max_bytes=250)
+
+    cache.set("a", value)
+    cache.set("b", value)
+    cache.get("a")  # "b" is now the least recently used entry
+    cache.set("c", value)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == value
+    assert cache.get("c") == value
+    assert cache.stats()["size_bytes"] <= 250
+
+
+def test_hits_write_their_access_times_in_batches(tmp_path):
+    cache = ResultCache(tmp_path / "cache.sqlite", max_bytes=1024 * 1024)
+    cache.ACCESS_FLUSH_SIZE = 2
+    cache.set("a", {"a": 1})
+    cache.set("b", {"b": 1})
+
+    def last_access():
+        return dict(cache._conn.execute("SELECT key, last_access FROM results"))
+
+    before = last_access()
+    cache.get("a")
+    assert last_access() == before
+    cache.get("b")
+    assert last_access()["a"] > before["a"]
+    cache.get("a")
+    cache.flush()
+    assert not cache._accessed
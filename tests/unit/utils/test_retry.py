@@ -0,0 +1,114 @@
+import asyncio
+from unittest.mock import Mock, patch
+
+import httpx
+import pytest
+from langchain_core.exceptions import OutputParserException
+from langchain_core.runnables import RunnableLambda, RunnableSequence
+
+from rezumat.utils.process_jobs import retry_dead_letters
+from rezumat.utils.retry import (
+    DeadLetterQueue,
+    backoff_delay,
+    is_retryable,
+    retry_after,
+    with_retry,
+)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.response = httpx.Response(status_code, headers=headers or {})
+
+
+@pytest.mark.parametrize(
+    "exc, expected",
+    [
+        (StatusError(429), True),
+        (StatusError(503), True),
+        (StatusError(400), False),
+        (httpx.ReadTimeout("timeout"), True),
+        (ValueError("bad input"), False),
+    ],
+)
+def test_is_retryable(exc, expected):
+    assert is_retryable(exc) == expected
+
+
+def test_backoff_honours_retry_after():
+    assert retry_after(StatusError(429, {"retry-after": "7"})) == 7
+    assert retry_after(StatusError(429, {"retry-after-ms": "250"})) == 0.25
+    assert backoff_delay(0, StatusError(429, {"retry-after": "7"})) == 7
+    assert backoff_delay(3, StatusError(500), base_delay=1, max_delay=5) <= 5
+
+
+def test_with_retry_retries_transient_errors_only():
+    """check that transient errors are retried and other errors raised at once."""
+    calls = []
+
+    def flaky(inputs):
+        calls.append(inputs)
+        if len(calls) < 3:
+            raise StatusError(429, {"retry-after": "0"})
+        return "ok"
+
+    assert with_retry(RunnableLambda(flaky), max_retries=3).invoke("x") == "ok"
+    assert len(calls) == 3
+
+    failing = Mock(side_effect=StatusError(400))
+    with pytest.raises(StatusError):
+        with_retry(RunnableLambda(failing), max_retries=3).invoke("x")
+    assert failing.call_count == 1
+
+
+def test_with_retry_reasks_on_json_errors():
+    outputs = iter([OutputParserException("not json"), {"ok": True}])
+
+    async def parse(inputs):
+        output = next(outputs)
+        if isinstance(output, Exception):
+            raise output
+        return output
+
+    grader = with_retry(
+        RunnableLambda(lambda x: x, afunc=parse),
+        max_retries=1,
+        retry_if=lambda e: isinstance(e, OutputParserException),
+        backoff=False,
+    )
+    with patch("asyncio.sleep") as mock_sleep:
+        assert asyncio.run(grader.ainvoke("x")) == {"ok": True}
+    mock_sleep.assert_awaited_once_with(0.0)
+
+
+def test_dead_letters_are_retried_in_bulk(tmp_path):
+    """check that queued failures are re-run and only the new failures stay queued."""
+    queue = DeadLetterQueue.in_dir(tmp_path)
+    for cv_id in ["cv1", "cv2"]:
+        entry = {"kind": "cv", "model_name": "model1", "job_id": "job1"}
+        entry.update(job_requirements={}, cv_id=cv_id, resume=cv_id)
+        queue.add(entry, StatusError(503))
+
+    def invoke(inputs):
+        if inputs["resume"] == "cv2":
+            raise StatusError(400)
+        return {"assessment": {"suitability": "yes"}}
+
+    mock_grader = Mock(spec=RunnableSequence)
+    mock_grader.ainvoke.side_effect = invoke
+
+    assert retry_dead_letters([("model1", mock_grader)], tmp_path) == (2, 1)
+    assert (tmp_path / "job1_cv1_model1.json").exists()
+    assert [entry["cv_id"] for entry in queue.entries()] == ["cv2"]
+
+
+def test_dead_letter_queues_of_a_path_share_one_lock(tmp_path):
+    assert (
+        DeadLetterQueue.in_dir(tmp_path)._lock
+        is DeadLetterQueue(tmp_path / "dead_letter.jsonl")._lock
+    )
+    assert (
+        DeadLetterQueue.in_dir(tmp_path)._lock
+        is not DeadLetterQueue.in_dir(tmp_path / "other")._lock
+    )